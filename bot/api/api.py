@@ -1,16 +1,369 @@
 """
 Модуль для обращения по http к API.
 Работает асинхронно.
+
+Все запросы идут через одну долгоживущую сессию `api_client`.
+Она создается в `loader.loader()` и закрывается в `main.main()`,
+поэтому соединения (TCP/TLS) и DNS-ответы переиспользуются между запросами.
+
+Ответы с заголовками ETag/Last-Modified запоминаются в `validator_store`.
+Повторный запрос того же URL отправляется условным (If-None-Match/If-Modified-Since),
+и при ответе 304 возвращаются уже разобранные данные без передачи и декодирования тела.
+
+Каждый запрос проходит через `api_resilience` (см. `api/resilience.py`).
+
+Большие коллекции можно читать потоково (`iter_models_response`):
+элементы массива валидируются по мере прихода байтов.
 """
 
 
-from aiohttp import ClientSession
+import json
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+
+from aiohttp import ClientResponse, ClientSession, ClientTimeout, TCPConnector, TraceConfig
+from pydantic import BaseModel, TypeAdapter
+
+from config.config import (
+    API_CONNECTION_LIMIT,
+    API_CONNECTION_LIMIT_PER_HOST,
+    API_KEEPALIVE_TIMEOUT,
+    API_DNS_CACHE_TTL,
+
+    API_TIMEOUT_TOTAL,
+    API_TIMEOUT_CONNECT,
+    API_TIMEOUT_SOCK_READ,
+
+    API_VALIDATORS_MAXSIZE
+)
+from models.pydantic_api import resource_models, resource_list_adapters
+
+from .resilience import api_resilience
+from .stream import iter_json_array
+
+
+class APIClient:
+    """
+    Пул HTTP-соединений к API.
+
+    Хранит одну `ClientSession` на весь процесс и считает,
+    сколько соединений было создано, а сколько - переиспользовано.
+    """
+
+    def __init__(self):
+        self._session: ClientSession | None = None
+
+        # Счетчики для проверки работы пула
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    async def start(self) -> None:
+        """
+        Создает сессию с настроенным пулом соединений.
+        Повторный вызов ничего не делает, если сессия уже открыта.
+        """
+
+        if self._session is not None and not self._session.closed:
+            return
+
+        connector = TCPConnector(
+            limit=API_CONNECTION_LIMIT,
+            limit_per_host=API_CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=API_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=API_DNS_CACHE_TTL
+        )
+
+        timeout = ClientTimeout(
+            total=API_TIMEOUT_TOTAL,
+            connect=API_TIMEOUT_CONNECT,
+            sock_read=API_TIMEOUT_SOCK_READ
+        )
+
+        # Трассировка нужна только для счетчиков соединений
+        trace_config = TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+
+        self._session = ClientSession(connector=connector, timeout=timeout, trace_configs=[trace_config])
+        logging.info('Создана HTTP-сессия для запросов к API')
+
+    async def close(self) -> None:
+        """
+        Закрывает сессию и все соединения пула.
+        """
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logging.info(f'HTTP-сессия API закрыта. Статистика: {self.get_stats()}')
+
+        self._session = None
+
+    async def get_session(self) -> ClientSession:
+        """
+        Возвращает открытую сессию.
+        Если `start()` еще не вызывался (например, в скриптах) - создает ее.
+        """
+
+        if self._session is None or self._session.closed:
+            await self.start()
+
+        return self._session
+
+    def get_stats(self) -> dict:
+        """
+        Возвращает счетчики запросов и соединений.
+        """
+
+        connections = self.connections_created + self.connections_reused
+
+        return {
+            'requests': self.requests,
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused,
+            'reuse_ratio': round(self.connections_reused / connections, 3) if connections else 0.0
+        }
+
+    async def _on_request_start(self, session, trace_config_ctx, params):
+        self.requests += 1
+
+    async def _on_connection_create_end(self, session, trace_config_ctx, params):
+        self.connections_created += 1
+
+    async def _on_connection_reuseconn(self, session, trace_config_ctx, params):
+        self.connections_reused += 1
+
+
+@dataclass(slots=True)
+class ResponseValidators:
+    """
+    Валидаторы и разобранное тело одного ответа.
+    """
+
+    etag: str | None
+    last_modified: str | None
+    payload: Any
+    size: int # Размер тела в байтах
+
+
+class ValidatorStore:
+    """
+    Хранилище валидаторов HTTP-ответов: URL -> ETag/Last-Modified и данные ответа.
+    Ограничено по кол-ву записей, лишние вытесняются по LRU.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, ResponseValidators] = OrderedDict()
+
+        # Статистика
+        self.revalidations = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+
+    def get(self, url: str) -> ResponseValidators | None:
+        validators = self._data.get(url)
+        if validators is not None:
+            self._data.move_to_end(url)
+        return validators
+
+    def set(self, url: str, validators: ResponseValidators) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._data[url] = validators
+        self._data.move_to_end(url)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def get_request_headers(self, validators: ResponseValidators | None) -> dict:
+        """
+        Возвращает заголовки условного запроса для сохраненных валидаторов.
+        """
+
+        headers = {}
+        if validators is None:
+            return headers
+
+        if validators.etag:
+            headers['If-None-Match'] = validators.etag
+        if validators.last_modified:
+            headers['If-Modified-Since'] = validators.last_modified
+
+        if headers:
+            self.revalidations += 1
+
+        return headers
+
+    def record_not_modified(self, size: int) -> None:
+        """
+        Учитывает ответ 304, который сэкономил передачу тела размером `size` байт.
+        """
+
+        self.not_modified += 1
+        self.bytes_saved += size
+
+    def get_stats(self) -> dict:
+        return {
+            'size': len(self._data),
+            'revalidations': self.revalidations,
+            'not_modified': self.not_modified,
+            'bytes_saved': self.bytes_saved
+        }
+
+
+api_client = APIClient()
+validator_store = ValidatorStore(maxsize=API_VALIDATORS_MAXSIZE)
+
+
+async def _get_decoded_response(full_url: str, decode: Callable[[bytes], Any], decoder_name: str):
+    """
+    Функция-исполнитель запроса.
+    Делает (условный) GET-запрос и декодирует тело ответа функцией `decode`.
+
+    :param full_url: Полный URL запроса.
+    :param decode: Функция "байты тела -> данные".
+    :param decoder_name: Имя декодера. Входит в ключ хранилища валидаторов,
+    чтобы при 304 вернуть данные того же вида, что и при полном ответе.
+
+    :return: Декодированные данные.
+    """
+
+    store_key = f'{decoder_name}:{full_url}'
+
+    async def request():
+        validators = validator_store.get(store_key)
+
+        session = await api_client.get_session()
+        async with session.get(full_url, headers=validator_store.get_request_headers(validators)) as response:
+            # Данные не изменились - отдаем сохраненные
+            if response.status == 304 and validators is not None:
+                validator_store.record_not_modified(validators.size)
+                return validators.payload
+
+            response.raise_for_status()
+
+            body = await response.read()
+            payload = decode(body)
+
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+
+            if response.status == 200 and (etag or last_modified):
+                validator_store.set(store_key, ResponseValidators(etag, last_modified, payload, len(body)))
+
+            return payload
+
+    # Дедлайны, повторы, выключатель и хеджирование
+    return await api_resilience.call(request)
 
 
 async def get_json_response(url: str, query: str):
     """
     Получает url и query, после чего делает запрос и возвращает JSON-ответ.
+
+    Если для URL сохранены валидаторы - запрос условный, и при 304 возвращаются сохраненные данные.
+    Эти данные общие для всех вызовов, поэтому изменять их нельзя.
+    """
+
+    return await _get_decoded_response(url + query, json.loads, 'json')
+
+
+async def get_model_response(url: str, query: str, pydantic_model: type[BaseModel]) -> BaseModel:
+    """
+    Делает запрос и валидирует байты ответа сразу в Pydantic-модель, без промежуточного словаря.
+
+    :param url: Адрес API.
+    :param query: Путь объекта, например 'posts/1'.
+    :param pydantic_model: Pydantic-модель объекта.
+
+    :return: Pydantic-модель с данными.
+    """
+
+    return await _get_decoded_response(url + query, pydantic_model.model_validate_json, pydantic_model.__name__)
+
+
+async def get_models_response(url: str, query: str, pydantic_model: type[BaseModel]) -> list[BaseModel]:
+    """
+    Делает запрос коллекции и валидирует байты JSON-массива сразу в список Pydantic-моделей.
+
+    :param url: Адрес API.
+    :param query: Путь коллекции, например 'posts'.
+    :param pydantic_model: Pydantic-модель одного объекта коллекции.
+
+    :return: Список Pydantic-моделей.
     """
-    async with ClientSession() as session:
-        async with session.get(url + query) as response:
-            return await response.json()
+
+    adapter = _get_list_adapter(pydantic_model)
+    return await _get_decoded_response(url + query, adapter.validate_json, f'list[{pydantic_model.__name__}]')
+
+
+def _get_list_adapter(pydantic_model: type[BaseModel]) -> TypeAdapter:
+    """
+    Возвращает заранее собранный TypeAdapter для списка моделей.
+    Для моделей вне `resource_models` собирает его один раз и запоминает.
+    """
+
+    adapter = _list_adapters.get(pydantic_model)
+    if adapter is None:
+        adapter = _list_adapters[pydantic_model] = TypeAdapter(list[pydantic_model])
+    return adapter
+
+
+_list_adapters = {
+    resource_models[resource]: adapter for resource, adapter in resource_list_adapters.items()
+}
+
+
+@asynccontextmanager
+async def open_stream_response(full_url: str, headers: dict | None = None) -> AsyncIterator[ClientResponse]:
+    """
+    Открывает ответ для потокового чтения.
+
+    Общий таймаут запроса здесь снят: большая коллекция может читаться дольше `API_TIMEOUT_TOTAL`.
+    Зависание все равно ограничено таймаутами соединения и чтения.
+
+    :param full_url: Полный URL запроса.
+    :param headers: Дополнительные заголовки, например условные.
+
+    :return: Ответ aiohttp. Статус 304 возвращается как есть, прочие ошибки - исключением.
+    """
+
+    timeout = ClientTimeout(total=None, connect=API_TIMEOUT_CONNECT, sock_read=API_TIMEOUT_SOCK_READ)
+
+    session = await api_client.get_session()
+    async with session.get(full_url, headers=headers, timeout=timeout) as response:
+        if response.status != 304:
+            response.raise_for_status()
+        yield response
+
+
+async def iter_models(response: ClientResponse, pydantic_model: type[BaseModel]) -> AsyncIterator[BaseModel]:
+    """
+    Потоково разбирает JSON-массив из ответа и отдает Pydantic-модели по одной.
+    """
+
+    async for item in iter_json_array(response.content):
+        yield pydantic_model.model_validate(item)
+
+
+async def iter_models_response(url: str, query: str, pydantic_model: type[BaseModel]) -> AsyncIterator[BaseModel]:
+    """
+    Делает запрос коллекции и отдает ее объекты по одному, не загружая весь ответ в память.
+
+    :param url: Адрес API.
+    :param query: Путь коллекции, например 'photos'.
+    :param pydantic_model: Pydantic-модель одного объекта коллекции.
+
+    :return: Асинхронный генератор Pydantic-моделей.
+    """
+
+    async with open_stream_response(url + query) as response:
+        async for obj in iter_models(response, pydantic_model):
+            yield obj
@@ -0,0 +1,153 @@
+"""
+Модуль с кэшем ответов API.
+
+Кэш ограничен по размеру (LRU) и по времени жизни записей (TTL).
+Одновременные промахи по одному ключу объединяются в один запрос к API (single-flight).
+"""
+
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+
+from config.config import API_CACHE_MAXSIZE, API_CACHE_TTL
+
+
+# Результат `TTLCache.get`, когда значения нет или оно устарело. None - обычное значение, его тоже можно кэшировать
+MISSING = object()
+
+
+class _FetchCancelled(Exception):
+    """
+    Запрос, результат которого ждали, отменен - ожидающие получают значение сами.
+    """
+
+
+class TTLCache:
+    """
+    Асинхронный TTL+LRU кэш.
+
+    Ключ - любой хешируемый объект, например `(resource, resource_id)`.
+    Значение получается вызовом `fetch()`, только если в кэше его нет или оно устарело.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        # key -> (время истечения, значение). Порядок - от давно использованных к недавним.
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+        # Запросы к API, которые выполняются прямо сейчас
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Возвращает значение из кэша или получает его через `fetch()`.
+
+        :param key: Ключ записи.
+        :param fetch: Корутина-функция, которая получает значение при промахе.
+
+        :return: Значение из кэша или результат `fetch()`.
+        """
+
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        # Кто-то уже запрашивает этот ключ - ждем его результат
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _FetchCancelled:
+                # Отмена чужого запроса не должна отменять этот - запрашиваем заново (или ждем нового ведущего)
+                self.coalesced -= 1
+                return await self.get_or_fetch(key, fetch)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        try:
+            value = await fetch()
+        except BaseException as e:
+            # Отменили только этот вызов: ожидающие не отменяются, а повторяют запрос сами
+            future.set_exception(_FetchCancelled() if isinstance(e, asyncio.CancelledError) else e)
+            # Помечаем исключение как полученное, если ожидающих не было
+            future.exception()
+            raise
+        else:
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Возвращает значение, если оно есть и не устарело. Иначе - `MISSING`.
+        """
+
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return MISSING
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение и вытесняет самые давно использованные записи сверх `maxsize`.
+        """
+
+        if self.maxsize <= 0:
+            return
+
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def get_stats(self) -> dict:
+        """
+        Возвращает статистику попаданий, промахов и вытеснений.
+        """
+
+        requests = self.hits + self.misses + self.coalesced
+
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_ratio': round((self.hits + self.coalesced) / requests, 3) if requests else 0.0
+        }
+
+
+api_cache = TTLCache(maxsize=API_CACHE_MAXSIZE, ttl=API_CACHE_TTL)
@@ -0,0 +1,157 @@
+"""
+Модуль предзагрузки ресурсов API.
+
+Коллекции API (`users`, `posts`, ...) небольшие и статичные,
+поэтому при старте они загружаются целиком и раскладываются в индекс по id.
+После этого `/get` отвечает из памяти, а запрос по id к API остается запасным вариантом.
+Индекс периодически обновляется в фоне условными запросами, а коллекции читаются потоково.
+"""
+
+
+import asyncio
+import logging
+import time
+
+from pydantic import BaseModel
+
+from api.api import ResponseValidators, validator_store, open_stream_response, iter_models
+from config.config import API_URL
+
+
+class ResourceIndex:
+    """
+    Индекс объектов API: ресурс -> {id: Pydantic-модель}.
+    """
+
+    def __init__(self):
+        self._store: dict[str, dict[int, BaseModel]] = {}
+        self._refreshed_at: dict[str, float] = {}
+
+        # ETag/Last-Modified последней загрузки каждого ресурса - для условного обновления
+        self._validators: dict[str, ResponseValidators] = {}
+
+        self._refresh_task: asyncio.Task | None = None
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, resource: str, resource_id: int) -> BaseModel | None:
+        """
+        Возвращает объект из индекса или None, если ресурс не загружен или id не найден.
+        """
+
+        obj = self._store.get(resource, {}).get(resource_id)
+
+        if obj is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return obj
+
+    async def load(self, resource: str, pydantic_model) -> None:
+        """
+        Загружает коллекцию ресурса целиком и заменяет ею старую часть индекса.
+
+        :param resource: Название ресурса, например 'posts'.
+        :param pydantic_model: Pydantic-модель объектов ресурса.
+        """
+
+        started = time.perf_counter()
+        validators = self._validators.get(resource)
+        headers = validator_store.get_request_headers(validators)
+
+        # Коллекция читается потоково: в памяти не держится ни весь ответ, ни дерево словарей
+        async with open_stream_response(API_URL + resource, headers) as response:
+            # Коллекция не изменилась (304) - индекс пересобирать не нужно
+            if response.status == 304 and validators is not None:
+                validator_store.record_not_modified(validators.size)
+                self._refreshed_at[resource] = time.time()
+                logging.info(f'Ресурс {resource} не изменился')
+                return
+
+            id_field = _get_id_field(pydantic_model)
+            index = {}
+            async for obj in iter_models(response, pydantic_model):
+                index[getattr(obj, id_field)] = obj
+
+            self._validators[resource] = ResponseValidators(
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+                payload=None,
+                size=response.content.total_bytes
+            )
+
+        # Заменяем целиком, чтобы читатели не видели частично заполненный индекс
+        self._store[resource] = index
+        self._refreshed_at[resource] = time.time()
+
+        logging.info(f'Ресурс {resource} загружен в память: {len(index)} объектов за {time.perf_counter() - started:.2f} сек.')
+
+    async def warm_up(self, resources: dict) -> None:
+        """
+        Загружает все переданные ресурсы параллельно.
+        Ошибка загрузки одного ресурса не мешает остальным - для него останется запрос по id.
+
+        :param resources: Словарь вида "ресурс: Pydantic-модель".
+        """
+
+        results = await asyncio.gather(
+            *(self.load(resource, pydantic_model) for resource, pydantic_model in resources.items()),
+            return_exceptions=True
+        )
+
+        for resource, result in zip(resources, results):
+            if isinstance(result, Exception):
+                logging.error(f'Не удалось загрузить ресурс {resource} в память:\n{result}')
+
+    def start_refreshing(self, resources: dict, interval: float) -> None:
+        """
+        Запускает фоновое обновление индекса раз в `interval` секунд.
+        """
+
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop(resources, interval))
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновое обновление.
+        """
+
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self, resources: dict, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            logging.info('Обновляю ресурсы API в памяти')
+            await self.warm_up(resources)
+
+    def get_stats(self) -> dict:
+        return {
+            'resources': {resource: len(index) for resource, index in self._store.items()},
+            'refreshed_at': dict(self._refreshed_at),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def _get_id_field(pydantic_model) -> str:
+    """
+    Возвращает имя поля модели, в которое попадает `id` из API (например, `post_id`).
+    """
+
+    for name, field in pydantic_model.model_fields.items():
+        if field.alias == 'id':
+            return name
+
+    return 'id'
+
+
+resource_index = ResourceIndex()
@@ -0,0 +1,301 @@
+"""
+Модуль устойчивости запросов к API.
+
+Каждый запрос к API проходит через `api_resilience.call(...)`, который добавляет:
++ Дедлайн на каждую попытку
++ Повторы с джиттером, ограниченные общим бюджетом повторов
++ Автоматический выключатель (circuit breaker): пока API нездорово, запросы сразу падают
++ Хеджирование (опционально): если ответа нет дольше p95, параллельно отправляется второй запрос
+"""
+
+
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from aiohttp import ClientError, ClientResponseError
+
+from config.config import (
+    API_ATTEMPT_TIMEOUT,
+    API_RETRY_MAX_ATTEMPTS,
+    API_RETRY_BACKOFF_BASE,
+    API_RETRY_BACKOFF_MAX,
+    API_RETRY_BUDGET_RATIO,
+    API_RETRY_BUDGET_MIN_PER_SECOND,
+
+    API_CIRCUIT_FAILURE_THRESHOLD,
+    API_CIRCUIT_RECOVERY_TIMEOUT,
+
+    API_HEDGING_ENABLED,
+    API_HEDGE_MIN_DELAY
+)
+
+
+class CircuitOpenError(Exception):
+    """
+    Выключатель разомкнут: API считается недоступным, запрос не отправлялся.
+    """
+
+
+def _is_retryable(error: BaseException) -> bool:
+    """
+    Можно ли повторить запрос после этой ошибки.
+    Ответы 4xx (кроме 429) повторять бессмысленно, как и ошибки валидации данных.
+    """
+
+    if isinstance(error, ClientResponseError):
+        return error.status >= 500 or error.status == 429
+
+    return isinstance(error, (ClientError, asyncio.TimeoutError))
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель.
+
+    closed    - запросы проходят, считаются ошибки подряд.
+    open      - после `failure_threshold` ошибок подряд все запросы сразу падают с `CircuitOpenError`.
+    half_open - через `recovery_timeout` сек. пропускается один пробный запрос:
+                успех замыкает выключатель, ошибка снова размыкает.
+    """
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self.state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_started_at: float | None = None
+
+        # Статистика
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """
+        Пропускает запрос или выбрасывает `CircuitOpenError`.
+        """
+
+        if self.state == 'closed':
+            return
+
+        now = time.monotonic()
+
+        if self.state == 'open' and now - self._opened_at >= self.recovery_timeout:
+            self.state = 'half_open'
+
+        # Пробный запрос один. Если он пропал без результата (например, отменен) - через `recovery_timeout` пускаем новый.
+        if self.state == 'half_open' and (
+                self._probe_started_at is None or now - self._probe_started_at >= self.recovery_timeout
+        ):
+            self._probe_started_at = now
+            return
+
+        self.rejected += 1
+        raise CircuitOpenError('API временно недоступно')
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probe_started_at = None
+
+        if self.state != 'closed':
+            logging.info('Выключатель API замкнут: API снова отвечает')
+            self.state = 'closed'
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._probe_started_at = None
+
+        if self.state == 'half_open' or (self.state == 'closed' and self._failures >= self.failure_threshold):
+            logging.warning(f'Выключатель API разомкнут после {self._failures} ошибок подряд')
+            self.state = 'open'
+            self._opened_at = time.monotonic()
+            self.opened += 1
+
+
+class RetryBudget:
+    """
+    Общий бюджет повторов.
+
+    Каждый запрос пополняет бюджет на `ratio` токена, каждый повтор или хедж тратит один.
+    Так повторы не превышают ~`ratio` от трафика и не добивают и без того перегруженное API.
+    `min_per_second` токенов в секунду начисляются всегда, чтобы при малом трафике повторы были возможны.
+    """
+
+    def __init__(self, ratio: float, min_per_second: float):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max(10.0, min_per_second * 10)
+
+        self._tokens = self.max_tokens
+        self._updated_at = time.monotonic()
+
+        # Статистика
+        self.spent = 0
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """
+        Тратит токен на повтор. Возвращает False, если бюджет исчерпан.
+        """
+
+        self._refill()
+
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.spent += 1
+            return True
+
+        self.exhausted += 1
+        return False
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated_at) * self.min_per_second)
+        self._updated_at = now
+
+
+class LatencyTracker:
+    """
+    Скользящее окно длительностей успешных попыток для оценки p95.
+    """
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        if len(self._samples) < self.min_samples:
+            return None
+
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class ResilientCaller:
+    """
+    Объединяет дедлайны, повторы, бюджет, выключатель и хеджирование в один вызов `call`.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(API_CIRCUIT_FAILURE_THRESHOLD, API_CIRCUIT_RECOVERY_TIMEOUT)
+        self.budget = RetryBudget(API_RETRY_BUDGET_RATIO, API_RETRY_BUDGET_MIN_PER_SECOND)
+        self.latency = LatencyTracker()
+
+        self.attempt_timeout = API_ATTEMPT_TIMEOUT
+        self.max_attempts = API_RETRY_MAX_ATTEMPTS
+        self.hedging_enabled = API_HEDGING_ENABLED
+
+        # Статистика
+        self.retries = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    async def call(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет запрос с повторами.
+
+        :param request: Корутина-функция одной попытки запроса. Может вызываться несколько раз.
+
+        :return: Результат первой успешной попытки.
+        """
+
+        self.breaker.before_call()
+        self.budget.record_request()
+
+        attempt = 1
+        while True:
+            try:
+                result = await self._attempt(request)
+            except Exception as e:
+                if not _is_retryable(e):
+                    # API ответило (например, 404) - для выключателя это не сбой
+                    self.breaker.record_success()
+                    raise
+
+                self.breaker.record_failure()
+
+                if attempt >= self.max_attempts or not self.budget.try_spend():
+                    raise
+
+                # Экспоненциальная задержка с полным джиттером
+                delay = random.uniform(0, min(API_RETRY_BACKOFF_MAX, API_RETRY_BACKOFF_BASE * 2 ** (attempt - 1)))
+                logging.warning(f'Ошибка запроса к API ({e!r}), повтор {attempt} через {delay:.2f} сек.')
+                await asyncio.sleep(delay)
+
+                # Пока ждали, выключатель мог разомкнуться
+                self.breaker.before_call()
+                self.retries += 1
+                attempt += 1
+                continue
+
+            self.breaker.record_success()
+            return result
+
+    async def _attempt(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Одна попытка с дедлайном. При включенном хеджировании и известном p95
+        после задержки p95 параллельно отправляется второй запрос, побеждает первый ответ.
+        """
+
+        hedge_delay = self.latency.percentile(0.95) if self.hedging_enabled else None
+
+        if hedge_delay is None:
+            return await self._timed(request)
+
+        primary = asyncio.create_task(self._timed(request))
+        tasks = {primary}
+
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=max(hedge_delay, API_HEDGE_MIN_DELAY))
+
+            if not done and self.budget.try_spend():
+                self.hedges += 1
+                tasks.add(asyncio.create_task(self._timed(request)))
+
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _timed(self, request: Callable[[], Awaitable[Any]]) -> Any:
+        started = time.monotonic()
+        result = await asyncio.wait_for(request(), timeout=self.attempt_timeout)
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    def get_stats(self) -> dict:
+        return {
+            'circuit_state': self.breaker.state,
+            'circuit_opened': self.breaker.opened,
+            'circuit_rejected': self.breaker.rejected,
+            'retries': self.retries,
+            'retry_budget_exhausted': self.budget.exhausted,
+            'hedges': self.hedges,
+            'hedges_won': self.hedges_won,
+            'p95': self.latency.percentile(0.95)
+        }
+
+
+api_resilience = ResilientCaller()
@@ -0,0 +1,100 @@
+"""
+Модуль потокового разбора JSON-массивов.
+
+Большие коллекции API (`photos` - 5000 объектов, `comments` - 500) не нужно держать в памяти целиком:
+элементы массива разбираются по мере прихода байтов, и в памяти одновременно находятся
+только текущий кусок ответа и один разбираемый элемент.
+"""
+
+
+import codecs
+import json
+import re
+from typing import AsyncIterator
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+
+async def iter_json_array(stream, chunk_size: int = 64 * 1024) -> AsyncIterator:
+    """
+    Асинхронный генератор элементов JSON-массива верхнего уровня.
+
+    :param stream: Источник байтов с методом `async read(n)`, например `aiohttp.StreamReader`.
+    Пустой результат `read` означает конец потока.
+    :param chunk_size: Размер читаемого куска, байт.
+
+    :return: Элементы массива по одному (словари, списки или значения).
+    """
+
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    eof = False
+    array_started = False
+
+    async def read_more() -> bool:
+        """
+        Дочитывает следующий кусок в буфер, отбрасывая уже разобранную часть.
+        Возвращает False, если поток закончился.
+        """
+
+        nonlocal buffer, position, eof
+
+        if eof:
+            return False
+
+        chunk = await stream.read(chunk_size)
+        eof = not chunk
+
+        buffer = buffer[position:] + text_decoder.decode(chunk, final=eof)
+        position = 0
+
+        return not eof
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+
+        if position == len(buffer):
+            if not await read_more():
+                raise ValueError('Неожиданный конец JSON-массива')
+            continue
+
+        char = buffer[position]
+
+        if not array_started:
+            if char != '[':
+                raise ValueError(f'Ожидался JSON-массив, получено: {char!r}')
+            array_started = True
+            position += 1
+            continue
+
+        if char == ']':
+            return
+
+        if char == ',':
+            position += 1
+            continue
+
+        try:
+            item, end = _decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # Элемент пришел не целиком - дочитываем
+            if not await read_more():
+                raise
+            continue
+
+        # Элемент дочитан, только если за ним идет разделитель. Иначе это может быть
+        # обрезанное число (`12` из `123`, `1` из `1.5`) - дочитываем и разбираем заново.
+        next_position = _WHITESPACE.match(buffer, end).end()
+        if next_position == len(buffer) or buffer[next_position] not in ',]':
+            if not eof:
+                # Буфер сдвинется, поэтому элемент разбирается заново
+                await read_more()
+                continue
+            if next_position != len(buffer):
+                raise ValueError(f'Неожиданный символ после элемента JSON-массива: {buffer[next_position]!r}')
+
+        position = end
+        yield item
@@ -0,0 +1,64 @@
+"""
+Массовая загрузка коллекций API в PostgreSQL через `ServiceDB.create_many` (COPY).
+
+Коллекции читаются потоком (`iter_models_response`) и сразу копируются в БД,
+целиком в памяти не держатся. Для каждого ресурса печатается скорость (вместе с чтением из API).
+
+Запуск из директории `bot/`:
+    python -m benchmarks.bulk_import --resource photos
+    API_URL=http://127.0.0.1:8080/ python -m benchmarks.bulk_import --telegram-user-id 0
+"""
+
+
+import argparse
+import asyncio
+import logging
+import os
+
+# Конфиг требует имя ключа Google, хотя загрузка к Google не обращается
+os.environ.setdefault('GOOGLE_KEY_NAME', 'unused.json')
+
+from injectable import load_injection_container, inject
+
+from api.api import api_client, iter_models_response
+from config.config import API_URL
+from models.db import create_tables, engine
+from models.pydantic_api import resource_models
+from service.db import ServiceDB
+
+
+async def run(args) -> None:
+    await create_tables()
+    load_injection_container(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    await api_client.start()
+
+    service_db = inject(ServiceDB)
+    resources = [args.resource] if args.resource else list(resource_models)
+
+    try:
+        for resource in resources:
+            report = await service_db.create_many(
+                resource,
+                iter_models_response(API_URL, resource, resource_models[resource]),
+                args.telegram_user_id
+            )
+
+            print(
+                f'{resource:<10} {report.rows:>6} строк за {report.seconds:.3f} сек. ({report.rows_per_second:.0f} строк/сек.)'
+            )
+    finally:
+        await api_client.close()
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Массовая загрузка коллекций API в PostgreSQL')
+    parser.add_argument('--resource', choices=list(resource_models), help='Только один ресурс')
+    parser.add_argument('--telegram-user-id', type=int, default=0, help='ID пользователя для записей')
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='WARNING')
+    main()
@@ -0,0 +1,129 @@
+"""
+Нагрузочный тест сценария `/get` против фейкового API (`fake_api.server`).
+
+Прогоняет получение данных `/get` (`_get_api_data`: индекс, кэш, HTTP-клиент, устойчивость, валидация)
+с заданной конкурентностью и печатает пропускную способность и перцентили задержки.
+Сохранение в БД и Google Sheets здесь не участвует - для них нужны внешние сервисы.
+
+Запуск из директории `bot/`:
+    python -m fake_api.server --port 8080 --latency 20 --jitter 10 --error-rate 0.01
+    API_URL=http://127.0.0.1:8080/ python -m benchmarks.load_test --requests 20000 --concurrency 200
+
+С флагом `--embedded-server` фейковый API запускается в этом же процессе (удобно, но делит с тестом event loop).
+"""
+
+
+import argparse
+import asyncio
+import os
+import random
+import time
+from collections import Counter
+
+# Конфиг требует имя ключа Google, хотя тест к Google не обращается
+os.environ.setdefault('GOOGLE_KEY_NAME', 'unused.json')
+
+from aiohttp import web
+
+from api.api import api_client, validator_store
+from api.cache import api_cache
+from api.prefetch import resource_index
+from api.resilience import api_resilience
+from config.config import API_URL
+from handlers.custom_handlers import _get_api_data, available_resources
+from models.pydantic_api import resource_models
+from fake_api.server import create_app
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def _worker(queue: asyncio.Queue, latencies: list[float], outcomes: Counter) -> None:
+    while True:
+        try:
+            resource, resource_id = queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+
+        started = time.perf_counter()
+        try:
+            await _get_api_data(resource, resource_id, resource_models[resource])
+            outcomes['ok'] += 1
+        except Exception as e:
+            outcomes[type(e).__name__] += 1
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(args) -> None:
+    runner = None
+    if args.embedded_server:
+        runner = web.AppRunner(create_app(
+            latency=args.latency / 1000, jitter=args.jitter / 1000, error_rate=args.error_rate, seed=args.seed
+        ))
+        await runner.setup()
+        port = int(API_URL.rstrip('/').rsplit(':', 1)[-1])
+        await web.TCPSite(runner, host='127.0.0.1', port=port).start()
+
+    await api_client.start()
+
+    if args.no_cache:
+        api_cache.maxsize = 0
+
+    if args.prefetch:
+        await resource_index.warm_up(resource_models)
+
+    # Набор запросов фиксирован seed-ом, чтобы прогоны были сравнимы
+    rng = random.Random(args.seed)
+    resources = [resource for resource in available_resources if not args.resource or resource == args.resource]
+
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        resource = rng.choice(resources)
+        queue.put_nowait((resource, rng.randint(1, min(available_resources[resource], args.id_range))))
+
+    latencies: list[float] = []
+    outcomes = Counter()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(queue, latencies, outcomes) for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f'API_URL:      {API_URL}')
+    print(f'Запросов:     {len(latencies)} за {elapsed:.2f} сек. ({len(latencies) / elapsed:.0f} RPS)')
+    print(f'Результаты:   {dict(outcomes)}')
+    print('Задержка, мс: p50 {:.2f}  p95 {:.2f}  p99 {:.2f}  max {:.2f}'.format(
+        *(_percentile(latencies, q) * 1000 for q in (0.5, 0.95, 0.99, 1.0))
+    ))
+    print(f'HTTP-клиент:  {api_client.get_stats()}')
+    print(f'Кэш:          {api_cache.get_stats()}')
+    print(f'304:          {validator_store.get_stats()}')
+    print(f'Устойчивость: {api_resilience.get_stats()}')
+    print(f'Индекс:       hits={resource_index.hits} misses={resource_index.misses}')
+
+    await api_client.close()
+    if runner is not None:
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочный тест /get против фейкового API')
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--resource', choices=list(available_resources), help='Только один ресурс')
+    parser.add_argument('--id-range', type=int, default=10 ** 9, help='Ограничить id, чтобы управлять попаданиями в кэш')
+    parser.add_argument('--no-cache', action='store_true', help='Отключить кэш ответов')
+    parser.add_argument('--prefetch', action='store_true', help='Предзагрузить коллекции перед тестом')
+    parser.add_argument('--seed', type=int, default=42)
+
+    parser.add_argument('--embedded-server', action='store_true', help='Запустить фейковый API в этом процессе')
+    parser.add_argument('--latency', type=float, default=0, help='Для --embedded-server: задержка, мс')
+    parser.add_argument('--jitter', type=float, default=0, help='Для --embedded-server: разброс задержки, мс')
+    parser.add_argument('--error-rate', type=float, default=0, help='Для --embedded-server: доля ответов 503')
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
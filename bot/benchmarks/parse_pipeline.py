@@ -0,0 +1,115 @@
+"""
+Бенчмарк разбора ответов API.
+
+Сравнивает прежний трехпроходный путь:
+    `json.loads` -> `from_camel_to_snake_json_keys` -> `Model(**data)`
+с прямой валидацией байтов ответа:
+    `Model.model_validate_json(body)` / `TypeAdapter(list[Model]).validate_json(body)`
+
+Запуск из директории `bot/`:
+    python -m benchmarks.parse_pipeline
+"""
+
+
+import asyncio
+import json
+import time
+
+from handlers.utils import from_camel_to_snake_json_keys
+from models.pydantic_api import PostModel, PhotoModel, UserModel, resource_list_adapters
+
+
+def _user(i: int) -> dict:
+    return {
+        'id': i,
+        'name': f'User {i}',
+        'username': f'user{i}',
+        'email': f'user{i}@example.com',
+        'address': {
+            'street': 'Kulas Light',
+            'suite': 'Apt. 556',
+            'city': 'Gwenborough',
+            'zipcode': '92998-3874',
+            'geo': {'lat': '-37.3159', 'lng': '81.1496'}
+        },
+        'phone': '1-770-736-8031 x56442',
+        'website': 'hildegard.org',
+        'company': {'name': 'Romaguera-Crona', 'catchPhrase': 'Multi-layered client-server neural-net', 'bs': 'harness'}
+    }
+
+
+def _post(i: int) -> dict:
+    return {'userId': i % 10 + 1, 'id': i, 'title': 'sunt aut facere ' * 3, 'body': 'quia et suscipit ' * 12}
+
+
+def _photo(i: int) -> dict:
+    return {
+        'albumId': i // 50 + 1,
+        'id': i,
+        'title': 'accusamus beatae ad facilis cum similique qui sunt',
+        'url': f'https://via.placeholder.com/600/{i:06x}',
+        'thumbnailUrl': f'https://via.placeholder.com/150/{i:06x}'
+    }
+
+
+async def _old_single(body: bytes, pydantic_model):
+    data = json.loads(body)
+    data = await from_camel_to_snake_json_keys(data)
+    return pydantic_model(**data)
+
+
+async def _old_collection(body: bytes, pydantic_model):
+    return [pydantic_model(**await from_camel_to_snake_json_keys(item)) for item in json.loads(body)]
+
+
+async def _many(func, body: bytes, pydantic_model, n: int):
+    for _ in range(n):
+        await func(body, pydantic_model)
+
+
+def _measure(func, repeat: int) -> float:
+    """
+    Возвращает лучшее время одного прогона из `repeat`, сек.
+    """
+
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def _report(name: str, old: float, new: float) -> None:
+    print(f'{name:<28} old: {old * 1e3:9.3f} ms   new: {new * 1e3:9.3f} ms   x{old / new:5.1f}')
+
+
+def main():
+    loop = asyncio.new_event_loop()
+
+    single_cases = {
+        'users/1': (json.dumps(_user(1)).encode(), UserModel),
+        'posts/1': (json.dumps(_post(1)).encode(), PostModel),
+        'photos/1': (json.dumps(_photo(1)).encode(), PhotoModel),
+    }
+    for name, (body, pydantic_model) in single_cases.items():
+        n = 2000
+        old = _measure(lambda: loop.run_until_complete(_many(_old_single, body, pydantic_model, n)), repeat=5) / n
+        new = _measure(lambda: [pydantic_model.model_validate_json(body) for _ in range(n)], repeat=5) / n
+        _report(name, old, new)
+
+    collection_cases = {
+        'posts (100)': (json.dumps([_post(i) for i in range(1, 101)]).encode(), 'posts', PostModel),
+        'photos (5000)': (json.dumps([_photo(i) for i in range(1, 5001)]).encode(), 'photos', PhotoModel),
+    }
+    for name, (body, resource, pydantic_model) in collection_cases.items():
+        adapter = resource_list_adapters[resource]
+        old = _measure(lambda: loop.run_until_complete(_old_collection(body, pydantic_model)), repeat=5)
+        new = _measure(lambda: adapter.validate_json(body), repeat=5)
+        _report(name, old, new)
+
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
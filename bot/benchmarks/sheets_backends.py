@@ -0,0 +1,180 @@
+"""
+Сравнение клиентов Google Sheets (`GH_BACKEND`): gspread в потоках (`GHClient`) и aiohttp (`AioGHClient`).
+
+Оба клиента добавляют строки (`append_rows`) в фейковый Sheets API, который запускается в этом же процессе:
+OAuth-токен, метаданные таблицы и `values:append` с задержкой `--latency`. Ключ сервисного аккаунта
+генерируется на время прогона. Ограничитель частоты отключен - сравнивается только транспорт.
+Для каждого клиента печатается пропускная способность, перцентили задержки и максимум потоков процесса.
+
+Запуск из директории `bot/`:
+    python -m benchmarks.sheets_backends --requests 2000 --concurrency 200 --latency 50
+"""
+
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+# Конфиг требует имя ключа Google, хотя бенчмарк берет свой
+os.environ.setdefault('GOOGLE_KEY_NAME', 'unused.json')
+
+import gspread.http_client
+import rsa
+from aiohttp import web
+
+from config.config import SCOPES
+from models.gh_aio import AioGHClient
+from models.gh_rate_limit import GHRateLimiter
+from models.google_sheets import GHClient
+
+
+_SPREADSHEET_ID = 'benchmark'
+_SHEET_NAME = 'posts'
+
+
+def create_app(latency: float) -> web.Application:
+    """
+    Фейковый Sheets API: только то, что нужно клиентам для `append_rows`.
+    """
+
+    metadata = {
+        'spreadsheetId': _SPREADSHEET_ID,
+        'properties': {'title': 'benchmark'},
+        'sheets': [{'properties': {
+            'sheetId': 1, 'title': _SHEET_NAME, 'index': 0, 'sheetType': 'GRID',
+            'gridProperties': {'rowCount': 1000, 'columnCount': 20}
+        }}]
+    }
+
+    async def token(request: web.Request) -> web.Response:
+        return web.json_response({'access_token': 'benchmark', 'expires_in': 3600, 'token_type': 'Bearer'})
+
+    async def get_spreadsheet(request: web.Request) -> web.Response:
+        return web.json_response(metadata)
+
+    async def append(request: web.Request) -> web.Response:
+        body = await request.json()
+        await asyncio.sleep(latency)
+        return web.json_response({'spreadsheetId': _SPREADSHEET_ID, 'updates': {'updatedRows': len(body['values'])}})
+
+    app = web.Application()
+    app.router.add_post('/token', token)
+    app.router.add_get('/v4/spreadsheets/{spreadsheet_id}', get_spreadsheet)
+    app.router.add_post('/v4/spreadsheets/{spreadsheet_id}/values/{sheet_range}', append)
+    return app
+
+
+def _write_key_file(directory: str, token_uri: str) -> str:
+    """
+    Ключ сервисного аккаунта со свежей RSA-парой и адресом фейкового OAuth.
+    """
+
+    _, private_key = rsa.newkeys(2048)
+    path = os.path.join(directory, 'benchmark-key.json')
+
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'benchmark',
+            'private_key_id': 'benchmark',
+            'private_key': private_key.save_pkcs1().decode(),
+            'client_email': 'benchmark@benchmark.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': token_uri
+        }, file)
+
+    return path
+
+
+def _redirect_gspread(base_url: str) -> None:
+    # У gspread нет настройки адреса API - подменяем шаблоны URL его HTTP-клиента
+    for name in dir(gspread.http_client):
+        value = getattr(gspread.http_client, name)
+        if name.isupper() and isinstance(value, str) and value.startswith('https://sheets.googleapis.com'):
+            setattr(gspread.http_client, name, value.replace('https://sheets.googleapis.com', base_url))
+
+
+def _percentile(ordered: list[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def _bench(client, requests: int, concurrency: int) -> None:
+    # Первый запрос авторизуется и кэширует лист - в замер не входит
+    await client.append_rows(_SHEET_NAME, [['warm-up']])
+
+    latencies = []
+    max_threads = threading.active_count()
+    queue = asyncio.Queue()
+    for index in range(requests):
+        queue.put_nowait(index)
+
+    async def worker() -> None:
+        nonlocal max_threads
+        while not queue.empty():
+            index = queue.get_nowait()
+            started = time.perf_counter()
+            await client.append_rows(_SHEET_NAME, [[index, 'benchmark', time.time()]])
+            latencies.append(time.perf_counter() - started)
+            max_threads = max(max_threads, threading.active_count())
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f'{client.get_stats()["backend"]:<8} {requests / elapsed:>8.0f} запросов/сек.  '
+        f'p50 {_percentile(latencies, 0.5) * 1000:>7.1f} мс  '
+        f'p95 {_percentile(latencies, 0.95) * 1000:>7.1f} мс  '
+        f'p99 {_percentile(latencies, 0.99) * 1000:>7.1f} мс  '
+        f'потоков {max_threads}'
+    )
+
+
+async def run(args) -> None:
+    runner = web.AppRunner(create_app(latency=args.latency / 1000))
+    await runner.setup()
+    await web.TCPSite(runner, host='127.0.0.1', port=args.port).start()
+    base_url = f'http://127.0.0.1:{args.port}'
+
+    _redirect_gspread(base_url)
+
+    with tempfile.TemporaryDirectory() as directory:
+        key_file = _write_key_file(directory, f'{base_url}/token')
+        unlimited = GHRateLimiter(1e9, 1e9, burst=args.requests)
+
+        # aiohttp первым: потоки пула, запущенные gspread, остаются жить и попали бы в его замер
+        clients = {
+            'aiohttp': AioGHClient(
+                key_file, SCOPES, _SPREADSHEET_ID, 300, unlimited, 0,
+                connection_limit=args.concurrency, timeout=60, api_url=f'{base_url}/v4/spreadsheets/'
+            ),
+            'gspread': GHClient(key_file, SCOPES, _SPREADSHEET_ID, 300, unlimited, 0)
+        }
+
+        try:
+            for backend in args.backend or list(clients):
+                await _bench(clients[backend], args.requests, args.concurrency)
+        finally:
+            for client in clients.values():
+                await client.stop()
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сравнение клиентов Google Sheets под нагрузкой')
+    parser.add_argument('--requests', type=int, default=2000, help='Кол-во запросов `append_rows`')
+    parser.add_argument('--concurrency', type=int, default=200, help='Одновременных запросов')
+    parser.add_argument('--latency', type=float, default=50, help='Задержка ответа фейкового API, мс')
+    parser.add_argument('--port', type=int, default=8090, help='Порт фейкового API')
+    parser.add_argument('--backend', action='append', choices=['gspread', 'aiohttp'], help='Только этот клиент')
+
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
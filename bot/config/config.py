@@ -20,7 +20,41 @@ WEBHOOK_URL = os.getenv('DOMAIN_NAME')
 
 
 # -- API --
-API_URL = 'https://jsonplaceholder.typicode.com/'
+API_URL = os.getenv('API_URL', 'https://jsonplaceholder.typicode.com/')  # Для нагрузочных тестов - адрес `fake_api`
+
+# Пул соединений HTTP-клиента
+API_CONNECTION_LIMIT = int(os.getenv('API_CONNECTION_LIMIT', 100))
+API_CONNECTION_LIMIT_PER_HOST = int(os.getenv('API_CONNECTION_LIMIT_PER_HOST', 30))
+API_KEEPALIVE_TIMEOUT = float(os.getenv('API_KEEPALIVE_TIMEOUT', 30))  # Сек. простоя соединения до закрытия
+API_DNS_CACHE_TTL = int(os.getenv('API_DNS_CACHE_TTL', 300))  # Сек.
+
+# Таймауты запросов, сек.
+API_TIMEOUT_TOTAL = float(os.getenv('API_TIMEOUT_TOTAL', 10))
+API_TIMEOUT_CONNECT = float(os.getenv('API_TIMEOUT_CONNECT', 3))
+API_TIMEOUT_SOCK_READ = float(os.getenv('API_TIMEOUT_SOCK_READ', 5))
+
+# Кол-во URL, для которых хранятся ETag/Last-Modified и данные ответа
+API_VALIDATORS_MAXSIZE = int(os.getenv('API_VALIDATORS_MAXSIZE', 4096))
+
+# Устойчивость запросов: дедлайн попытки, повторы, выключатель, хеджирование
+API_ATTEMPT_TIMEOUT = float(os.getenv('API_ATTEMPT_TIMEOUT', 3))  # Сек. на одну попытку
+API_RETRY_MAX_ATTEMPTS = int(os.getenv('API_RETRY_MAX_ATTEMPTS', 3))
+API_RETRY_BACKOFF_BASE = float(os.getenv('API_RETRY_BACKOFF_BASE', 0.1))  # Сек.
+API_RETRY_BACKOFF_MAX = float(os.getenv('API_RETRY_BACKOFF_MAX', 2))  # Сек.
+API_RETRY_BUDGET_RATIO = float(os.getenv('API_RETRY_BUDGET_RATIO', 0.1))  # Доля повторов от всех запросов
+API_RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv('API_RETRY_BUDGET_MIN_PER_SECOND', 1))
+API_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('API_CIRCUIT_FAILURE_THRESHOLD', 5))  # Ошибок подряд
+API_CIRCUIT_RECOVERY_TIMEOUT = float(os.getenv('API_CIRCUIT_RECOVERY_TIMEOUT', 30))  # Сек.
+API_HEDGING_ENABLED = os.getenv('API_HEDGING_ENABLED', '0') == '1'
+API_HEDGE_MIN_DELAY = float(os.getenv('API_HEDGE_MIN_DELAY', 0.05))  # Сек.
+
+# Кэш ответов API
+API_CACHE_MAXSIZE = int(os.getenv('API_CACHE_MAXSIZE', 2048))  # Кол-во записей
+API_CACHE_TTL = float(os.getenv('API_CACHE_TTL', 300))  # Сек.
+
+# Предзагрузка коллекций API в память при старте
+API_PREFETCH_ENABLED = os.getenv('API_PREFETCH_ENABLED', '1') == '1'
+API_PREFETCH_REFRESH_INTERVAL = float(os.getenv('API_PREFETCH_REFRESH_INTERVAL', 3600))  # Сек.
 
 
 # -- DATABASE --
@@ -29,6 +63,37 @@ if os.getenv('DATABASE_URL'):
 else:
     DATABASE_URL = 'postgresql+asyncpg://bot_user:12345@db/bot_db'
 
+# Пул соединений
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 20))  # Постоянных соединений
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))  # Временных соединений сверх пула
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Сек. ожидания свободного соединения
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # Сек. жизни соединения, -1 - без ограничения
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'  # Проверять соединение перед выдачей из пула
+DB_POOL_SLOW_WAIT = float(os.getenv('DB_POOL_SLOW_WAIT', 0.5))  # Сек. ожидания, после которых пишется предупреждение
+# Кэш подготовленных выражений asyncpg на соединение, 0 - выключен (нужно за PgBouncer в режиме transaction)
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 500))
+DB_ECHO = os.getenv('DB_ECHO', '0') == '1'  # Логировать все SQL-запросы
+
+# Реплики для чтения: URL через запятую. Пусто - чтение идет из основной БД
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+# Сек. отставания, после которых реплика исключается из чтения.
+# Столько же сек. после своей записи пользователь читает из основной БД, чтобы сразу видеть свои данные
+DB_REPLICA_MAX_LAG = float(os.getenv('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv('DB_REPLICA_CHECK_INTERVAL', 5))  # Сек. между проверками реплик
+
+# Отложенная пакетная запись в БД. Выключена: каждая запись ждала бы пачку до DB_WRITE_BEHIND_MAX_DELAY сек.
+# Включать, когда записей так много, что БД упирается в число транзакций
+DB_WRITE_BEHIND_ENABLED = os.getenv('DB_WRITE_BEHIND_ENABLED', '0') == '1'
+DB_WRITE_BEHIND_BATCH_SIZE = int(os.getenv('DB_WRITE_BEHIND_BATCH_SIZE', 500))  # Строк в пачке
+DB_WRITE_BEHIND_MAX_DELAY = float(os.getenv('DB_WRITE_BEHIND_MAX_DELAY', 0.02))  # Сек. ожидания пачки
+DB_WRITE_BEHIND_MAX_PENDING = int(os.getenv('DB_WRITE_BEHIND_MAX_PENDING', 5000))  # Строк в очереди, сверх - запись ждет
+
+# Секционирование таблиц истории по месяцам (created_at)
+DB_PARTITION_PREMAKE_MONTHS = int(os.getenv('DB_PARTITION_PREMAKE_MONTHS', 2))  # Секций наперед
+DB_PARTITION_MAINTENANCE_INTERVAL = float(os.getenv('DB_PARTITION_MAINTENANCE_INTERVAL', 3600))  # Сек. между проверками
+DB_RETENTION_DAYS = int(os.getenv('DB_RETENTION_DAYS', 0))  # Срок хранения истории, 0 - бессрочно
+DB_RETENTION_MODE = os.getenv('DB_RETENTION_MODE', 'drop')  # drop - удалять старые секции, detach - отсоединять
+
 
 # -- GOOGLE SHEETS API --
 _CREDENTIALS_FILE_NAME = os.getenv('GOOGLE_KEY_NAME')
@@ -39,10 +104,47 @@ SCOPES = [
     'https://www.googleapis.com/auth/drive'
 ]
 
+# Клиент Sheets API: `gspread` - запросы gspread в потоках, `aiohttp` - асинхронный клиент (`models/gh_aio.py`)
+GH_BACKEND = os.getenv('GH_BACKEND', 'gspread')
+GH_HTTP_CONNECTION_LIMIT = int(os.getenv('GH_HTTP_CONNECTION_LIMIT', 20))  # Соединений в пуле `aiohttp`
+GH_HTTP_TIMEOUT = float(os.getenv('GH_HTTP_TIMEOUT', 30))  # Сек. на запрос `aiohttp`
+
+# Сек. до истечения OAuth-токена, когда фоновая задача обновляет его заранее
+GH_TOKEN_REFRESH_MARGIN = float(os.getenv('GH_TOKEN_REFRESH_MARGIN', 300))
+
+# Квоты Sheets API на пользователя (сервисный аккаунт), запросов в минуту - отдельно на чтение и запись
+GH_READ_REQUESTS_PER_MINUTE = float(os.getenv('GH_READ_REQUESTS_PER_MINUTE', 60))
+GH_WRITE_REQUESTS_PER_MINUTE = float(os.getenv('GH_WRITE_REQUESTS_PER_MINUTE', 60))
+GH_RATE_LIMIT_BURST = int(os.getenv('GH_RATE_LIMIT_BURST', 10))  # Запросов, которые проходят без ожидания
+GH_RATE_LIMIT_MAX_RETRIES = int(os.getenv('GH_RATE_LIMIT_MAX_RETRIES', 3))  # Повторов запроса после ответа 429
+
+# Размеры листов: листы растут заранее и в фоне, а заполненный лист продолжается в части `posts_0002` и т.д.
+GH_SHEET_GROW_ROWS = int(os.getenv('GH_SHEET_GROW_ROWS', 10000))  # Строк в новом листе и в каждом расширении
+GH_SHEET_GROW_THRESHOLD = int(os.getenv('GH_SHEET_GROW_THRESHOLD', 2000))  # Свободных строк, меньше - лист растет
+GH_SHEET_MAX_ROWS = int(os.getenv('GH_SHEET_MAX_ROWS', 100000))  # Строк в одной части листа
+GH_SPREADSHEET_MAX_CELLS = int(os.getenv('GH_SPREADSHEET_MAX_CELLS', 10_000_000))  # Предел ячеек таблицы Google
+
+# Пачки строк для листов: очередь `gh_outbox` отправляет новые строки, когда их набралось N или прошло T сек.
+GH_APPEND_BUFFER_ENABLED = os.getenv('GH_APPEND_BUFFER_ENABLED', '1') == '1'  # 0 - отправка сразу после записи
+GH_APPEND_BATCH_SIZE = int(os.getenv('GH_APPEND_BATCH_SIZE', 100))  # N: строк в одном запросе
+GH_APPEND_MAX_DELAY = float(os.getenv('GH_APPEND_MAX_DELAY', 0.5))  # T: сек. ожидания пачки
+
+# Очередь строк для листов в PostgreSQL (`gh_outbox`): строки переносятся в листы фоновой задачей
+GH_OUTBOX_BATCH_SIZE = int(os.getenv('GH_OUTBOX_BATCH_SIZE', 500))  # Строк за один проход, больше в работе не бывает
+GH_OUTBOX_POLL_INTERVAL = float(os.getenv('GH_OUTBOX_POLL_INTERVAL', 1))  # Сек. между проверками очереди
+GH_OUTBOX_BACKOFF_BASE = float(os.getenv('GH_OUTBOX_BACKOFF_BASE', 1))  # Сек. до первого повтора, дальше - вдвое больше
+GH_OUTBOX_BACKOFF_MAX = float(os.getenv('GH_OUTBOX_BACKOFF_MAX', 300))  # Предел паузы между повторами, сек.
+GH_OUTBOX_MAX_ATTEMPTS = int(os.getenv('GH_OUTBOX_MAX_ATTEMPTS', 10))  # Отказов API (4xx) строке, после - строка откладывается
+
 
 # -- Bot commands --
 BOT_COMMANDS = [
     BotCommand(command='/start', description='Приветствие'),
     BotCommand(command='/help', description='Помощь по командам'),
     BotCommand(command='/get', description='Сделать запрос к API'),
+    BotCommand(command='/history', description='История запросов'),
+    BotCommand(command='/stats', description='Статистика запросов'),
 ]
+
+# Кол-во записей на странице /history
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 10))
@@ -0,0 +1,220 @@
+"""
+Локальная замена https://jsonplaceholder.typicode.com/ для нагрузочных тестов.
+
+Отдает те же шесть ресурсов (`users`, `posts`, `comments`, `albums`, `photos`, `todos`),
+объекты которых собираются по схемам Pydantic-моделей из `models/pydantic_api.py`.
+Поддерживает ETag/304, а задержка, доля ошибок и размер объектов настраиваются.
+
+Запуск из директории `bot/`:
+    python -m fake_api.server --port 8080 --latency 20 --jitter 10 --error-rate 0.01 --payload-size 200
+
+После этого боту или нагрузочному тесту достаточно указать `API_URL=http://127.0.0.1:8080/`
+"""
+
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import typing
+
+from aiohttp import web
+from pydantic import BaseModel
+
+from models.pydantic_api import resource_models
+
+
+# Кол-во объектов каждого ресурса - как у оригинального API (см. `available_resources`)
+resource_sizes = {
+    'users': 10,
+    'posts': 100,
+    'comments': 500,
+    'albums': 100,
+    'photos': 5000,
+    'todos': 200
+}
+
+
+def _fake_value(annotation, name: str, index: int, rng: random.Random, payload_size: int):
+    """
+    Генерирует значение поля по его типу.
+
+    :param annotation: Тип поля Pydantic-модели.
+    :param name: Имя поля.
+    :param index: Порядковый номер объекта (совпадает с его id).
+    :param rng: Генератор случайных чисел с фиксированным seed.
+    :param payload_size: Минимальная длина строковых полей.
+    """
+
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _fake_object(annotation, index, rng, payload_size)
+
+    if annotation is bool:
+        return rng.random() < 0.5
+
+    if annotation is int:
+        # Ссылки на другие ресурсы (`user_id`, `post_id`, ...) - в пределах их размера
+        return rng.randint(1, 10)
+
+    if annotation is float:
+        return round(rng.uniform(-90, 90), 4)
+
+    if annotation is str:
+        value = f'{name} {index}'
+        return value + ' lorem ipsum' * max(0, (payload_size - len(value)) // 12)
+
+    # Optional и прочие обертки - берем первый вложенный тип
+    args = typing.get_args(annotation)
+    if args:
+        return _fake_value(args[0], name, index, rng, payload_size)
+
+    raise TypeError(f'Не умею генерировать значение типа {annotation!r}')
+
+
+def _fake_object(pydantic_model: type[BaseModel], index: int, rng: random.Random, payload_size: int) -> dict:
+    """
+    Собирает объект в формате API: ключи - алиасы модели (camelCase), поле с алиасом `id` - порядковый номер.
+    """
+
+    obj = {}
+    for name, field in pydantic_model.model_fields.items():
+        key = field.alias or name
+
+        if key == 'id':
+            obj[key] = index
+        else:
+            obj[key] = _fake_value(field.annotation, name, index, rng, payload_size)
+
+    return obj
+
+
+class FakeAPI:
+    """
+    Данные и обработчики фейкового API.
+    Тела ответов сериализуются один раз при запуске.
+    """
+
+    def __init__(self, latency: float, jitter: float, error_rate: float, payload_size: int, seed: int):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+
+        # Ресурс -> (тело коллекции, {id: тело объекта})
+        self._bodies: dict[str, tuple[bytes, dict[int, bytes]]] = {}
+
+        for resource, pydantic_model in resource_models.items():
+            objects = [
+                _fake_object(pydantic_model, index, self.rng, payload_size)
+                for index in range(1, resource_sizes[resource] + 1)
+            ]
+            self._bodies[resource] = (
+                json.dumps(objects).encode(),
+                {obj['id']: json.dumps(obj).encode() for obj in objects}
+            )
+
+        # Статистика
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+
+    async def _delay(self) -> None:
+        delay = max(0.0, self.rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+        if delay:
+            await asyncio.sleep(delay)
+
+    def _respond(self, request: web.Request, body: bytes) -> web.Response:
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+
+        return web.Response(body=body, content_type='application/json', headers={'ETag': etag})
+
+    async def handle_collection(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await self._delay()
+
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+
+        resource = request.match_info['resource']
+        if resource not in self._bodies:
+            return web.json_response({}, status=404)
+
+        return self._respond(request, self._bodies[resource][0])
+
+    async def handle_object(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await self._delay()
+
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503)
+
+        resource = request.match_info['resource']
+        body = self._bodies.get(resource, (b'', {}))[1].get(int(request.match_info['resource_id']))
+        if body is None:
+            return web.json_response({}, status=404)
+
+        return self._respond(request, body)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'requests': self.requests,
+            'errors': self.errors,
+            'not_modified': self.not_modified
+        })
+
+
+def create_app(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+               payload_size: int = 0, seed: int = 42) -> web.Application:
+    """
+    Создает aiohttp-приложение фейкового API.
+
+    :param latency: Средняя задержка ответа, сек.
+    :param jitter: Стандартное отклонение задержки, сек.
+    :param error_rate: Доля ответов 503.
+    :param payload_size: Минимальная длина строковых полей объектов.
+    :param seed: Seed генератора - одинаковые параметры дают одинаковые данные и ошибки.
+    """
+
+    fake_api = FakeAPI(latency, jitter, error_rate, payload_size, seed)
+
+    app = web.Application()
+    app.router.add_get('/_stats', fake_api.handle_stats)
+    app.router.add_get('/{resource}', fake_api.handle_collection)
+    app.router.add_get('/{resource}/{resource_id:\\d+}', fake_api.handle_object)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Фейковый API для нагрузочных тестов')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0, help='Средняя задержка ответа, мс')
+    parser.add_argument('--jitter', type=float, default=0, help='Разброс задержки, мс')
+    parser.add_argument('--error-rate', type=float, default=0, help='Доля ответов 503, от 0 до 1')
+    parser.add_argument('--payload-size', type=int, default=0, help='Мин. длина строковых полей, символов')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    app = create_app(
+        latency=args.latency / 1000,
+        jitter=args.jitter / 1000,
+        error_rate=args.error_rate,
+        payload_size=args.payload_size,
+        seed=args.seed
+    )
+
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level='INFO')
+    main()
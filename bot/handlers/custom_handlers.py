@@ -14,7 +14,10 @@ from aiogram.fsm.context import FSMContext
 
 from sqlalchemy.exc import SQLAlchemyError
 
-from api.api import get_json_response
+from api.api import get_model_response
+from api.cache import api_cache
+from api.prefetch import resource_index
+from api.resilience import CircuitOpenError
 from config.config import API_URL
 from states.states import APIResponseStates
 from keyboard.api_get_keyboard import api_get_keyboard, back_and_cancel_keyboard
@@ -29,8 +32,6 @@ from models.pydantic_api import (
     TodoModel
 )
 
-from .utils import from_camel_to_snake_json_keys
-
 
 custom_router = Router(name='custom_router')
 
@@ -48,6 +49,8 @@ available_resources = {
 async def _get_api_data(resource: str, resource_id: int, pydantic_model):
     """
     Функция для выполнения запросов к API и трансформации данных.
+    Сначала ищет объект в предзагруженном индексе, затем в кэше.
+    Результат запроса кэшируется по ключу `(resource, resource_id)`.
 
     :param resource: Название URL, по которому был отправлен запрос.
     :param resource_id: ID выбранного ресурса.
@@ -56,31 +59,41 @@ async def _get_api_data(resource: str, resource_id: int, pydantic_model):
     :return: Pydantic-модель с данными внутри.
     """
 
-    logging.info('Отправляю запрос на URL {API_URL}{resource}/{resource_id}'.format(
-        API_URL=API_URL,
-        resource=resource,
-        resource_id=resource_id
-    ))
-
-    # Отправляем запрос
-    data = await get_json_response(
-        API_URL,
-        resource + '/' + str(resource_id)
-    )
-
-    # Трансформируем ключи из CamelCase в snake_case
-    data = await from_camel_to_snake_json_keys(data)
+    # Коллекция уже в памяти - сеть не нужна
+    validated_data = resource_index.get(resource, resource_id)
+    if validated_data is not None:
+        return validated_data
+
+    async def fetch():
+        logging.info('Отправляю запрос на URL {API_URL}{resource}/{resource_id}'.format(
+            API_URL=API_URL,
+            resource=resource,
+            resource_id=resource_id
+        ))
+
+        # Отправляем запрос. Байты ответа сразу валидируются в модель,
+        # ключи из CamelCase в snake_case переводят алиасы модели.
+        return await get_model_response(
+            API_URL,
+            resource + '/' + str(resource_id),
+            pydantic_model
+        )
 
-    validated_data = pydantic_model(**data)
+    # Одинаковые запросы берутся из кэша, а одновременные - объединяются в один
+    validated_data = await api_cache.get_or_fetch((resource, resource_id), fetch)
 
     return validated_data
 
 
-async def _save_data_into_db(db, validated_data, resource: str, telegram_user_id):
+async def _save_data_into_db(db, gh, validated_data, resource: str, telegram_user_id):
     """
-    Функция-исполнитель для работы с БД.
+    Функция-исполнитель для работы с БД и Google Sheets.
+
+    Строка для Google Sheets записывается в БД в той же транзакции, что и данные (очередь `gh_outbox`),
+    а в лист ее переносит фоновая задача - ответ пользователю не ждет Google Sheets.
 
     :param db: Сервис БД для сохранения объекта.
+    :param gh: Сервис Google Sheets, собирает строку листа.
     :param validated_data: Pydantic-модель с данными.
     :param resource: Название метода, который необходимо вызвать для сохранения.
     Соответствует названию ресурса.
@@ -89,24 +102,12 @@ async def _save_data_into_db(db, validated_data, resource: str, telegram_user_id
     :return: JSON-Pydantic модель с данными из БД.
     """
 
-    logging.info('Сохраняю данные в БД')
-    return await db.create_obj(validated_data, resource=resource, telegram_user_id=telegram_user_id)
-
-
-async def _save_data_into_gh(gh, validated_data, resource: str, telegram_user_id):
-    """
-    Функция-исполнитель для работы с Google Sheets.
-
-    :param gh: Сервис Google Sheets для сохранения объекта.
-    :param validated_data: Pydantic-модель с данными.
-    :param resource: Название метода, который необходимо вызвать для сохранения.
-    Соответствует названию ресурса.
-    :param telegram_user_id: ID пользователя.
-    """
+    sheet_row = gh.make_row(validated_data, resource=resource, telegram_user_id=telegram_user_id)
 
-    logging.info('Сохраняю данные в Google Sheets')
-    await gh.create_obj(validated_data, resource=resource, telegram_user_id=telegram_user_id)
-    logging.info('Успешно сохранены данные в Google Sheets')
+    logging.info('Сохраняю данные в БД и очередь Google Sheets')
+    return await db.create_obj(
+        validated_data, resource=resource, telegram_user_id=telegram_user_id, sheet_row=sheet_row
+    )
 
 
 @custom_router.message(Command(commands=['get']), StateFilter(None))
@@ -285,7 +286,7 @@ async def get_response_data_handler(message: Message, state: FSMContext, db, gh)
 
     Служит связующим звеном между данными и функциями-исполнителями.
     Вызывает функцию `_get_api_data`, после чего данные из нее
-    передаются в функции `_save_data_into_gh` и `_save_data_into_db`.
+    передаются в функцию `_save_data_into_db` (БД и очередь Google Sheets).
 
     В конце чистит состояние.
     """
@@ -306,27 +307,19 @@ async def get_response_data_handler(message: Message, state: FSMContext, db, gh)
             )
             await message.answer('Готово!')
 
-            # Сохраняем данные в Google Sheets
-            await message.answer('Сохраняю данные в Google Sheets..')
-
-            await _save_data_into_gh(
-                gh=gh,
-                validated_data=api_data,
-                resource=data['resource'],
-                telegram_user_id=message.from_user.id
-            )
-            await message.answer('Готово!')
-
-            # Сохраняем в PostgreSQL
+            # Сохраняем в PostgreSQL, строка для Google Sheets уходит в очередь
             await message.answer('Сохраняю данные в БД..')
 
             db_data = await _save_data_into_db(
                 db=db,
+                gh=gh,
                 validated_data=api_data,
                 resource=data['resource'],
                 telegram_user_id=message.from_user.id
             )
-            await message.answer(f'Готово! Ответ БД в JSON-формате:\n{db_data}')
+            await message.answer(
+                f'Готово! Ответ БД в JSON-формате:\n{db_data}\n\nДанные будут добавлены в Google Sheets в фоне.'
+            )
 
             # Очищаем состояние
             await state.clear()
@@ -336,6 +329,10 @@ async def get_response_data_handler(message: Message, state: FSMContext, db, gh)
             )
 
 
+        except CircuitOpenError as e:
+            logging.error(f'API недоступно, запрос не отправлялся:\n{e}')
+            await message.answer('API сейчас недоступно, попробуйте позже')
+
         except SQLAlchemyError as e:
             logging.error(f'Произошла ошибка при при сохранении в БД:\n{e}')
             await message.answer('Какая-то ошибка при сохранении в БД, проверьте логи')
@@ -25,7 +25,9 @@ async def help_handler(message: Message):
                               '/get - Отправляю запрос по API.\n'
                               '1.Даю на выбор параметры, из которых будет составлен URL.\n'
                               '2.Сохраняю результат запроса в базе данных.\n'
-                              '3.Показываю что получилось, в формате JSON.'
+                              '3.Показываю что получилось, в формате JSON.\n'
+                              '/history - Показываю историю твоих запросов, от новых к старым.\n'
+                              '/stats - Считаю твои запросы по ресурсам.'
                          )
 
 
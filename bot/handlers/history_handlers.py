@@ -0,0 +1,100 @@
+"""
+Обработчики сценариев /history и /stats: история запросов пользователя по всем ресурсам
+постранично и сводка по ним.
+"""
+
+
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command, StateFilter
+from aiogram.types import Message, CallbackQuery
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from keyboard.history_keyboard import HistoryCallback, history_keyboard
+from service.db import ServiceDB, HistoryPage, UsageStats
+
+
+history_router = Router(name='history_router')
+
+
+def _format_page(page: HistoryPage) -> str:
+    """
+    Текст страницы истории: по строке на запрос.
+    """
+
+    if not page.entries:
+        return 'История пуста. Сделайте запрос командой /get'
+
+    lines = [
+        f'<code>{entry.record.created_at:%d.%m.%Y %H:%M:%S}</code>  /{entry.resource}/{entry.api_id}'
+        for entry in page.entries
+    ]
+
+    return 'История запросов:\n' + '\n'.join(lines)
+
+
+@history_router.message(Command(commands=['history']), StateFilter(None))
+async def history_command_handler(message: Message, db: ServiceDB):
+    logging.info('Вызываем обработчик `/history`')
+
+    try:
+        page = await db.get_history(message.from_user.id)
+    except SQLAlchemyError:
+        await message.answer('Не удалось получить историю. Попробуйте позже.')
+        return
+
+    await message.answer(_format_page(page), reply_markup=history_keyboard(page))
+
+
+@history_router.callback_query(HistoryCallback.filter())
+async def history_page_handler(callback: CallbackQuery, callback_data: HistoryCallback, db: ServiceDB):
+    logging.info('Вызываем обработчик `history_page_handler`')
+
+    try:
+        page = await db.get_history(callback.from_user.id, cursor=callback_data.to_cursor(), older=callback_data.older)
+    except SQLAlchemyError:
+        await callback.answer('Не удалось получить историю. Попробуйте позже.')
+        return
+
+    await callback.answer()
+    # Страница листается в том же сообщении
+    await callback.message.edit_text(_format_page(page), reply_markup=history_keyboard(page))
+
+
+def _format_stats(stats: UsageStats) -> str:
+    """
+    Текст сводки: итог и строка на ресурс.
+    """
+
+    if not stats.resources:
+        return 'Запросов пока нет. Сделайте запрос командой /get'
+
+    lines = [
+        'Статистика запросов:',
+        f'Всего: {stats.requests}',
+        f'Первый: <code>{stats.first_at:%d.%m.%Y %H:%M:%S}</code>',
+        f'Последний: <code>{stats.last_at:%d.%m.%Y %H:%M:%S}</code>',
+        f'Любимые ресурсы: {", ".join(f"/{resource}" for resource in stats.favourites)}',
+        ''
+    ]
+    lines += [
+        f'/{resource} - {usage.requests}, последний <code>{usage.last_at:%d.%m.%Y %H:%M:%S}</code>'
+        for resource, usage in stats.resources.items()
+    ]
+
+    return '\n'.join(lines)
+
+
+@history_router.message(Command(commands=['stats']), StateFilter(None))
+async def stats_command_handler(message: Message, db: ServiceDB):
+    logging.info('Вызываем обработчик `/stats`')
+
+    try:
+        stats = await db.get_usage_stats(message.from_user.id)
+    except SQLAlchemyError:
+        await message.answer('Не удалось получить статистику. Попробуйте позже.')
+        return
+
+    await message.answer(_format_stats(stats))
@@ -0,0 +1,58 @@
+"""
+Модуль с клавиатурой для сценария /history
+"""
+
+
+from datetime import datetime, timedelta
+
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from service.db import HistoryCursor, HistoryPage
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class HistoryCallback(CallbackData, prefix='history'):
+    """
+    Курсор страницы в callback_data кнопки (лимит Telegram - 64 байта).
+    Время записи хранится в микросекундах, чтобы курсор восстанавливался без потерь.
+    """
+
+    older: bool
+    created_at: int
+    id: int
+    resource: str
+
+    @classmethod
+    def from_cursor(cls, cursor: HistoryCursor, older: bool) -> 'HistoryCallback':
+        return cls(
+            older=older,
+            created_at=(cursor.created_at - _EPOCH) // timedelta(microseconds=1),
+            id=cursor.id,
+            resource=cursor.resource
+        )
+
+    def to_cursor(self) -> HistoryCursor:
+        return HistoryCursor(_EPOCH + timedelta(microseconds=self.created_at), self.id, self.resource)
+
+
+def history_keyboard(page: HistoryPage) -> InlineKeyboardMarkup | None:
+    """
+    Кнопки перехода к соседним страницам истории. None - если соседних страниц нет.
+    """
+
+    buttons = []
+
+    if page.newer is not None:
+        buttons.append(InlineKeyboardButton(
+            text='⬅️ Новее', callback_data=HistoryCallback.from_cursor(page.newer, older=False).pack()
+        ))
+
+    if page.older is not None:
+        buttons.append(InlineKeyboardButton(
+            text='Старше ➡️', callback_data=HistoryCallback.from_cursor(page.older, older=True).pack()
+        ))
+
+    return InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
@@ -1,4 +1,7 @@
 import logging
+import time
+from contextlib import contextmanager
+
 from aiohttp import web
 
 from aiogram import Dispatcher, Router, Bot
@@ -14,18 +17,33 @@ from config.config import (
     WEBHOOK_URL,
     WEBHOOK_PATH,
 
-    BOT_COMMANDS
+    BOT_COMMANDS,
+
+    API_PREFETCH_ENABLED,
+    API_PREFETCH_REFRESH_INTERVAL,
+
+    DB_PARTITION_MAINTENANCE_INTERVAL,
+    DB_REPLICA_CHECK_INTERVAL
 )
 
 from handlers.default_handlers import default_router
 from handlers.custom_handlers import custom_router
+from handlers.history_handlers import history_router
+
+# API
+from api.api import api_client
+from api.prefetch import resource_index
+from models.pydantic_api import resource_models
 
 # БД
 from models.db import create_tables
+from models.partitions import partition_maintainer
+from models.replicas import replica_set
 from middlewares.middlewares import ServicesMiddleware
 
 # Google Sheets
-from models.google_sheets import create_google_sheets
+from models.google_sheets import create_google_sheets, gh_client
+from service.gh_outbox import gh_outbox_dispatcher
 
 from injectable import load_injection_container
 
@@ -37,6 +55,7 @@ bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTM
 main_router = Router()
 
 main_router.include_router(custom_router)
+main_router.include_router(history_router)
 main_router.include_router(default_router)
 
 # Создаем диспетчера
@@ -75,30 +94,72 @@ async def clear_webhook(bot_instance: Bot) -> None:
         logging.error(f'Произошла ошибка при очистке вебхука:\n{e}')
 
 
+@contextmanager
+def _timed(timings: dict[str, float], step: str):
+    """
+    Записывает в `timings` длительность шага запуска, сек.
+    """
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[step] = time.perf_counter() - started
+
+
 async def loader() -> web.AppRunner:
     """
     Сборка и настройка всех частей бота:
-    Веб-приложение, Вебхук для бота, БД, Листы Google Sheets, команды.
+    Веб-приложение, Вебхук для бота, HTTP-клиент API, БД, Листы Google Sheets, команды.
     Возвращает объект Runner для управления веб-приложением.
     """
 
+    timings: dict[str, float] = {}
+    started = time.perf_counter()
+
     # Загрузка команд в бота
-    await bot.set_my_commands(BOT_COMMANDS)
+    with _timed(timings, 'команды'):
+        await bot.set_my_commands(BOT_COMMANDS)
+
+    with _timed(timings, 'API'):
+        # Создаем пул HTTP-соединений к API
+        await api_client.start()
+
+        # Загружаем коллекции API в память и обновляем их по расписанию
+        if API_PREFETCH_ENABLED:
+            await resource_index.warm_up(resource_models)
+            resource_index.start_refreshing(resource_models, interval=API_PREFETCH_REFRESH_INTERVAL)
 
     # Загрузка контейнера для зависимостей
     load_injection_container()
 
-    # Создаем таблицы БД если их нет
-    await create_tables()
+    # Создаем таблицы БД если их нет. DDL выполняется, только если схема моделей изменилась
+    with _timed(timings, 'схема БД'):
+        await create_tables()
+
+    # Создаем секции наперед и удаляем устаревшие по расписанию
+    partition_maintainer.start(interval=DB_PARTITION_MAINTENANCE_INTERVAL)
+
+    # Проверяем реплики для чтения до первого запроса и дальше по расписанию
+    with _timed(timings, 'реплики БД'):
+        await replica_set.check_once(timeout=DB_REPLICA_CHECK_INTERVAL)
+    replica_set.start(interval=DB_REPLICA_CHECK_INTERVAL)
 
     # Создаем листы в Google Sheets
-    await create_google_sheets()
+    with _timed(timings, 'Google Sheets'):
+        await create_google_sheets()
+    # Клиент Google Sheets уже в кэше - дальше его токен обновляется в фоне
+    gh_client.start_refreshing()
+    # Строки из очереди gh_outbox, в том числе оставшиеся с прошлого запуска, переносятся в листы в фоне
+    gh_outbox_dispatcher.start()
 
     # Регистрация middleware БД
     dp.message.outer_middleware(ServicesMiddleware())
+    dp.callback_query.outer_middleware(ServicesMiddleware())  # Кнопки /history читают историю из БД
 
     # Инициализируем webhook
-    await _set_webhook(bot_instance=bot)
+    with _timed(timings, 'вебхук'):
+        await _set_webhook(bot_instance=bot)
 
     # Создаем веб-приложение
     app = web.Application()
@@ -112,4 +173,9 @@ async def loader() -> web.AppRunner:
     site = web.TCPSite(runner, host=WEB_SERVER_HOST, port=WEB_SERVER_PORT)
     await site.start()
 
+    logging.info(
+        f'Бот запущен за {time.perf_counter() - started:.2f} сек.: '
+        + ', '.join(f'{step} {seconds:.3f}' for step, seconds in timings.items())
+    )
+
     return runner
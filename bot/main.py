@@ -5,7 +5,20 @@
 import asyncio
 import logging
 
+from injectable import inject
+
 from loader import loader, bot, clear_webhook
+from api.api import api_client, validator_store
+from api.cache import api_cache
+from api.prefetch import resource_index
+from api.resilience import api_resilience
+from service.db import DBWriteBehindQueue
+from service.gh_outbox import gh_outbox_dispatcher
+from models.db import engine, pool_metrics
+from models.partitions import partition_maintainer
+from models.replicas import replica_set
+from models.google_sheets import gh_client, gh_sheet_router
+from models.gh_rate_limit import gh_rate_limiter
 
 
 async def main():
@@ -15,9 +28,29 @@ async def main():
         await asyncio.Future()
     finally:
         await runner.cleanup()
+        # Дописываем в БД и Google Sheets все, что осталось в очередях
+        await inject(DBWriteBehindQueue).close()
+        await gh_outbox_dispatcher.stop()
+        await gh_sheet_router.stop()
         # Очищаем вебхук, на всякий случай
         await clear_webhook(bot_instance=bot)
         await bot.session.close()
+        await resource_index.stop()
+        await partition_maintainer.stop()
+        await replica_set.stop()
+        await gh_client.stop()
+        await api_client.close()
+        logging.info(f'Статистика кэша API: {api_cache.get_stats()}')
+        logging.info(f'Статистика условных запросов API: {validator_store.get_stats()}')
+        logging.info(f'Статистика устойчивости запросов к API: {api_resilience.get_stats()}')
+        logging.info(f'Статистика пула соединений БД: {pool_metrics.get_stats()}')
+        logging.info(f'Статистика обслуживания секций БД: {partition_maintainer.get_stats()}')
+        logging.info(f'Статистика реплик БД: {replica_set.get_stats()}')
+        logging.info(f'Статистика клиента Google Sheets: {gh_client.get_stats()}')
+        logging.info(f'Статистика ограничителя запросов Google Sheets: {gh_rate_limiter.get_stats()}')
+        logging.info(f'Статистика листов Google Sheets: {gh_sheet_router.get_stats()}')
+        logging.info(f'Статистика очереди Google Sheets: {gh_outbox_dispatcher.get_stats()}')
+        await engine.dispose()
 
 
 if __name__ == '__main__':
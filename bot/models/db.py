@@ -3,165 +3,717 @@
 ORM - SQLAlchemy.
 """
 
+import hashlib
+import logging
 from datetime import datetime
 
-from sqlalchemy import Integer, String, Identity, DateTime, Boolean, Float, ForeignKey
-from sqlalchemy.orm import declarative_base, Mapped, mapped_column, relationship
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import Integer, BigInteger, String, Identity, DateTime, LargeBinary, ForeignKey, Index, event, func, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.schema import CreateTable, CreateIndex
+from sqlalchemy.orm import declarative_base, declared_attr, Mapped, mapped_column
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+
+from config.config import (
+    DATABASE_URL,
+    DATABASE_REPLICA_URLS,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_POOL_SLOW_WAIT,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_ECHO,
+    DB_PARTITION_PREMAKE_MONTHS
+)
+from models.pydantic_api import resource_models
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url=url,
+        echo=DB_ECHO,  # Логирование каждого запроса дорого, включается только для отладки
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # Кэш подготовленных выражений asyncpg: повторяющиеся запросы не разбираются сервером заново
+        connect_args={'prepared_statement_cache_size': DB_STATEMENT_CACHE_SIZE}
+    )
+
+
+# Основная БД: все записи и DDL
+engine = _create_engine(DATABASE_URL)
+# Реплики только для чтения, маршрутизацию между ними ведет `models.replicas`
+replica_engines = [_create_engine(url) for url in DATABASE_REPLICA_URLS]
+Base = declarative_base()
 
-from config.config import DATABASE_URL
 
+class PoolMetrics:
+    """
+    Метрики пула соединений `engine`.
 
-engine = create_async_engine(url=DATABASE_URL, echo=True) # echo=True для тестов
-Base = declarative_base()
+    Счетчики обновляются событиями пула, время ожидания соединения
+    сообщает менеджер сессий (`observe_wait`).
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.slow_waits = 0
+
+        event.listen(pool, 'connect', self._on_connect)
+        event.listen(pool, 'checkout', self._on_checkout)
+        event.listen(pool, 'invalidate', self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self.checkouts += 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        self.invalidated += 1
+
+    def observe_wait(self, seconds: float) -> None:
+        """
+        Учитывает время получения соединения из пула.
+        """
+
+        self.waits += 1
+        self.wait_total += seconds
+        self.wait_max = max(self.wait_max, seconds)
+
+        if seconds >= DB_POOL_SLOW_WAIT:
+            self.slow_waits += 1
+            logging.warning(
+                f'Соединение с БД получено через {seconds:.2f} сек., пул занят: '
+                f'{self.pool.checkedout()} из {self.pool.size()} (+{max(0, self.pool.overflow())} сверх пула)'
+            )
+
+    def get_stats(self) -> dict:
+        return {
+            'size': self.pool.size(),
+            'checked_out': self.pool.checkedout(),
+            'checked_in': self.pool.checkedin(),
+            'overflow': max(0, self.pool.overflow()),
+            'connects': self.connects,
+            'checkouts': self.checkouts,
+            'invalidated': self.invalidated,
+            'wait_avg': self.wait_total / self.waits if self.waits else 0.0,
+            'wait_max': self.wait_max,
+            'slow_waits': self.slow_waits
+        }
+
+
+pool_metrics = PoolMetrics(engine.sync_engine.pool)
 
 # --- Модели
+class PayloadDBModel(Base):
+    """
+    Данные объекта API, записанные один раз.
+
+    Ключ - sha256 от названия ресурса и JSON объекта, поэтому одинаковые ответы API
+    хранятся в одной записи, а таблицы истории ссылаются на нее по `payload_hash`.
+    """
+
+    __tablename__ = 'api_payloads'
+
+    content_hash: Mapped[bytes] = mapped_column(LargeBinary, primary_key=True)
+    resource: Mapped[str] = mapped_column(String)
+    data: Mapped[dict] = mapped_column(JSONB)
+
+    def __repr__(self):
+        return f'Payload {self.resource} {self.content_hash.hex()[:12]}'
+
+
 class BaseDBModel(Base):
     """
     Данный абстрактный класс определяет поля, который присущи всем таблицам БД,
     т.е. информацию о пользователе и времени запроса.
+    Сами данные объекта хранятся в `api_payloads`, запись истории лишь ссылается на них.
+    Каждая таблица истории секционирована по `created_at`: секция на месяц.
 
     Все далее созданные классы наследуют эти аттрибуты(поля).
     """
 
     __abstract__ = True
 
-    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True, index=True)
-    telegram_user_id: Mapped[int] = mapped_column(Integer, index=True)
-    created_at: Mapped[DateTime] = mapped_column(DateTime, default=datetime.now())
+    @declared_attr.directive
+    def __table_args__(cls):
+        return (
+            # История пользователя читается по ключу (telegram_user_id, created_at, id) - см. `ServiceDB.get_history`.
+            # Индекс заменяет отдельный индекс по telegram_user_id: тот - его префикс
+            Index(f'ix_{cls.__tablename__}_user_history', 'telegram_user_id', 'created_at', 'id'),
+            # Таблицы истории секционированы по месяцам, секции создает и удаляет `models.partitions`
+            {'postgresql_partition_by': 'RANGE (created_at)'}
+        )
+
+    # Ключ секционированной таблицы обязан включать колонку секционирования
+    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True)
+    telegram_user_id: Mapped[int] = mapped_column(Integer)
+    # Время ставит сама БД, и оно возвращается тем же INSERT ... RETURNING
+    created_at: Mapped[DateTime] = mapped_column(DateTime, primary_key=True, server_default=func.now(), index=True)
+    payload_hash: Mapped[bytes] = mapped_column(ForeignKey('api_payloads.content_hash'), index=True)
+
+    def __repr__(self):
+        return f'{type(self).__name__} {self.id}, telegram user {self.telegram_user_id}'
 
 
 class UserDBModel(BaseDBModel):
+    """
+    Пользователь вместе с адресом и компанией - один JSON в `api_payloads`,
+    отдельные таблицы addresses, geos и companies больше не нужны.
+    """
+
     __tablename__ = 'users'
 
-    user_id: Mapped[int]
-    name: Mapped[str]
-    username: Mapped[str]
-    email: Mapped[str]
-    phone: Mapped[str]
-    website: Mapped[str]
 
-    address: Mapped['AddressDBModel'] = relationship(back_populates='user')
-    company: Mapped['CompanyDBModel'] = relationship(back_populates='user')
+class PostDBModel(BaseDBModel):
+    __tablename__ = 'posts'
+
+
+class CommentDBModel(BaseDBModel):
+    __tablename__ = 'comments'
+
+
+class AlbumDBModel(BaseDBModel):
+    __tablename__ = 'albums'
 
-    def __repr__(self):
-        return f'User {self.user_id}'
 
+class PhotoDBModel(BaseDBModel):
+    __tablename__ = 'photos'
+
+
+class TodoDBModel(BaseDBModel):
+    __tablename__ = 'todos'
 
-class AddressDBModel(Base):
+
+class UserUsageStatsDBModel(Base):
     """
-    Данная модель не нацелена на отслеживание истории действий пользователя, поэтому не наследуется от `BaseDBModel`
+    Сводка запросов пользователя по ресурсу: кол-во, первый и последний запрос.
+    Обновляется в той же транзакции, что и запись истории, поэтому `/stats` читает
+    не больше строки на ресурс вместо COUNT(*) по таблицам истории.
+    Считается за все время - удаление старых секций сводку не уменьшает.
     """
 
-    __tablename__ = 'addresses'
+    __tablename__ = 'user_usage_stats'
+
+    telegram_user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    resource: Mapped[str] = mapped_column(String, primary_key=True)
+    requests: Mapped[int] = mapped_column(BigInteger)
+    first_at: Mapped[DateTime] = mapped_column(DateTime)
+    last_at: Mapped[DateTime] = mapped_column(DateTime)
+
 
-    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True, index=True)
-    street: Mapped[str] = mapped_column(String)
-    suite: Mapped[str] = mapped_column(String)
-    city: Mapped[str] = mapped_column(String)
-    zipcode: Mapped[str] = mapped_column(String)
-    geo: Mapped['GeoDBModel'] = relationship(back_populates='address')
+class GHOutboxDBModel(Base):
+    """
+    Очередь строк для Google Sheets. Строка добавляется в той же транзакции, что и запись истории,
+    и удаляется после записи в таблицу (см. `service.gh_outbox`).
+    """
 
-    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
-    user: Mapped['UserDBModel'] = relationship(back_populates='address')
+    __tablename__ = 'gh_outbox'
 
+    id: Mapped[int] = mapped_column(BigInteger, Identity(), primary_key=True)
+    sheet: Mapped[str] = mapped_column(String)
+    row: Mapped[list] = mapped_column(JSONB)
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    attempts: Mapped[int] = mapped_column(Integer, server_default='0')
+    next_attempt_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), index=True)
+    last_error: Mapped[str | None] = mapped_column(String, nullable=True)
 
-class GeoDBModel(Base):
+
+class SchemaVersionDBModel(Base):
     """
-    Данная модель не нацелена на отслеживание истории действий пользователя, поэтому не наследуется от `BaseDBModel`
+    Отпечатки схемы, которые уже применены к БД (см. `create_tables`).
     """
 
-    __tablename__ = 'geos'
+    __tablename__ = 'schema_version'
+
+    fingerprint: Mapped[str] = mapped_column(String(64), primary_key=True)
+    applied_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+
 
-    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True, index=True)
-    lat: Mapped[float] = mapped_column(Float)
-    lng: Mapped[float] = mapped_column(Float)
+# --- Секционирование
+def get_history_tables() -> list[str]:
+    """
+    Названия таблиц истории (наследников `BaseDBModel`).
+    """
 
-    address_id: Mapped[int] = mapped_column(ForeignKey('addresses.id'))
-    address: Mapped['AddressDBModel'] = relationship(back_populates='geo')
+    return [model.__tablename__ for model in BaseDBModel.__subclasses__()]
 
 
-class CompanyDBModel(Base):
+def add_months(month: datetime, months: int) -> datetime:
     """
-    Данная модель не нацелена на отслеживание истории действий пользователя, поэтому не наследуется от `BaseDBModel`
+    Сдвигает начало месяца на `months` месяцев.
     """
 
-    __tablename__ = 'companies'
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
 
-    id: Mapped[int] = mapped_column(Integer, Identity(), primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String)
-    catchPhrase: Mapped[str] = mapped_column(String)
-    bs: Mapped[str] = mapped_column(String)
 
-    user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
-    user: Mapped['UserDBModel'] = relationship(back_populates='company')
+def get_partition_name(table: str, month: datetime) -> str:
+    return f'{table}_p{month:%Y%m}'
 
 
-class PostDBModel(BaseDBModel):
-    __tablename__ = 'posts'
+def get_default_partition_name(table: str) -> str:
+    """
+    Секция по умолчанию: сюда попадают записи месяца, секцию которого еще не создали,
+    вместо ошибки "no partition of relation found for row".
+    """
 
-    post_id: Mapped[int] = mapped_column(Integer, index=True)
-    user_id: Mapped[int] = mapped_column(Integer, index=True)
-    title: Mapped[str] = mapped_column(String)
-    body: Mapped[str] = mapped_column(String)
+    return f'{table}_default'
 
-    def __repr__(self):
-        return f'Post {self.post_id}, user {self.user_id}'
 
+async def get_current_month(connection) -> datetime:
+    """
+    Начало текущего месяца по часам БД: по ним же заполняется `created_at`.
+    """
 
-class CommentDBModel(BaseDBModel):
-    __tablename__ = 'comments'
+    return (await connection.execute(text("SELECT date_trunc('month', localtimestamp)"))).scalar()
 
-    post_id: Mapped[int] = mapped_column(Integer, index=True)
-    comment_id: Mapped[int] = mapped_column(Integer, index=True)
-    name: Mapped[str] = mapped_column(String)
-    email: Mapped[str] = mapped_column(String)
-    body: Mapped[str] = mapped_column(String)
 
-    def __repr__(self):
-        return f'Comment {self.comment_id}, post {self.post_id}'
+async def ensure_partitions(connection, since: datetime | None = None) -> int:
+    """
+    Создает недостающие месячные секции всех таблиц истории:
+    с месяца `since` (по умолчанию - текущего) и на `DB_PARTITION_PREMAKE_MONTHS` месяцев вперед,
+    а также секцию по умолчанию. Индексы и внешние ключи секции получают от родительской таблицы.
 
+    Если записи месяца уже попали в секцию по умолчанию (обслуживание отстало), они переносятся
+    в созданную секцию месяца - иначе PostgreSQL не дал бы ее создать.
 
-class AlbumDBModel(BaseDBModel):
-    __tablename__ = 'albums'
+    :return: Кол-во созданных секций.
+    """
 
-    user_id: Mapped[int] = mapped_column(Integer, index=True)
-    album_id: Mapped[int] = mapped_column(Integer, index=True)
-    title: Mapped[str] = mapped_column(String)
+    current_month = await get_current_month(connection)
+    month = min(since or current_month, current_month)
+    last_month = add_months(current_month, DB_PARTITION_PREMAKE_MONTHS)
+
+    months = []
+    while month <= last_month:
+        months.append(month)
+        month = add_months(month, 1)
+
+    # Все нужные секции проверяются одним запросом: на обычном запуске они уже есть
+    partitions = [get_partition_name(table, month) for month in months for table in get_history_tables()]
+    partitions += [get_default_partition_name(table) for table in get_history_tables()]
+    existing = set((await connection.execute(
+        text('SELECT name FROM unnest(CAST(:names AS text[])) AS name WHERE to_regclass(name) IS NOT NULL'),
+        {'names': partitions}
+    )).scalars())
+
+    created = 0
+    for table in get_history_tables():
+        default_partition = get_default_partition_name(table)
+        if default_partition not in existing:
+            await connection.execute(text(f'CREATE TABLE {default_partition} PARTITION OF {table} DEFAULT'))
+            existing.add(default_partition)
+            created += 1
+
+    for month in months:
+        next_month = add_months(month, 1)
+
+        for table in get_history_tables():
+            partition = get_partition_name(table, month)
+            if partition in existing:
+                continue
+
+            bounds = f"FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+            stray = await _move_from_default_partition(connection, table, partition, month, next_month)
+            if stray:
+                await connection.execute(text(f'ALTER TABLE {table} ATTACH PARTITION {partition} FOR VALUES {bounds}'))
+                logging.error(
+                    f'Секция {partition} создана с опозданием: {stray} записей перенесено из секции по умолчанию'
+                )
+            else:
+                await connection.execute(text(f'CREATE TABLE {partition} PARTITION OF {table} FOR VALUES {bounds}'))
+            created += 1
+
+    if created:
+        logging.info(f'Создано секций таблиц истории: {created}')
+
+    return created
+
+
+async def _move_from_default_partition(
+        connection, table: str, partition: str, month: datetime, next_month: datetime
+) -> int:
+    """
+    Если в секции по умолчанию есть записи месяца, создает для них отдельную таблицу `partition`
+    (еще не присоединенную) и переносит их туда.
 
-    def __repr__(self):
-        return f'Album {self.album_id}, user {self.user_id}'
+    :return: Кол-во перенесенных записей, 0 - таблица не создавалась.
+    """
 
+    default_partition = get_default_partition_name(table)
+    bounds = {'since': month, 'until': next_month}
+    condition = 'created_at >= :since AND created_at < :until'
 
-class PhotoDBModel(BaseDBModel):
-    __tablename__ = 'photos'
+    if not (await connection.execute(
+        text(f'SELECT EXISTS (SELECT 1 FROM {default_partition} WHERE {condition})'), bounds
+    )).scalar():
+        return 0
 
-    album_id: Mapped[int] = mapped_column(Integer, index=True)
-    photo_id: Mapped[int] = mapped_column(Integer, index=True)
-    title: Mapped[str] = mapped_column(String)
-    url: Mapped[str] = mapped_column(String)
-    thumbnail_url: Mapped[str] = mapped_column(String)
+    await connection.execute(text(f'CREATE TABLE {partition} (LIKE {table} INCLUDING DEFAULTS)'))
+    return (await connection.execute(text(
+        f'WITH moved AS (DELETE FROM {default_partition} WHERE {condition} RETURNING *) '
+        f'INSERT INTO {partition} SELECT * FROM moved'
+    ), bounds)).rowcount
 
-    def __repr__(self):
-        return f'Photo {self.photo_id}, album {self.album_id}'
 
+async def _rename_table(connection, table: str, suffix: str) -> bool:
+    """
+    Переименовывает таблицу и ее индексы, добавляя `suffix`.
+    Имена индексов (ix_users_id, ...) иначе остались бы заняты и create_all не смог бы создать новую таблицу.
+
+    :return: False, если таблицы нет.
+    """
 
-class TodoDBModel(BaseDBModel):
-    __tablename__ = 'todos'
+    if (await connection.execute(text(f"SELECT to_regclass('{table}')"))).scalar() is None:
+        return False
 
-    user_id: Mapped[int] = mapped_column(Integer, index=True)
-    todo_id: Mapped[int] = mapped_column(Integer, index=True)
-    title: Mapped[str] = mapped_column(String)
-    completed: Mapped[bool] = mapped_column(Boolean)
+    await connection.execute(text(f'ALTER TABLE {table} RENAME TO {table}{suffix}'))
 
-    def __repr__(self):
-        return f'Todo {self.todo_id}, user {self.user_id}'
+    indexes = (await connection.execute(text(
+        f"SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = '{table}{suffix}'::regclass"
+    ))).scalars().all()
+    for index in indexes:
+        await connection.execute(text(f'ALTER INDEX {index} RENAME TO {index}{suffix}'))
+
+    return True
+
+
+# Таблицы прежней схемы, где каждый запрос хранил полную копию объекта
+_LEGACY_TABLES = ('users', 'posts', 'comments', 'albums', 'photos', 'todos', 'addresses', 'geos', 'companies')
+
+
+async def _rename_legacy_tables(connection) -> None:
+    """
+    Переименовывает таблицы прежней схемы в `<имя>_legacy`, чтобы create_all создал новые.
+    Данные из них переносит `_migrate_legacy_tables`.
+    """
+
+    # Признак прежней схемы - таблица users без колонки payload_hash
+    legacy = (await connection.execute(text(
+        "SELECT to_regclass('users') IS NOT NULL AND NOT EXISTS ("
+        "SELECT 1 FROM information_schema.columns "
+        "WHERE table_schema = current_schema() AND table_name = 'users' AND column_name = 'payload_hash')"
+    ))).scalar()
+
+    if not legacy:
+        return
+
+    renamed = [table for table in _LEGACY_TABLES if await _rename_table(connection, table, '_legacy')]
+
+    logging.warning(f'Таблицы прежней схемы переименованы в *_legacy: {", ".join(renamed)}')
+
+
+# Пользователь прежней схемы собирается из users и отдельных addresses, geos и companies
+_LEGACY_USERS_QUERY = (
+    'SELECT u.id, u.telegram_user_id, u.created_at, u.user_id, u.name, u.username, u.email, u.phone, u.website, '
+    'a.street, a.suite, a.city, a.zipcode, g.lat, g.lng, '
+    'c.name AS company_name, c."catchPhrase" AS company_catch_phrase, c.bs AS company_bs '
+    'FROM users_legacy AS u '
+    'JOIN addresses_legacy AS a ON a.user_id = u.id '
+    'JOIN geos_legacy AS g ON g.address_id = a.id '
+    'JOIN companies_legacy AS c ON c.user_id = u.id '
+    'WHERE u.id > :after ORDER BY u.id LIMIT :limit'
+)
+
+# Записей прежней схемы за один запрос при переносе
+_LEGACY_BATCH_SIZE = 5000
+
+
+def _legacy_object(resource: str, row) -> dict:
+    """
+    Данные объекта API из записи прежней схемы: колонки назывались так же, как поля моделей.
+    """
+
+    if resource != 'users':
+        return {field: getattr(row, field) for field in resource_models[resource].model_fields}
+
+    return {
+        'user_id': row.user_id,
+        'name': row.name,
+        'username': row.username,
+        'email': row.email,
+        'address': {
+            'street': row.street,
+            'suite': row.suite,
+            'city': row.city,
+            'zipcode': row.zipcode,
+            'geo': {'lat': row.lat, 'lng': row.lng}
+        },
+        'phone': row.phone,
+        'website': row.website,
+        'company': {'name': row.company_name, 'catchPhrase': row.company_catch_phrase, 'bs': row.company_bs}
+    }
+
+
+async def _migrate_legacy_rows(connection, resource: str) -> int:
+    """
+    Переносит историю ресурса из `<имя>_legacy` в новую схему вместе с id, telegram_user_id и created_at.
+    JSON объекта собирается из колонок прежней схемы и записывается в `api_payloads`
+    с тем же ключом, что и при обычной записи (`_payload_params` в service/db.py).
+
+    :return: Кол-во перенесенных записей.
+    """
+
+    old_table = f'{resource}_legacy'
+    if (await connection.execute(text(f"SELECT to_regclass('{old_table}')"))).scalar() is None:
+        return 0
+
+    first_month = (await connection.execute(text(
+        f"SELECT date_trunc('month', min(created_at)) FROM {old_table}"
+    ))).scalar()
+    if first_month is None:
+        return 0
+    await ensure_partitions(connection, since=first_month)
+
+    model = resource_models[resource]
+    if resource == 'users':
+        query = text(_LEGACY_USERS_QUERY)
+    else:
+        columns = ', '.join(model.model_fields)
+        query = text(
+            f'SELECT id, telegram_user_id, created_at, {columns} FROM {old_table} '
+            f'WHERE id > :after ORDER BY id LIMIT :limit'
+        )
+
+    moved = 0
+    after = 0
+    while True:
+        rows = (await connection.execute(query, {'after': after, 'limit': _LEGACY_BATCH_SIZE})).all()
+        if not rows:
+            break
+
+        payloads = {}
+        history = []
+        for row in rows:
+            data = model.model_validate(_legacy_object(resource, row)).model_dump_json()
+            content_hash = hashlib.sha256(f'{resource}:{data}'.encode()).digest()
+
+            payloads[content_hash] = {'content_hash': content_hash, 'resource': resource, 'data': data}
+            history.append({
+                'id': row.id,
+                'telegram_user_id': row.telegram_user_id,
+                'created_at': row.created_at,
+                'payload_hash': content_hash
+            })
+
+        await connection.execute(text(
+            'INSERT INTO api_payloads (content_hash, resource, data) '
+            'VALUES (:content_hash, :resource, CAST(:data AS jsonb)) ON CONFLICT DO NOTHING'
+        ), [payloads[key] for key in sorted(payloads)])
+        await connection.execute(text(
+            f'INSERT INTO {resource} (id, telegram_user_id, created_at, payload_hash) '
+            f'VALUES (:id, :telegram_user_id, :created_at, :payload_hash)'
+        ), history)
+
+        moved += len(rows)
+        after = rows[-1].id
+
+    if moved:
+        # id вставлены явно - продолжаем последовательность после них
+        await connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{resource}', 'id'), (SELECT max(id) FROM {resource}))"
+        ))
+
+    return moved
+
+
+async def _migrate_legacy_tables(connection) -> None:
+    """
+    Переносит историю из таблиц прежней схемы (`*_legacy`) в новые и только после этого удаляет их.
+    Все идет в транзакции `create_tables`: при ошибке таблицы прежней схемы остаются как были.
+    """
+
+    existing = [
+        table for table in _LEGACY_TABLES
+        if (await connection.execute(text(f"SELECT to_regclass('{table}_legacy')"))).scalar() is not None
+    ]
+    if not existing:
+        return
+
+    for resource in resource_models:
+        if resource not in existing:
+            continue
+
+        total = (await connection.execute(text(f'SELECT count(*) FROM {resource}_legacy'))).scalar()
+        if not total:
+            continue
+
+        moved = await _migrate_legacy_rows(connection, resource)
+        logging.warning(f'Из {resource}_legacy перенесено записей истории: {moved} из {total}')
+
+        # Пользователь без адреса или компании не собирается в объект API
+        if moved < total:
+            logging.warning(f'Не перенесены записи {resource}_legacy без связанных данных: {total - moved}')
+
+    await connection.execute(text(f'DROP TABLE {", ".join(f"{table}_legacy" for table in existing)}'))
+    logging.warning(f'Таблицы прежней схемы удалены: {", ".join(existing)}')
+
+
+async def _rename_unpartitioned_tables(connection) -> list[str]:
+    """
+    Переименовывает несекционированные таблицы истории в `<имя>_unpartitioned`,
+    чтобы create_all создал вместо них секционированные.
+
+    :return: Названия переименованных таблиц.
+    """
+
+    renamed = []
+    for table in get_history_tables():
+        relkind = (await connection.execute(text(
+            f"SELECT relkind::text FROM pg_class WHERE oid = to_regclass('{table}')"
+        ))).scalar()
+
+        # 'r' - обычная таблица, 'p' - секционированная
+        if relkind == 'r' and await _rename_table(connection, table, '_unpartitioned'):
+            renamed.append(table)
+
+    return renamed
+
+
+async def _move_unpartitioned_rows(connection, table: str) -> None:
+    """
+    Переносит записи из `<имя>_unpartitioned` в секционированную таблицу вместе с их id и удаляет старую таблицу.
+    """
+
+    old_table = f'{table}_unpartitioned'
+
+    first_month = (await connection.execute(text(
+        f"SELECT date_trunc('month', min(created_at)) FROM {old_table}"
+    ))).scalar()
+    await ensure_partitions(connection, since=first_month)
+
+    await connection.execute(text(
+        f'INSERT INTO {table} (id, telegram_user_id, created_at, payload_hash) '
+        f'SELECT id, telegram_user_id, created_at, payload_hash FROM {old_table}'
+    ))
+    # id вставлены явно - продолжаем последовательность после них
+    await connection.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), (SELECT max(id) FROM {table}))"
+    ))
+    await connection.execute(text(f'DROP TABLE {old_table}'))
+
+    logging.warning(f'Таблица {table} переведена на секционирование по месяцам')
+
+
+async def _create_missing_indexes(connection) -> None:
+    """
+    Создает индексы таблиц истории, которых нет в уже существующих таблицах:
+    create_all индексы существующих таблиц не трогает.
+    Отдельный индекс по telegram_user_id удаляется - его заменил индекс истории.
+    """
+
+    for model in BaseDBModel.__subclasses__():
+        await connection.execute(text(f'DROP INDEX IF EXISTS ix_{model.__tablename__}_telegram_user_id'))
+
+        for index in model.__table__.indexes:
+            if (await connection.execute(text(f"SELECT to_regclass('{index.name}')"))).scalar() is None:
+                await connection.run_sync(index.create)
+                logging.info(f'Создан индекс {index.name}')
+
+
+async def _fill_usage_stats(connection) -> None:
+    """
+    Заполняет только что созданную сводку `user_usage_stats` по уже записанной истории.
+    Дальше сводку обновляет каждая запись истории.
+    """
+
+    for table in get_history_tables():
+        await connection.execute(text(
+            f"INSERT INTO user_usage_stats (telegram_user_id, resource, requests, first_at, last_at) "
+            f"SELECT telegram_user_id, '{table}', count(*), min(created_at), max(created_at) "
+            f"FROM {table} GROUP BY telegram_user_id"
+        ))
+
+    logging.info('Сводка запросов пользователей заполнена по истории')
+
+
+# Ключ advisory-блокировки: DDL при одновременном запуске нескольких экземпляров выполняет один
+_SCHEMA_LOCK_KEY = 0x5C4E3A
+
+
+def get_schema_fingerprint() -> str:
+    """
+    Отпечаток схемы: sha256 от DDL всех таблиц и индексов `Base.metadata`.
+    Меняется при любом изменении моделей, влияющем на таблицы.
+    """
+
+    ddl = []
+    for table in Base.metadata.sorted_tables:
+        ddl.append(str(CreateTable(table).compile(dialect=engine.dialect)))
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            ddl.append(str(CreateIndex(index).compile(dialect=engine.dialect)))
+
+    return hashlib.sha256('\n'.join(ddl).encode()).hexdigest()
+
+
+async def _is_schema_applied(connection, fingerprint: str) -> bool:
+    if (await connection.execute(text("SELECT to_regclass('schema_version')"))).scalar() is None:
+        return False
+
+    return (await connection.execute(
+        text('SELECT EXISTS (SELECT 1 FROM schema_version WHERE fingerprint = :fingerprint)'),
+        {'fingerprint': fingerprint}
+    )).scalar()
+
+
+async def _apply_schema(connection, fingerprint: str) -> None:
+    """
+    Приводит БД к схеме моделей: переносы старых таблиц, create_all, индексы, секции.
+    """
+
+    await _rename_legacy_tables(connection)
+    unpartitioned = await _rename_unpartitioned_tables(connection)
+    new_usage_stats = (await connection.execute(text("SELECT to_regclass('user_usage_stats')"))).scalar() is None
+
+    await connection.run_sync(Base.metadata.create_all)
+    await _create_missing_indexes(connection)
+    await ensure_partitions(connection)
+
+    for table in unpartitioned:
+        await _move_unpartitioned_rows(connection, table)
+
+    await _migrate_legacy_tables(connection)
+
+    if new_usage_stats:
+        await _fill_usage_stats(connection)
+
+    await connection.execute(
+        text('INSERT INTO schema_version (fingerprint) VALUES (:fingerprint) ON CONFLICT DO NOTHING'),
+        {'fingerprint': fingerprint}
+    )
+    logging.info(f'Схема БД обновлена, отпечаток {fingerprint[:12]}')
 
 
 async def create_tables():
     """
-    Создает таблицы если они еще не существуют в базе.
+    Создает таблицы если они еще не существуют в базе, и секции таблиц истории.
+
+    Проверка схемы create_all опрашивает каталог по каждой таблице, поэтому выполняется,
+    только если отпечаток моделей (`get_schema_fingerprint`) еще не записан в `schema_version`.
+    Обычный запуск - один запрос отпечатка и один запрос секций.
     """
 
+    fingerprint = get_schema_fingerprint()
+
     async with engine.begin() as connection:
-        await connection.run_sync(Base.metadata.create_all)
+        if not await _is_schema_applied(connection, fingerprint):
+            await connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': _SCHEMA_LOCK_KEY})
+
+            # Пока ждали блокировку, схему мог применить другой экземпляр
+            if not await _is_schema_applied(connection, fingerprint):
+                await _apply_schema(connection, fingerprint)
+
+        await ensure_partitions(connection)
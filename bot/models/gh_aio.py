@@ -0,0 +1,275 @@
+"""
+Асинхронный клиент Google Sheets API v4 на aiohttp (`GH_BACKEND=aiohttp`).
+
+В отличие от `GHClient` (gspread в `asyncio.to_thread`) запросы не занимают потоки пула по умолчанию
+на время HTTP-запроса: все идет через одну `ClientSession` с пулом соединений к Google.
+Интерфейс тот же, что у `GHClient`, поэтому `ServiceGH` и очередь `gh_outbox` работают с любым из них.
+
+OAuth-токен сервисного аккаунта получается без gspread и google-auth-transport: JWT подписывается
+ключом из `CREDENTIALS_FILE` (`google.auth.crypt`, без сети), а обменивается на токен запросом той же сессии.
+Токен обновляется в фоне до истечения, а ответ 401 сбрасывает его и повторяет запрос один раз.
+"""
+
+
+import asyncio
+import json
+import logging
+import time
+from typing import Any
+from urllib.parse import quote
+
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from google.auth import crypt, jwt
+
+from models.gh_rate_limit import GHRateLimiter, parse_retry_after
+
+
+SHEETS_API_URL = 'https://sheets.googleapis.com/v4/spreadsheets/'
+
+_JWT_GRANT_TYPE = 'urn:ietf:params:oauth:grant-type:jwt-bearer'
+_TOKEN_LIFETIME = 3600  # Сек., максимум для сервисного аккаунта
+
+
+class GHAPIError(Exception):
+    """
+    Ответ Sheets API с кодом ошибки.
+    """
+
+    def __init__(self, status: int, message: str, retry_after: float | None = None):
+        super().__init__(f'{status}: {message}')
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AioGHClient:
+    """
+    Клиент Google Sheets на весь процесс: одна HTTP-сессия и один OAuth-токен.
+    """
+
+    def __init__(
+            self,
+            credentials_file: str,
+            scopes: list[str],
+            spreadsheet_id: str,
+            refresh_margin: float,
+            rate_limiter: GHRateLimiter,
+            rate_limit_retries: int,
+            connection_limit: int,
+            timeout: float,
+            api_url: str = SHEETS_API_URL
+    ):
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.spreadsheet_id = spreadsheet_id
+        self.refresh_margin = refresh_margin
+        self.rate_limiter = rate_limiter
+        self.rate_limit_retries = rate_limit_retries
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self.api_url = api_url
+
+        self._session: ClientSession | None = None
+        self._signer: crypt.Signer | None = None
+        self._account: dict | None = None
+        self._token: str | None = None
+        self._expires_at = 0.0  # time.time()
+        self._token_lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+        self._sheets: set[str] = set()
+
+        # Статистика
+        self.requests = 0
+        self.invalidations = 0
+        self.token_refreshes = 0
+
+    # --- Интерфейс `GHClient`
+    async def append_rows(self, sheet_name: str, rows: list[list]) -> dict:
+        """
+        Добавляет строки в конец листа одним запросом (`values:append`).
+
+        :param sheet_name: Имя листа.
+        :param rows: Строки, каждая - значения ячеек.
+        """
+
+        sheet_range = quote(f"'{sheet_name}'", safe='')
+        return await self._request(
+            'POST', f'{self.spreadsheet_id}/values/{sheet_range}:append', write=True,
+            params={'valueInputOption': 'RAW'}, body={'majorDimension': 'ROWS', 'values': rows}
+        )
+
+    async def fetch_metadata(self, fields: str) -> dict:
+        """
+        Метаданные таблицы без данных ячеек.
+
+        :param fields: Маска полей ответа, например `sheets.properties`.
+        """
+
+        return await self._request('GET', self.spreadsheet_id, write=False, params={'fields': fields})
+
+    async def batch_update(self, body: dict) -> dict:
+        return await self._request('POST', f'{self.spreadsheet_id}:batchUpdate', write=True, body=body)
+
+    def cache_sheets(self, properties: dict[str, dict]) -> None:
+        """
+        Листы адресуются по имени, поэтому запоминаются только имена - для статистики.
+        """
+
+        self._sheets.update(properties)
+
+    def invalidate(self) -> None:
+        """
+        Сбрасывает токен: следующий запрос авторизуется заново.
+        """
+
+        self._token = None
+        self._expires_at = 0.0
+        self.invalidations += 1
+
+    def start_refreshing(self) -> None:
+        """
+        Запускает фоновое обновление OAuth-токена.
+        """
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """
+        Останавливает обновление токена и закрывает HTTP-сессию.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def get_stats(self) -> dict:
+        return {
+            'backend': 'aiohttp',
+            'requests': self.requests,
+            'sheets': len(self._sheets),
+            'invalidations': self.invalidations,
+            'token_refreshes': self.token_refreshes
+        }
+
+    # --- HTTP
+    async def _get_session(self) -> ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = ClientSession(
+                connector=TCPConnector(limit=self.connection_limit, keepalive_timeout=60),
+                timeout=ClientTimeout(total=self.timeout),
+                raise_for_status=False
+            )
+
+        return self._session
+
+    async def _request(
+            self, method: str, path: str, write: bool, params: dict | None = None, body: Any = None
+    ) -> dict:
+        """
+        Запрос к Sheets API через корзину ограничителя частоты (как `GHClient.call`).
+        Ответ 429 снижает скорость корзины и повторяется до `rate_limit_retries` раз,
+        ответ 401 - сбрасывает токен и повторяется один раз.
+        """
+
+        bucket = self.rate_limiter.write if write else self.rate_limiter.read
+        session = await self._get_session()
+        attempt = 0
+        reauthorized = False
+
+        while True:
+            await bucket.acquire()
+            token = await self._get_token()
+
+            self.requests += 1
+            async with session.request(
+                method, self.api_url + path, params=params, json=body, headers={'Authorization': f'Bearer {token}'}
+            ) as response:
+                if response.status < 400:
+                    bucket.on_success()
+                    return await response.json()
+
+                message = await response.text()
+                retry_after = parse_retry_after(response.headers.get('Retry-After'))
+
+            if response.status == 401 and not reauthorized:
+                logging.warning(f'Ошибка авторизации Google Sheets, токен будет получен заново:\n{message}')
+                reauthorized = True
+                self.invalidate()
+                continue
+
+            if response.status == 429:
+                bucket.on_rate_limited(retry_after)
+                if attempt < self.rate_limit_retries:
+                    attempt += 1
+                    logging.warning(
+                        f'Квота Sheets API ({bucket.name}) превышена, повтор {attempt}/{self.rate_limit_retries}, '
+                        f'скорость снижена до {bucket.rate * 60:.1f} запросов/мин.'
+                    )
+                    continue
+
+            raise GHAPIError(response.status, message, retry_after)
+
+    # --- OAuth
+    def _load_account(self) -> None:
+        with open(self.credentials_file, encoding='utf-8') as file:
+            self._account = json.load(file)
+        self._signer = crypt.RSASigner.from_service_account_info(self._account)
+
+    async def _get_token(self, force: bool = False) -> str:
+        if not force and self._token is not None and self._expires_at - time.time() > 60:
+            return self._token
+
+        # Параллельные запросы после истечения токена не должны получать его каждый сам
+        async with self._token_lock:
+            if force or self._token is None or self._expires_at - time.time() <= 60:
+                await self._refresh_token()
+
+        return self._token
+
+    async def _refresh_token(self) -> None:
+        if self._signer is None:
+            self._load_account()
+
+        now = int(time.time())
+        assertion = jwt.encode(self._signer, {
+            'iss': self._account['client_email'],
+            'scope': ' '.join(self.scopes),
+            'aud': self._account['token_uri'],
+            'iat': now,
+            'exp': now + _TOKEN_LIFETIME
+        })
+
+        session = await self._get_session()
+        async with session.post(
+            self._account['token_uri'], data={'grant_type': _JWT_GRANT_TYPE, 'assertion': assertion.decode()}
+        ) as response:
+            if response.status >= 400:
+                raise GHAPIError(response.status, await response.text())
+            data = await response.json()
+
+        self._token = data['access_token']
+        self._expires_at = now + int(data.get('expires_in', _TOKEN_LIFETIME))
+        self.token_refreshes += 1
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = self.refresh_margin
+
+            try:
+                if self._expires_at - time.time() <= self.refresh_margin:
+                    await self._get_token(force=True)
+
+                # Следующая проверка - незадолго до истечения нового токена
+                delay = max(self.refresh_margin, self._expires_at - time.time() - self.refresh_margin)
+            except Exception as e:
+                logging.error(f'Ошибка при обновлении токена Google Sheets:\n{e}')
+
+            await asyncio.sleep(delay)
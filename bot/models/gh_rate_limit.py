@@ -0,0 +1,159 @@
+"""
+Ограничение частоты запросов к Google Sheets API.
+
+У Sheets API отдельные поминутные квоты на чтение и запись, поэтому и корзин две.
+Каждый запрос gspread (см. `GHClient.call`) сначала берет токен из своей корзины:
++ Корзина пополняется со скоростью квоты (`GH_READ_REQUESTS_PER_MINUTE` / `GH_WRITE_REQUESTS_PER_MINUTE`)
+  и вмещает не больше `GH_RATE_LIMIT_BURST` токенов - короткий всплеск проходит сразу, длинный выравнивается
++ Ожидающие запросы встают в очередь и получают токены по порядку
++ Ответ 429 вдвое снижает скорость корзины (не ниже `_MIN_RATE_FRACTION` от квоты) и приостанавливает ее
+  на `Retry-After` сек. Каждый успешный запрос возвращает скорость к квоте на `_RECOVERY_STEP` от нее
+"""
+
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from config.config import GH_READ_REQUESTS_PER_MINUTE, GH_WRITE_REQUESTS_PER_MINUTE, GH_RATE_LIMIT_BURST
+
+
+# Ниже этой доли от квоты скорость после 429 не опускается
+_MIN_RATE_FRACTION = 0.1
+# Доля квоты, на которую каждый успешный запрос поднимает скорость после 429
+_RECOVERY_STEP = 0.02
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Значение заголовка `Retry-After` в секундах: число секунд или HTTP-дата.
+    """
+
+    if not value:
+        return None
+
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class TokenBucket:
+    """
+    Корзина токенов с подстройкой скорости под ответы 429.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, burst: int):
+        self.name = name
+        self.max_rate = requests_per_minute / 60
+        self.min_rate = self.max_rate * _MIN_RATE_FRACTION
+        self.rate = self.max_rate
+        self.capacity = burst
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+        # Статистика
+        self.acquired = 0
+        self.throttled = 0
+        self.throttle_seconds_total = 0.0
+        self.throttle_seconds_max = 0.0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.rate_limited = 0
+
+    async def acquire(self) -> None:
+        """
+        Ждет, пока в корзине появится токен, и забирает его.
+        """
+
+        started = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+
+        try:
+            # Под блокировкой - чтобы токены доставались по очереди, а не тому, кто проснулся первым
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+
+                    delay = self._paused_until - now
+                    if delay <= 0:
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            break
+                        delay = (1 - self._tokens) / self.rate
+
+                    await asyncio.sleep(delay)
+        finally:
+            self.waiting -= 1
+
+        self.acquired += 1
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.throttled += 1
+            self.throttle_seconds_total += waited
+            self.throttle_seconds_max = max(self.throttle_seconds_max, waited)
+
+    def _refill(self, now: float) -> None:
+        # Пока корзина приостановлена, токены не копятся
+        since = max(self._updated, self._paused_until)
+        if now > since:
+            self._tokens = min(self.capacity, self._tokens + (now - since) * self.rate)
+        self._updated = max(now, self._updated)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate * _RECOVERY_STEP)
+
+    def on_rate_limited(self, retry_after: float | None) -> None:
+        """
+        Квота превышена: снижает скорость, обнуляет корзину и приостанавливает ее
+        на `retry_after` сек. (без заголовка - на время одного токена).
+        """
+
+        now = time.monotonic()
+        self._refill(now)
+
+        self.rate_limited += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, now + (retry_after if retry_after is not None else 1 / self.rate))
+
+    def get_stats(self) -> dict:
+        return {
+            'requests_per_minute': round(self.rate * 60, 1),
+            'acquired': self.acquired,
+            'throttled': self.throttled,
+            'throttle_seconds_total': round(self.throttle_seconds_total, 3),
+            'throttle_seconds_max': round(self.throttle_seconds_max, 3),
+            'queue_depth': self.waiting,
+            'max_queue_depth': self.max_waiting,
+            'rate_limited': self.rate_limited
+        }
+
+
+class GHRateLimiter:
+    """
+    Корзины на чтение и запись, общие для всего процесса.
+    """
+
+    def __init__(self, read_per_minute: float, write_per_minute: float, burst: int):
+        self.read = TokenBucket('read', read_per_minute, burst)
+        self.write = TokenBucket('write', write_per_minute, burst)
+
+    def get_stats(self) -> dict:
+        return {'read': self.read.get_stats(), 'write': self.write.get_stats()}
+
+
+gh_rate_limiter = GHRateLimiter(GH_READ_REQUESTS_PER_MINUTE, GH_WRITE_REQUESTS_PER_MINUTE, GH_RATE_LIMIT_BURST)
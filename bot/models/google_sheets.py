@@ -1,15 +1,319 @@
 """
 Данный модуль предоставляет методы по созданию листов в Google Sheets.
 Сами листы оформлены в виде "Название: Список полей"
+
+Здесь же живет `gh_client` - один на процесс авторизованный клиент Google Sheets
+вместе с таблицей и листами (по аналогии с `engine` для PostgreSQL).
+`GH_BACKEND` выбирает реализацию: `gspread` (`GHClient`, запросы в потоках) или `aiohttp`
+(`AioGHClient` из `models.gh_aio`, асинхронные запросы). Интерфейс у них общий:
+`append_rows`, `fetch_metadata`, `batch_update`, `cache_sheets`, `invalidate`, `start_refreshing`, `stop`, `get_stats`.
 """
 
 
+import json
 import logging
 import asyncio
+import re
+from datetime import datetime
+from typing import Callable, TypeVar
 
 import gspread
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+
+from config.config import (
+    CREDENTIALS_FILE,
+    SPREADSHEET_ID,
+    SCOPES,
+    GH_BACKEND,
+    GH_HTTP_CONNECTION_LIMIT,
+    GH_HTTP_TIMEOUT,
+    GH_TOKEN_REFRESH_MARGIN,
+    GH_RATE_LIMIT_MAX_RETRIES,
+    GH_SHEET_GROW_ROWS,
+    GH_SHEET_GROW_THRESHOLD,
+    GH_SHEET_MAX_ROWS,
+    GH_SPREADSHEET_MAX_CELLS
+)
+from models.gh_aio import AioGHClient, GHAPIError
+from models.gh_rate_limit import GHRateLimiter, gh_rate_limiter, parse_retry_after
+
+
+T = TypeVar('T')
+
+
+def _is_auth_error(error: BaseException) -> bool:
+    """
+    Ошибка авторизации: токен отозван или не обновился. Поможет только новый клиент.
+    """
+
+    if isinstance(error, RefreshError):
+        return True
+
+    return isinstance(error, gspread.exceptions.APIError) and error.response.status_code == 401
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    """
+    Превышена квота Sheets API - запрос можно повторить позже.
+    """
+
+    return isinstance(error, gspread.exceptions.APIError) and error.response.status_code == 429
+
+
+def get_api_error_status(error: BaseException) -> int | None:
+    """
+    HTTP-код ответа Sheets API из ошибки любого клиента (`GH_BACKEND`). None - ошибка не от API (сеть и т.п.).
+    """
+
+    if isinstance(error, GHAPIError):
+        return error.status
+
+    if isinstance(error, gspread.exceptions.APIError):
+        return error.response.status_code
+
+    return None
+
+
+class GHClient:
+    """
+    Кэш клиента Google Sheets на все время работы процесса.
+
+    Ключ сервисного аккаунта читается, таблица (`open_by_key`) и листы (`worksheet`) запрашиваются один раз,
+    дальше запись строки - один HTTP-запрос. OAuth-токен обновляется в фоне до истечения,
+    а при ошибке авторизации кэш сбрасывается и запрос повторяется один раз с новым клиентом.
+    Все запросы к API проходят через ограничитель частоты `rate_limiter` (см. `models.gh_rate_limit`).
+    """
+
+    def __init__(
+            self,
+            credentials_file: str,
+            scopes: list[str],
+            spreadsheet_id: str,
+            refresh_margin: float,
+            rate_limiter: GHRateLimiter,
+            rate_limit_retries: int
+    ):
+        self.credentials_file = credentials_file
+        self.scopes = scopes
+        self.spreadsheet_id = spreadsheet_id
+        self.refresh_margin = refresh_margin
+        self.rate_limiter = rate_limiter
+        self.rate_limit_retries = rate_limit_retries
+
+        self._client: gspread.Client | None = None
+        self._spreadsheet: gspread.Spreadsheet | None = None
+        self._worksheets: dict[str, gspread.Worksheet] = {}
+        self._lock = asyncio.Lock()
+        self._task: asyncio.Task | None = None
+
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.token_refreshes = 0
+
+    async def get_spreadsheet(self) -> gspread.Spreadsheet:
+        if self._spreadsheet is not None:
+            return self._spreadsheet
+
+        # Параллельные апдейты после сброса кэша не должны авторизоваться каждый сам
+        async with self._lock:
+            if self._spreadsheet is None:
+                client = await asyncio.to_thread(
+                    gspread.service_account, filename=self.credentials_file, scopes=self.scopes
+                )
+                self._spreadsheet = await self.call(False, client.open_by_key, self.spreadsheet_id)
+                self._client = client
+
+        return self._spreadsheet
+
+    async def get_worksheet(self, sheet_name: str) -> gspread.Worksheet:
+        worksheet = self._worksheets.get(sheet_name)
+        if worksheet is not None:
+            self.hits += 1
+            return worksheet
+
+        self.misses += 1
+        spreadsheet = await self.get_spreadsheet()
+        worksheet = await self.call(False, spreadsheet.worksheet, sheet_name)
+        self._worksheets[sheet_name] = worksheet
+
+        return worksheet
+
+    def cache_sheets(self, properties: dict[str, dict]) -> None:
+        """
+        Кэширует листы по уже полученным свойствам (из метаданных таблицы или ответа `addSheet`),
+        чтобы не запрашивать их по одному.
+
+        :param properties: Имя листа -> свойства листа из Sheets API.
+        """
+
+        for sheet_name, sheet_properties in properties.items():
+            self._worksheets[sheet_name] = gspread.Worksheet(
+                self._spreadsheet, sheet_properties, self._spreadsheet.id, self._spreadsheet.client
+            )
+
+    def invalidate(self) -> None:
+        """
+        Сбрасывает клиент, таблицу и листы: следующий запрос авторизуется заново.
+        """
+
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets.clear()
+        self.invalidations += 1
+
+    async def call(self, write: bool, func: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Выполняет блокирующий запрос gspread в отдельном потоке, дождавшись токена ограничителя частоты.
+        После ответа 429 ждет `Retry-After` и повторяет запрос до `rate_limit_retries` раз.
+
+        :param write: Запрос на запись - берет токен из корзины записи, иначе - чтения.
+        :param func: Функция gspread, например `worksheet.append_rows`.
+        """
+
+        bucket = self.rate_limiter.write if write else self.rate_limiter.read
+
+        for attempt in range(self.rate_limit_retries + 1):
+            await bucket.acquire()
+            try:
+                result = await asyncio.to_thread(func, *args, **kwargs)
+            except Exception as e:
+                if not _is_rate_limited(e):
+                    raise
+
+                bucket.on_rate_limited(parse_retry_after(e.response.headers.get('Retry-After')))
+                if attempt == self.rate_limit_retries:
+                    raise
+
+                logging.warning(
+                    f'Квота Sheets API ({bucket.name}) превышена, повтор {attempt + 1}/{self.rate_limit_retries}, '
+                    f'скорость снижена до {bucket.rate * 60:.1f} запросов/мин.'
+                )
+                continue
+
+            bucket.on_success()
+            return result
+
+    async def run(self, sheet_name: str, action: Callable[[gspread.Worksheet], T], write: bool = True) -> T:
+        """
+        Выполняет блокирующее действие gspread над листом в отдельном потоке (см. `call`).
+        При ошибке авторизации сбрасывает кэш и повторяет действие один раз.
+
+        :param sheet_name: Имя листа.
+        :param action: Функция от листа, например `lambda worksheet: worksheet.append_row(row)`.
+        :param write: Действие изменяет лист.
+        """
+
+        worksheet = await self.get_worksheet(sheet_name)
+        try:
+            return await self.call(write, action, worksheet)
+        except Exception as e:
+            if not _is_auth_error(e):
+                raise
+
+            logging.warning(f'Ошибка авторизации Google Sheets, клиент будет создан заново:\n{e}')
+            self.invalidate()
+
+        worksheet = await self.get_worksheet(sheet_name)
+        return await self.call(write, action, worksheet)
+
+    async def append_rows(self, sheet_name: str, rows: list[list]) -> dict:
+        """
+        Добавляет строки в конец листа одним запросом.
+
+        :param sheet_name: Имя листа.
+        :param rows: Строки, каждая - значения ячеек.
+        """
+
+        return await self.run(sheet_name, lambda worksheet: worksheet.append_rows(rows))
+
+    async def fetch_metadata(self, fields: str) -> dict:
+        """
+        Метаданные таблицы без данных ячеек.
+
+        :param fields: Маска полей ответа, например `sheets.properties`.
+        """
+
+        spreadsheet = await self.get_spreadsheet()
+        return await self.call(False, spreadsheet.fetch_sheet_metadata, {'fields': fields})
+
+    async def batch_update(self, body: dict) -> dict:
+        spreadsheet = await self.get_spreadsheet()
+        return await self.call(True, spreadsheet.batch_update, body)
+
+    def start_refreshing(self) -> None:
+        """
+        Запускает фоновое обновление OAuth-токена.
+        """
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            delay = self.refresh_margin
+
+            try:
+                credentials = (await self._get_client()).http_client.auth
+                expiry = credentials.expiry
+
+                if expiry is None or (expiry - datetime.utcnow()).total_seconds() <= self.refresh_margin:
+                    # Обновление - блокирующий HTTP-запрос к OAuth, поэтому в потоке
+                    await asyncio.to_thread(credentials.refresh, Request())
+                    self.token_refreshes += 1
+                    expiry = credentials.expiry
+
+                # Следующая проверка - незадолго до истечения нового токена
+                delay = max(self.refresh_margin, (expiry - datetime.utcnow()).total_seconds() - self.refresh_margin)
+            except Exception as e:
+                logging.error(f'Ошибка при обновлении токена Google Sheets:\n{e}')
+                if _is_auth_error(e):
+                    self.invalidate()
+
+            await asyncio.sleep(delay)
+
+    async def _get_client(self) -> gspread.Client:
+        await self.get_spreadsheet()
+        return self._client
+
+    def get_stats(self) -> dict:
+        return {
+            'backend': 'gspread',
+            'worksheet_hits': self.hits,
+            'worksheet_misses': self.misses,
+            'invalidations': self.invalidations,
+            'token_refreshes': self.token_refreshes
+        }
+
 
-from config.config import CREDENTIALS_FILE, SPREADSHEET_ID, SCOPES
+if GH_BACKEND == 'aiohttp':
+    gh_client = AioGHClient(
+        CREDENTIALS_FILE,
+        SCOPES,
+        SPREADSHEET_ID,
+        GH_TOKEN_REFRESH_MARGIN,
+        gh_rate_limiter,
+        GH_RATE_LIMIT_MAX_RETRIES,
+        GH_HTTP_CONNECTION_LIMIT,
+        GH_HTTP_TIMEOUT
+    )
+elif GH_BACKEND == 'gspread':
+    gh_client = GHClient(
+        CREDENTIALS_FILE, SCOPES, SPREADSHEET_ID, GH_TOKEN_REFRESH_MARGIN, gh_rate_limiter, GH_RATE_LIMIT_MAX_RETRIES
+    )
+else:
+    raise ValueError(f'Неизвестный GH_BACKEND: {GH_BACKEND}')
 
 
 # Данный словарь содержит в себе данные вида: "Лист": "Поля"
@@ -52,46 +356,360 @@ sheets = {
 }
 
 
-async def _create_sheet_if_not_exists(spreadsheet, sheet_name: str, sheet_headers: list):
+# Ключ метаданных листа с заголовками, которые записал бот: по ним расхождение заголовков
+# с `sheets` видно из той же выборки метаданных, без чтения ячеек
+_HEADERS_METADATA_KEY = 'bot_headers'
+
+# Только нужные поля метаданных таблицы
+_METADATA_FIELDS = (
+    'sheets(properties(sheetId,title,index,sheetType,gridProperties(rowCount,columnCount)),'
+    'developerMetadata(metadataId,metadataKey,metadataValue))'
+)
+
+# Столбцов в новом листе, строк - `GH_SHEET_GROW_ROWS`
+_NEW_SHEET_COLS = 20
+
+
+def _header_requests(sheet_id: int, sheet_headers: list, column_count: int, metadata_id: int | None) -> list[dict]:
     """
-    Функция-исполнитель.
-    Проверяет, что лист существует. Если нет - создает его.
+    Запросы `batch_update`, которые записывают заголовки в первую строку листа и запоминают их в метаданных листа.
 
-    :param spreadsheet: Объект электронной таблицы.
-    :param sheet_name: Имя Листа.
+    :param sheet_id: ID листа.
     :param sheet_headers: Список с заголовками столбцов.
-    :return:
+    :param column_count: Текущее кол-во столбцов листа - если заголовков больше, лист расширяется.
+    :param metadata_id: ID прежних метаданных с заголовками, они удаляются.
     """
 
-    # Если получится получить лист - ничего не делаем.
-    # Иначе - создаем его.
-    try:
-        logging.info(f'Проверяю лист {sheet_name}')
+    requests = []
+
+    if len(sheet_headers) > column_count:
+        requests.append({'appendDimension': {
+            'sheetId': sheet_id, 'dimension': 'COLUMNS', 'length': len(sheet_headers) - column_count
+        }})
+
+    requests.append({'updateCells': {
+        'range': {
+            'sheetId': sheet_id,
+            'startRowIndex': 0,
+            'endRowIndex': 1,
+            'startColumnIndex': 0,
+            'endColumnIndex': len(sheet_headers)
+        },
+        'rows': [{'values': [{'userEnteredValue': {'stringValue': header}} for header in sheet_headers]}],
+        'fields': 'userEnteredValue'
+    }})
+
+    if metadata_id is not None:
+        requests.append({'deleteDeveloperMetadata': {'dataFilter': {
+            'developerMetadataLookup': {'metadataId': metadata_id}
+        }}})
+
+    requests.append({'createDeveloperMetadata': {'developerMetadata': {
+        'metadataKey': _HEADERS_METADATA_KEY,
+        'metadataValue': json.dumps(sheet_headers),
+        'location': {'sheetId': sheet_id},
+        'visibility': 'DOCUMENT'
+    }}})
+
+    return requests
+
+
+def _last_row(updated_range: str) -> int | None:
+    """
+    Номер последней строки диапазона из ответа `values:append`, например `'posts'!A1001:F1003` -> 1003.
+    """
+
+    match = re.search(r'![A-Z]+(\d+)(?::[A-Z]+(\d+))?$', updated_range)
+    if match is None:
+        return None
+
+    return int(match[2] or match[1])
+
+
+class _Shard:
+    def __init__(self, title: str, number: int, sheet_properties: dict):
+        self.title = title
+        self.number = number
+        self.sheet_id = sheet_properties['sheetId']
+        self.row_count = sheet_properties['gridProperties']['rowCount']
+        self.column_count = sheet_properties['gridProperties']['columnCount']
+        self.used_rows: int | None = None  # Неизвестно до первой записи
+
+
+class GHSheetRouter:
+    """
+    Таблица маршрутов листов: в какую часть листа (`posts`, `posts_0002`, ...) сейчас идет запись.
+
+    Занятые строки части известны из ответов `append_rows`. Дальше все изменения размеров - в фоне,
+    запись никогда не ждет изменения листа:
+    + Если свободных строк в части меньше `grow_threshold` - часть заранее расширяется на `grow_rows` строк
+      (не больше `max_rows`)
+    + Если до `max_rows` строк в части осталось меньше `grow_threshold` - создается следующая часть
+      с заголовками, и маршрут переключается на нее. Пока она создается, запись идет в текущую -
+      ей хватает оставшихся строк
+    + Листы не растут, если таблица упрется в `max_cells` ячеек (предел Google Sheets - 10 млн)
+
+    Новые части создаются в той же таблице. Отдельные таблицы для частей потребовали бы
+    Drive API и выдачи доступа - их при упоре в предел ячеек нужно создавать вручную.
+    """
+
+    def __init__(self, grow_rows: int, grow_threshold: int, max_rows: int, max_cells: int):
+        self.grow_rows = grow_rows
+        self.grow_threshold = grow_threshold
+        self.max_rows = max_rows
+        self.max_cells = max_cells
+
+        # Лист -> его части по порядку, последняя - текущая для записи
+        self._shards: dict[str, list[_Shard]] = {}
+        self._sheet_ids: set[int] = set()
+        self._cells = 0
+        self._tasks: dict[str, asyncio.Task] = {}
+
+        # Статистика
+        self.grows = 0
+        self.rollovers = 0
+        self.failed_resizes = 0
+
+    def load(self, properties: dict[str, dict]) -> None:
+        """
+        Строит маршруты по свойствам всех листов таблицы (см. `create_google_sheets`).
+        """
+
+        self._shards.clear()
+        self._sheet_ids = {sheet_properties['sheetId'] for sheet_properties in properties.values()}
+        self._cells = sum(
+            sheet_properties['gridProperties']['rowCount'] * sheet_properties['gridProperties']['columnCount']
+            for sheet_properties in properties.values()
+        )
+
+        for sheet_name in sheets:
+            shards = []
+            for title, sheet_properties in properties.items():
+                match = re.fullmatch(rf'{re.escape(sheet_name)}(?:_(\d{{4}}))?', title)
+                if match is not None:
+                    shards.append(_Shard(title, int(match[1] or 1), sheet_properties))
+
+            if shards:
+                self._shards[sheet_name] = sorted(shards, key=lambda shard: shard.number)
+                logging.info(f'Запись в лист {sheet_name} идет в {self.route(sheet_name)}')
+
+    def route(self, sheet_name: str) -> str:
+        """
+        Имя части листа, в которую сейчас идет запись.
+        """
+
+        shards = self._shards.get(sheet_name)
+        return shards[-1].title if shards else sheet_name
+
+    async def append_rows(self, sheet_name: str, rows: list[list]) -> None:
+        """
+        Добавляет строки в текущую часть листа и, если нужно, запускает ее расширение или переход на новую.
+
+        :param sheet_name: Имя листа (`posts`), а не его части.
+        :param rows: Строки, каждая - значения ячеек.
+        """
+
+        shards = self._shards.get(sheet_name)
+        shard = shards[-1] if shards else None
 
-        worksheet = await asyncio.to_thread(spreadsheet.worksheet, sheet_name)
+        response = await gh_client.append_rows(self.route(sheet_name), rows)
 
-        logging.info(f'Лист {sheet_name} существует.')
-    except gspread.exceptions.WorksheetNotFound:
-        logging.info(f'Не удалось получить лист {sheet_name}. Создаю..')
+        if shard is None:
+            return
 
-        worksheet = await asyncio.to_thread(spreadsheet.add_worksheet, title=sheet_name, rows=1000, cols=20)
-        await asyncio.to_thread(worksheet.append_row, sheet_headers)
+        last_row = _last_row((response or {}).get('updates', {}).get('updatedRange', ''))
+        if last_row is not None:
+            shard.used_rows = max(shard.used_rows or 0, last_row)
+            # Если лист вырос сам (запись за пределы сетки), сетка теперь не меньше записанного
+            shard.row_count = max(shard.row_count, shard.used_rows)
+
+        self._maintain(sheet_name)
+
+    def _maintain(self, sheet_name: str) -> None:
+        task = self._tasks.get(sheet_name)
+        if task is not None and not task.done():
+            return
+
+        shards = self._shards[sheet_name]
+        current = shards[-1]
+        if current.used_rows is None:
+            return
+
+        if current.used_rows >= self.max_rows - self.grow_threshold:
+            action = self._add_shard(sheet_name, current)
+        elif current.row_count - current.used_rows < self.grow_threshold and current.row_count < self.max_rows:
+            action = self._grow(current)
+        else:
+            return
+
+        self._tasks[sheet_name] = asyncio.create_task(self._run(sheet_name, action))
+
+    async def _run(self, sheet_name: str, action) -> None:
+        try:
+            await action
+        except Exception as e:
+            self.failed_resizes += 1
+            logging.error(f'Ошибка при изменении размера листа {sheet_name}:\n{e}')
+
+    def _fits(self, cells: int) -> bool:
+        if self._cells + cells <= self.max_cells:
+            return True
+
+        logging.error(
+            f'Таблица Google Sheets близка к пределу {self.max_cells} ячеек, листы больше не растут - '
+            f'нужна новая таблица (SPREADSHEET_ID)'
+        )
+        return False
+
+    async def _grow(self, shard: _Shard) -> None:
+        rows = min(self.grow_rows, self.max_rows - shard.row_count)
+        if not self._fits(rows * shard.column_count):
+            return
+
+        await gh_client.batch_update({'requests': [{'appendDimension': {
+            'sheetId': shard.sheet_id, 'dimension': 'ROWS', 'length': rows
+        }}]})
+
+        shard.row_count += rows
+        self._cells += rows * shard.column_count
+        self.grows += 1
+        logging.info(f'Лист {shard.title} расширен до {shard.row_count} строк')
+
+    async def _add_shard(self, sheet_name: str, current: _Shard) -> None:
+        """
+        Создает следующую часть листа с заголовками и переключает на нее запись.
+        """
+
+        sheet_headers = sheets[sheet_name]
+        column_count = max(_NEW_SHEET_COLS, len(sheet_headers))
+        if not self._fits(self.grow_rows * column_count):
+            return
+
+        number = current.number + 1
+        sheet_id = max(self._sheet_ids, default=0) + 1
+        title = f'{sheet_name}_{number:04d}'
+
+        response = await gh_client.batch_update({'requests': [
+            {'addSheet': {'properties': {
+                'sheetId': sheet_id,
+                'title': title,
+                'sheetType': 'GRID',
+                'gridProperties': {'rowCount': self.grow_rows, 'columnCount': column_count}
+            }}},
+            *_header_requests(sheet_id, sheet_headers, column_count, None)
+        ]})
+
+        sheet_properties = response['replies'][0]['addSheet']['properties']
+        gh_client.cache_sheets({title: sheet_properties})
+
+        shard = _Shard(title, number, sheet_properties)
+        shard.used_rows = 1  # Заголовки
+        self._shards[sheet_name].append(shard)
+        self._sheet_ids.add(sheet_id)
+        self._cells += self.grow_rows * column_count
+        self.rollovers += 1
+        logging.info(f'Лист {current.title} заполнен, запись переключена на {title}')
+
+    async def stop(self) -> None:
+        """
+        Дожидается начатых изменений размеров листов.
+        """
+
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            'routes': {sheet_name: shards[-1].title for sheet_name, shards in self._shards.items()},
+            'used_rows': {shards[-1].title: shards[-1].used_rows for shards in self._shards.values()},
+            'cells': self._cells,
+            'grows': self.grows,
+            'rollovers': self.rollovers,
+            'failed_resizes': self.failed_resizes
+        }
+
+
+gh_sheet_router = GHSheetRouter(GH_SHEET_GROW_ROWS, GH_SHEET_GROW_THRESHOLD, GH_SHEET_MAX_ROWS, GH_SPREADSHEET_MAX_CELLS)
 
 
 async def create_google_sheets():
     """
     Функция для создания листов в Google Sheets.
-    Создает листы, если они не существуют.
+
+    Метаданные таблицы читаются одним запросом, а все недостающие листы создаются
+    вместе с заголовками одним `batch_update`. У существующих листов заголовки сверяются с `sheets`
+    по метаданным листа; если они разошлись (или лист создан до появления метаданных) -
+    первая строка перезаписывается в том же `batch_update`.
+    Все листы остаются в кэше `gh_client`, отдельно их больше не запрашивают.
     """
 
     try:
-        # Создаем соединение.
-        client = await asyncio.to_thread(gspread.service_account, filename=CREDENTIALS_FILE, scopes=SCOPES)
-
-        # Получаем эл. таблицу
-        spreadsheet = await asyncio.to_thread(client.open_by_key,SPREADSHEET_ID)
+        # Создаем соединение и получаем метаданные таблицы - соединение остается в кэше `gh_client`
+        metadata = await gh_client.fetch_metadata(_METADATA_FIELDS)
     except Exception as e:
         logging.error(f'Ошибка при попытке получения таблицы Google Sheets:\n{e}')
-    else:
-        for sheet_name, sheet_headers in sheets.items():
-            await _create_sheet_if_not_exists(spreadsheet, sheet_name, sheet_headers)
+        return
+
+    existing = {sheet['properties']['title']: sheet for sheet in metadata.get('sheets', [])}
+    used_ids = {sheet['properties']['sheetId'] for sheet in existing.values()}
+    next_id = max(used_ids, default=0) + 1
+
+    requests = []
+    # Все листы таблицы, включая части `posts_0002` и т.п.
+    properties = {title: sheet['properties'] for title, sheet in existing.items()}
+
+    for sheet_name, sheet_headers in sheets.items():
+        sheet = existing.get(sheet_name)
+
+        if sheet is None:
+            logging.info(f'Листа {sheet_name} нет. Создаю..')
+
+            # ID нового листа задаем сами, чтобы в том же запросе записать в него заголовки
+            while next_id in used_ids:
+                next_id += 1
+            used_ids.add(next_id)
+
+            column_count = max(_NEW_SHEET_COLS, len(sheet_headers))
+            requests.append({'addSheet': {'properties': {
+                'sheetId': next_id,
+                'title': sheet_name,
+                'sheetType': 'GRID',
+                'gridProperties': {'rowCount': GH_SHEET_GROW_ROWS, 'columnCount': column_count}
+            }}})
+            requests += _header_requests(next_id, sheet_headers, column_count, None)
+            continue
+
+        stored = next(
+            (item for item in sheet.get('developerMetadata', []) if item['metadataKey'] == _HEADERS_METADATA_KEY),
+            None
+        )
+        if stored is not None and json.loads(stored['metadataValue']) == sheet_headers:
+            logging.info(f'Лист {sheet_name} существует.')
+            continue
+
+        if stored is None:
+            logging.info(f'Заголовки листа {sheet_name} еще не отмечены в метаданных. Записываю..')
+        else:
+            logging.warning(f'Заголовки листа {sheet_name} не совпадают с ожидаемыми. Обновляю..')
+        requests += _header_requests(
+            sheet['properties']['sheetId'],
+            sheet_headers,
+            sheet['properties']['gridProperties']['columnCount'],
+            stored['metadataId'] if stored is not None else None
+        )
+
+    if requests:
+        try:
+            response = await gh_client.batch_update({'requests': requests})
+        except Exception as e:
+            logging.error(f'Ошибка при создании листов Google Sheets:\n{e}')
+            return
+
+        # Свойства созданных листов - из ответов на `addSheet`
+        for reply in response.get('replies', []):
+            if 'addSheet' in reply:
+                properties[reply['addSheet']['properties']['title']] = reply['addSheet']['properties']
+
+    gh_client.cache_sheets(properties)
+    gh_sheet_router.load(properties)
@@ -0,0 +1,218 @@
+"""
+Обслуживание секций таблиц истории.
+
+Фоновая задача раз в `DB_PARTITION_MAINTENANCE_INTERVAL` сек.:
++ Создает секции на `DB_PARTITION_PREMAKE_MONTHS` месяцев вперед, чтобы вставкам всегда было куда писать.
+  Если обслуживание отстало, записи попадают в секцию по умолчанию - проход сообщает об этом в лог
+  и переносит их в секцию месяца, когда создает ее
++ Удаляет (`DB_RETENTION_MODE=drop`) или отсоединяет (`detach`) секции старше `DB_RETENTION_DAYS` дней.
+  Это мгновенная операция над метаданными вместо DELETE по всей таблице
++ Удаляет из `api_payloads` данные, на которые больше не ссылается ни одна запись истории
+"""
+
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from config.config import DB_RETENTION_DAYS, DB_RETENTION_MODE
+from models.db import engine, ensure_partitions, get_history_tables, get_default_partition_name, add_months
+
+
+class PartitionMaintainer:
+    """
+    Создание новых и удаление старых секций таблиц истории.
+    """
+
+    def __init__(self, retention_days: int, retention_mode: str, cleanup_batch_size: int = 10000):
+        if retention_mode not in ('drop', 'detach'):
+            raise ValueError(f'Неизвестный режим хранения секций: {retention_mode}')
+
+        self.retention_days = retention_days
+        self.retention_mode = retention_mode
+        self.cleanup_batch_size = cleanup_batch_size
+
+        self._task: asyncio.Task | None = None
+        # После удаления секций осиротевшие данные чистятся отдельно. Без срока хранения секции не удаляются,
+        # и проверять при каждом запуске нечего; со сроком - проверка после перезапуска доделывает прерванную чистку
+        self._cleanup_pending = self.retention_days > 0
+
+        # Статистика
+        self.created = 0
+        self.default_partition_rows = 0
+        self.dropped = 0
+        self.detached = 0
+        self.payloads_deleted = 0
+
+    async def run_once(self) -> None:
+        """
+        Один проход обслуживания.
+        """
+
+        async with engine.begin() as connection:
+            await self._check_default_partitions(connection)
+            self.created += await ensure_partitions(connection)
+
+        if self.retention_days > 0:
+            if await self._expire_partitions():
+                self._cleanup_pending = True
+
+        if self._cleanup_pending:
+            await self._delete_orphan_payloads()
+            self._cleanup_pending = False
+
+    async def _check_default_partitions(self, connection) -> None:
+        """
+        Записи в секции по умолчанию значат, что секция месяца не была создана вовремя.
+        """
+
+        defaults = {table: get_default_partition_name(table) for table in get_history_tables()}
+
+        # Секций по умолчанию может еще не быть - их создает ensure_partitions
+        if not (await connection.execute(
+            text('SELECT bool_and(to_regclass(name) IS NOT NULL) FROM unnest(CAST(:names AS text[])) AS name'),
+            {'names': list(defaults.values())}
+        )).scalar():
+            return
+
+        counts = ' UNION ALL '.join(
+            f"SELECT '{table}' AS name, count(*) AS rows FROM {partition}" for table, partition in defaults.items()
+        )
+        stray = {row.name: row.rows for row in (await connection.execute(text(counts))) if row.rows}
+        self.default_partition_rows = sum(stray.values())
+
+        if stray:
+            logging.error(f'Записи в секциях по умолчанию (нет секции месяца): {stray}')
+
+    def start(self, interval: float) -> None:
+        """
+        Запускает обслуживание раз в `interval` секунд.
+        """
+
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self) -> None:
+        """
+        Останавливает фоновое обслуживание.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logging.error(f'Ошибка при обслуживании секций таблиц истории:\n{e}')
+
+            await asyncio.sleep(interval)
+
+    async def _expire_partitions(self) -> int:
+        """
+        Удаляет или отсоединяет секции, все записи которых старше срока хранения.
+
+        :return: Кол-во обработанных секций.
+        """
+
+        expired = 0
+
+        async with engine.begin() as connection:
+            cutoff = (await connection.execute(text('SELECT localtimestamp'))).scalar() - timedelta(days=self.retention_days)
+
+            for table in get_history_tables():
+                partitions = (await connection.execute(text(
+                    f"SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = '{table}'::regclass"
+                ))).scalars().all()
+
+                for partition in sorted(partitions):
+                    match = re.fullmatch(rf'{table}_p(\d{{4}})(\d{{2}})', partition)
+                    if match is None:
+                        continue
+
+                    # Секция целиком старше срока, если старше срока ее верхняя граница
+                    month = datetime(int(match[1]), int(match[2]), 1)
+                    if add_months(month, 1) > cutoff:
+                        continue
+
+                    if self.retention_mode == 'drop':
+                        await connection.execute(text(f'DROP TABLE {partition}'))
+                        self.dropped += 1
+                    else:
+                        # Отсоединенная таблица остается в БД как архив, ее можно выгрузить и удалить вручную
+                        await connection.execute(text(f'ALTER TABLE {table} DETACH PARTITION {partition}'))
+                        self.detached += 1
+
+                    expired += 1
+                    logging.info(f'Секция {partition} старше {self.retention_days} дн.: {self.retention_mode}')
+
+        return expired
+
+    async def _delete_orphan_payloads(self) -> None:
+        """
+        Удаляет пачками данные из `api_payloads`, на которые не ссылается ни одна таблица.
+        Ссылки ищутся во всех таблицах с внешним ключом на `api_payloads`, включая отсоединенные архивные секции.
+
+        Данные, которые в этот момент записываются снова, заблокированы записью (FOR KEY SHARE, см. `service.db`)
+        и пропускаются до следующей чистки.
+        """
+
+        async with engine.connect() as connection:
+            references = (await connection.execute(text(
+                "SELECT c.conrelid::regclass::text, a.attname "
+                "FROM pg_constraint c "
+                "JOIN pg_class r ON r.oid = c.conrelid "
+                "JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1] "
+                "WHERE c.confrelid = 'api_payloads'::regclass AND c.contype = 'f' AND NOT r.relispartition"
+            ))).all()
+
+        # Без внешних ключей ссылки не найти - удалять нельзя ничего
+        if not references:
+            logging.warning('Нет таблиц со ссылками на api_payloads, чистка данных пропущена')
+            return
+
+        not_referenced = ' AND '.join(
+            f'NOT EXISTS (SELECT 1 FROM {table} WHERE {column} = p.content_hash)' for table, column in references
+        )
+
+        statement = text(
+            f'DELETE FROM api_payloads WHERE content_hash IN ('
+            f'SELECT p.content_hash FROM api_payloads p WHERE {not_referenced} LIMIT :batch_size '
+            f'FOR UPDATE OF p SKIP LOCKED)'
+        )
+
+        # Короткие транзакции, чтобы не держать блокировки на всю чистку
+        while True:
+            try:
+                async with engine.begin() as connection:
+                    deleted = (await connection.execute(statement, {'batch_size': self.cleanup_batch_size})).rowcount
+            except IntegrityError as e:
+                # Ссылку закоммитили уже после снимка запроса - пачка откатилась, остальное удалит следующая чистка
+                logging.warning(f'Данные api_payloads получили новую ссылку во время чистки:\n{e}')
+                break
+
+            self.payloads_deleted += deleted
+            if deleted < self.cleanup_batch_size:
+                break
+
+    def get_stats(self) -> dict:
+        return {
+            'created': self.created,
+            'default_partition_rows': self.default_partition_rows,
+            'dropped': self.dropped,
+            'detached': self.detached,
+            'payloads_deleted': self.payloads_deleted
+        }
+
+
+partition_maintainer = PartitionMaintainer(DB_RETENTION_DAYS, DB_RETENTION_MODE)
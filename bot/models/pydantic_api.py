@@ -1,11 +1,20 @@
 """
 Модуль содержит в себе модели Pydantic 2.0+ для валидации ответов API
 Данные взяты с https://jsonplaceholder.typicode.com/
+
+Ключи API приходят в camelCase. Перевод в snake_case задан алиасами моделей (`alias_generator`),
+поэтому ответ валидируется прямо из байтов: `Model.model_validate_json(body)`.
 """
 
 from datetime import datetime
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
+from pydantic.alias_generators import to_camel
+
+
+# camelCase-алиасы для ключей API. `populate_by_name` оставляет возможность заполнять поля по имени,
+# например из ORM-объектов или `model_dump()`.
+_API_MODEL_CONFIG = ConfigDict(from_attributes=True, alias_generator=to_camel, populate_by_name=True)
 
 
 class _DBMixin(BaseModel):
@@ -23,7 +32,7 @@ class _UsersAddressGeoModel(BaseModel):
     lat: float
     lng: float
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class _UsersAddressModel(BaseModel):
@@ -33,7 +42,7 @@ class _UsersAddressModel(BaseModel):
     zipcode: str
     geo: _UsersAddressGeoModel
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class _UsersCompanyModel(BaseModel):
@@ -41,7 +50,7 @@ class _UsersCompanyModel(BaseModel):
     catchPhrase: str
     bs: str
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class UserModel(BaseModel):
@@ -54,7 +63,7 @@ class UserModel(BaseModel):
     website: str
     company: _UsersCompanyModel
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class UserModelFromDB(UserModel, _DBMixin):
@@ -67,7 +76,7 @@ class PostModel(BaseModel):
     title: str
     body: str
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class PostModelFromDB(PostModel, _DBMixin):
@@ -81,7 +90,7 @@ class CommentModel(BaseModel):
     email: str
     body: str
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class CommentModelFromDB(CommentModel, _DBMixin):
@@ -93,7 +102,7 @@ class AlbumModel(BaseModel):
     album_id: int = Field(alias='id')
     title: str
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class AlbumModelFromDB(AlbumModel, _DBMixin):
@@ -107,7 +116,7 @@ class PhotoModel(BaseModel):
     url: str
     thumbnail_url: str
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class PhotoModelFromDB(PhotoModel, _DBMixin):
@@ -120,8 +129,25 @@ class TodoModel(BaseModel):
     title: str
     completed: bool
 
-    model_config = ConfigDict(from_attributes=True)
+    model_config = _API_MODEL_CONFIG
 
 
 class TodoModelFromDB(TodoModel, _DBMixin):
     todo_id: int = Field() # Лишаем поле alias='id' во избежание конфликтов
+
+
+# Соответствие ресурса API и Pydantic-модели его объектов
+resource_models = {
+    'users': UserModel,
+    'posts': PostModel,
+    'comments': CommentModel,
+    'albums': AlbumModel,
+    'photos': PhotoModel,
+    'todos': TodoModel
+}
+
+
+# Заранее собранные валидаторы коллекций: байты JSON-массива -> список моделей
+resource_list_adapters = {
+    resource: TypeAdapter(list[pydantic_model]) for resource, pydantic_model in resource_models.items()
+}
@@ -0,0 +1,191 @@
+"""
+Маршрутизация чтения между репликами PostgreSQL.
+
++ Сессии только для чтения получают реплики по кругу (round-robin), пока те здоровы
++ Фоновая проверка раз в `DB_REPLICA_CHECK_INTERVAL` сек. измеряет отставание каждой реплики;
+  недоступная или отстающая больше `DB_REPLICA_MAX_LAG` сек. реплика исключается до следующей успешной проверки
++ Нет здоровых реплик - чтение идет из основной БД
++ Пользователь, который записывал данные меньше `DB_REPLICA_MAX_LAG` сек. назад, читает из основной БД:
+  реплика могла еще не получить его запись
+"""
+
+
+import asyncio
+import logging
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config.config import DB_REPLICA_MAX_LAG
+from models.db import engine, replica_engines
+
+
+# Отставание реплики, сек. Если реплика применила все полученное WAL, она не отстает,
+# даже если последняя транзакция была давно. На основной БД (не в режиме восстановления) - 0.
+_REPLICA_LAG = text(
+    'SELECT CASE '
+    'WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+    'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+)
+
+
+class _Replica:
+    def __init__(self, replica_engine: AsyncEngine):
+        self.engine = replica_engine
+        self.name = replica_engine.url.render_as_string(hide_password=True)
+
+        self.healthy = False  # До первой проверки реплика не используется
+        self.lag: float | None = None
+        self.reads = 0
+
+
+class ReplicaSet:
+    """
+    Выбор движка БД для сессии.
+    """
+
+    def __init__(self, primary: AsyncEngine, replicas: list[AsyncEngine], max_lag: float):
+        self.primary = primary
+        self.replicas = [_Replica(replica_engine) for replica_engine in replicas]
+        self.max_lag = max_lag
+
+        self._next = 0
+        # ID пользователя -> время его последней записи (time.monotonic)
+        self._last_writes: dict[int, float] = {}
+        self._task: asyncio.Task | None = None
+
+        # Статистика
+        self.primary_reads = 0
+        self.own_writes_reads = 0
+        self.failovers = 0
+
+    def get_read_engine(self, telegram_user_id: int | None = None) -> AsyncEngine:
+        """
+        Движок для сессии только для чтения.
+
+        :param telegram_user_id: ID пользователя, чьи данные читаются.
+        Если он недавно записывал, выбирается основная БД.
+        """
+
+        if telegram_user_id is not None and self._wrote_recently(telegram_user_id):
+            self.own_writes_reads += 1
+            self.primary_reads += 1
+            return self.primary
+
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[self._next]
+            self._next = (self._next + 1) % len(self.replicas)
+
+            if replica.healthy:
+                replica.reads += 1
+                return replica.engine
+
+        self.primary_reads += 1
+        return self.primary
+
+    def record_write(self, telegram_user_id: int) -> None:
+        """
+        Отмечает запись пользователя: ближайшие `max_lag` сек. его чтение идет из основной БД.
+        """
+
+        if self.replicas:
+            self._last_writes[telegram_user_id] = time.monotonic()
+
+    def mark_failed(self, replica_engine: AsyncEngine, error: BaseException) -> None:
+        """
+        Исключает реплику, к которой не удалось подключиться, до следующей успешной проверки.
+        """
+
+        for replica in self.replicas:
+            if replica.engine is replica_engine and replica.healthy:
+                replica.healthy = False
+                self.failovers += 1
+                logging.warning(f'Реплика {replica.name} недоступна, чтение переключено: {error!r}')
+
+    def _wrote_recently(self, telegram_user_id: int) -> bool:
+        written_at = self._last_writes.get(telegram_user_id)
+        return written_at is not None and time.monotonic() - written_at < self.max_lag
+
+    async def check_once(self, timeout: float) -> None:
+        """
+        Проверяет доступность и отставание всех реплик.
+        """
+
+        await asyncio.gather(*(self._check(replica, timeout) for replica in self.replicas))
+
+        # Давние записи больше не влияют на выбор - не копим их
+        now = time.monotonic()
+        self._last_writes = {
+            user_id: written_at for user_id, written_at in self._last_writes.items() if now - written_at < self.max_lag
+        }
+
+    @staticmethod
+    async def _measure_lag(replica: _Replica) -> float:
+        async with replica.engine.connect() as connection:
+            return float((await connection.execute(_REPLICA_LAG)).scalar())
+
+    async def _check(self, replica: _Replica, timeout: float) -> None:
+        try:
+            replica.lag = await asyncio.wait_for(self._measure_lag(replica), timeout=timeout)
+        except Exception as e:
+            if replica.healthy:
+                logging.warning(f'Реплика {replica.name} исключена из чтения: {e!r}')
+            replica.healthy = False
+            replica.lag = None
+            return
+
+        healthy = replica.lag <= self.max_lag
+        if healthy != replica.healthy:
+            if healthy:
+                logging.info(f'Реплика {replica.name} используется для чтения, отставание {replica.lag:.2f} сек.')
+            else:
+                logging.warning(f'Реплика {replica.name} исключена из чтения: отставание {replica.lag:.2f} сек.')
+        replica.healthy = healthy
+
+    def start(self, interval: float) -> None:
+        """
+        Запускает проверку реплик раз в `interval` секунд.
+        """
+
+        if self.replicas and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._loop(interval))
+
+    async def stop(self) -> None:
+        """
+        Останавливает проверку реплик и закрывает их пулы соединений.
+        """
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.check_once(timeout=interval)
+            except Exception as e:
+                logging.error(f'Ошибка при проверке реплик БД:\n{e}')
+
+            await asyncio.sleep(interval)
+
+    def get_stats(self) -> dict:
+        return {
+            'replicas': {
+                replica.name: {'healthy': replica.healthy, 'lag': replica.lag, 'reads': replica.reads}
+                for replica in self.replicas
+            },
+            'primary_reads': self.primary_reads,
+            'own_writes_reads': self.own_writes_reads,
+            'failovers': self.failovers
+        }
+
+
+replica_set = ReplicaSet(engine, replica_engines, DB_REPLICA_MAX_LAG)
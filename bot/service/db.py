@@ -3,34 +3,76 @@
 
 Архитектуру можно представить таким образом:
 ABS Class __init__() ---> `Классы для создания записей в таблицах` ---> Class ServiceDB для передачи в хендлеры.
+
+Данные объектов API хранятся в `api_payloads` без повторов (ключ - хэш содержимого),
+а таблицы истории (users, posts, ...) хранят только ссылку на них, ID пользователя и время запроса.
+
+По умолчанию каждая запись - один запрос (`_insert_returning`).
+Если включена очередь отложенной записи (`DB_WRITE_BEHIND_ENABLED`), ServiceDB не пишет строки по одной,
+а складывает их в `DBWriteBehindQueue`. Очередь собирает вставки от параллельных апдейтов
+и записывает их пачками - одним многострочным `INSERT ... RETURNING` на таблицу.
+Включать стоит, когда записей так много, что упираются в число транзакций БД: каждая запись ждет пачку
+до `DB_WRITE_BEHIND_MAX_DELAY` сек.
+
+Для заливки целых коллекций есть `ServiceDB.create_many`: строки передаются в PostgreSQL через `COPY`.
+
+История запросов пользователя по всем таблицам читается `ServiceDB.get_history` постранично (keyset-пагинация).
+Сводку запросов пользователя (`user_usage_stats`) каждая запись истории обновляет в той же транзакции,
+читает ее `ServiceDB.get_usage_stats`.
+Строку для Google Sheets `ServiceDB.create_obj` пишет в очередь `gh_outbox` в той же транзакции,
+в листы ее переносит `service.gh_outbox`.
+
+Сессии записи идут в основную БД, сессии только для чтения (`session(read_only=True)`) - на реплики,
+если они настроены (`DATABASE_REPLICA_URLS`, см. `models.replicas`).
 """
 
 
+from collections import Counter
 from contextlib import asynccontextmanager
-from typing import Annotated
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Annotated, AsyncIterable, AsyncIterator, Iterable
+import asyncio
+import hashlib
+import json
 import logging
+import time
 
 from injectable import injectable, autowired, Autowired
+from pydantic import BaseModel
 
+from sqlalchemy import insert, select, bindparam, cast, func, literal, tuple_, union_all, LargeBinary, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError, DataError
 
 # SQLAlchemy
 from models.db import (
     engine,
+    pool_metrics,
 
+    PayloadDBModel,
+    UserUsageStatsDBModel,
+    GHOutboxDBModel,
     UserDBModel,
-    AddressDBModel,
-    GeoDBModel,
-    CompanyDBModel,
     PostDBModel,
-    UserDBModel,
     CommentDBModel,
     AlbumDBModel,
     PhotoDBModel,
     TodoDBModel
 )
+from models.replicas import replica_set
+from service.gh_outbox import gh_outbox_dispatcher
+
+from config.config import (
+    HISTORY_PAGE_SIZE,
+
+    DB_WRITE_BEHIND_ENABLED,
+    DB_WRITE_BEHIND_BATCH_SIZE,
+    DB_WRITE_BEHIND_MAX_DELAY,
+    DB_WRITE_BEHIND_MAX_PENDING
+)
 
 # Pydantic
 from models.pydantic_api import (
@@ -50,7 +92,9 @@ from models.pydantic_api import (
     PhotoModelFromDB,
 
     TodoModel,
-    TodoModelFromDB
+    TodoModelFromDB,
+
+    resource_models
 )
 
 
@@ -69,21 +113,59 @@ class _DBAsyncSessionManager:
         )
 
     @asynccontextmanager
-    async def session(self):
+    async def session(self, read_only: bool = False, telegram_user_id: int | None = None):
         """
         Контекстный менеджер сессии.
         Возвращает сессию и ловит ошибки, после чего закрывает соединение.
+
+        :param read_only: Сессия только для чтения: идет на здоровую реплику, если они настроены,
+        и ничего не коммитит.
+        :param telegram_user_id: Пользователь, чьи данные пишутся или читаются.
+        После записи его чтение какое-то время идет из основной БД (см. `models.replicas`).
         """
 
-        async with self.AsyncSessionLocal() as session:
-            try:
-                yield session
-                await session.commit()
-            except Exception as e:
+        read_engine = replica_set.get_read_engine(telegram_user_id) if read_only else engine
+        session = await self._connect(read_engine)
+
+        try:
+            yield session
+
+            if read_only:
                 await session.rollback()
+            else:
+                await session.commit()
+                if telegram_user_id is not None:
+                    replica_set.record_write(telegram_user_id)
+        except Exception as e:
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
+
+    async def _connect(self, bind) -> AsyncSession:
+        """
+        Открывает сессию и сразу берет для нее соединение.
+        Если недоступна реплика - сессия открывается на основной БД.
+        """
+
+        session = self.AsyncSessionLocal(bind=bind)
+
+        try:
+            # Берем соединение сразу, чтобы измерить ожидание пула
+            started = time.perf_counter()
+            await session.connection()
+        except (SQLAlchemyError, OSError) as e:
+            await session.close()
+            if bind is engine:
                 raise
-            finally:
-                await session.close()
+
+            replica_set.mark_failed(bind, e)
+            return await self._connect(engine)
+
+        if bind is engine:
+            pool_metrics.observe_wait(time.perf_counter() - started)
+
+        return session
 
 
 @injectable
@@ -98,6 +180,173 @@ class _ServiceBase:
         self.db_session_manager = db_session_manager
 
 
+# Ресурс -> (ORM-модель таблицы истории, Pydantic-модель записи из БД)
+_resources = {
+    'users': (UserDBModel, UserModelFromDB),
+    'posts': (PostDBModel, PostModelFromDB),
+    'comments': (CommentDBModel, CommentModelFromDB),
+    'albums': (AlbumDBModel, AlbumModelFromDB),
+    'photos': (PhotoDBModel, PhotoModelFromDB),
+    'todos': (TodoDBModel, TodoModelFromDB),
+}
+
+
+_payload_hash = bindparam('payload_content_hash', type_=LargeBinary)
+
+# Уже записанные данные блокируются FOR KEY SHARE до конца транзакции: чистка осиротевших данных
+# (`models.partitions`) пропускает заблокированные строки и не удалит их между этой вставкой и вставкой истории.
+# Вставка читает из этого CTE, поэтому блокировка берется раньше проверки конфликта: если чистка успела удалить
+# данные, они вставляются заново.
+_lock_payload = (
+    select(PayloadDBModel.content_hash)
+    .where(PayloadDBModel.content_hash == _payload_hash)
+    .with_for_update(read=True, key_share=True)
+    .cte('payload_lock')
+)
+
+# Данные объекта записываются в api_payloads, только если такого же объекта там еще нет
+_upsert_payloads = (
+    pg_insert(PayloadDBModel.__table__)
+    .from_select(
+        ['content_hash', 'resource', 'data'],
+        select(
+            _payload_hash,
+            bindparam('payload_resource', type_=String),
+            cast(bindparam('payload_data', type_=String), JSONB)
+        ).select_from(select(func.count()).select_from(_lock_payload).subquery())
+    )
+    .on_conflict_do_nothing(index_elements=['content_hash'])
+)
+
+
+def _make_usage_upsert():
+    """
+    Обновление сводки `user_usage_stats`: +`usage_requests` запросов пользователя к ресурсу.
+    Время берется `now()` - в одной транзакции оно совпадает с `created_at` записанной истории.
+    """
+
+    table = UserUsageStatsDBModel.__table__
+    statement = pg_insert(table).values(
+        telegram_user_id=bindparam('usage_telegram_user_id'),
+        resource=bindparam('usage_resource'),
+        requests=bindparam('usage_requests'),
+        first_at=func.now(),
+        last_at=func.now()
+    )
+
+    return statement.on_conflict_do_update(
+        index_elements=['telegram_user_id', 'resource'],
+        set_={
+            'requests': table.c.requests + statement.excluded.requests,
+            'first_at': func.least(table.c.first_at, statement.excluded.first_at),
+            'last_at': func.greatest(table.c.last_at, statement.excluded.last_at)
+        }
+    )
+
+
+_upsert_usage = _make_usage_upsert()
+
+
+# Строка для Google Sheets в очередь `gh_outbox` (см. `service.gh_outbox`)
+_enqueue_outbox = (
+    pg_insert(GHOutboxDBModel.__table__)
+    .values(
+        sheet=bindparam('outbox_sheet'),
+        row=cast(bindparam('outbox_row', type_=String), JSONB)
+    )
+)
+
+
+def _outbox_params(resource: str, sheet_row: list) -> dict:
+    """
+    Параметры `_enqueue_outbox`: лист называется так же, как ресурс.
+    """
+
+    return {'outbox_sheet': resource, 'outbox_row': json.dumps(sheet_row, ensure_ascii=False, default=str)}
+
+
+def _payload_params(resource: str, api_model: BaseModel) -> dict:
+    """
+    Параметры `_upsert_payloads` для одного объекта API.
+    Хэш считается от названия ресурса и JSON объекта: одинаковые объекты дают одинаковый ключ.
+
+    :param resource: Название ресурса.
+    :param api_model: Pydantic-модель с данными API.
+    """
+
+    data = api_model.model_dump_json()
+
+    return {
+        'payload_content_hash': hashlib.sha256(f'{resource}:{data}'.encode()).digest(),
+        'payload_resource': resource,
+        'payload_data': data
+    }
+
+
+def _make_echo(model_from_db, api_model: BaseModel, row) -> str:
+    """
+    Собирает JSON-ответ "из БД" по данным API и полям, которые вернул `RETURNING`.
+
+    :param model_from_db: Pydantic-модель записи из БД, например PostModelFromDB.
+    :param api_model: Pydantic-модель с данными API.
+    :param row: Запись БД с полями `id`, `telegram_user_id`, `created_at`.
+    """
+
+    return model_from_db.model_validate({
+        **api_model.model_dump(),
+        'id': row.id,
+        'telegram_user_id': row.telegram_user_id,
+        'created_at': row.created_at
+    }).model_dump_json()
+
+
+async def _insert_returning(
+        db, resource: str, api_model: BaseModel, telegram_user_id: int, sheet_row: list | None = None
+):
+    """
+    Одним запросом записывает данные объекта (если их еще нет), запись истории, сводку пользователя
+    и, если передана, строку для Google Sheets, возвращая поля, которые заполнила БД.
+
+    WITH payload AS (INSERT INTO api_payloads ... ON CONFLICT DO NOTHING),
+         usage AS (INSERT INTO user_usage_stats ... ON CONFLICT DO UPDATE),
+         outbox AS (INSERT INTO gh_outbox ...)
+    INSERT INTO <таблица> (telegram_user_id, payload_hash) VALUES (...) RETURNING id, telegram_user_id, created_at
+
+    :param db: Сессия БД.
+    :param resource: Название ресурса (таблицы).
+    :param api_model: Pydantic-модель с данными API.
+    :param telegram_user_id: ID пользователя.
+    :param sheet_row: Строка листа `resource` для очереди `gh_outbox`.
+
+    :return: Строка с полями `id`, `telegram_user_id`, `created_at`.
+    """
+
+    table = _resources[resource][0].__table__
+    payload_params = _payload_params(resource, api_model)
+
+    # Запрос на уровне таблиц (Core): параметры CTE передаются при выполнении
+    statement = (
+        insert(table)
+        .values(telegram_user_id=telegram_user_id, payload_hash=payload_params['payload_content_hash'])
+        .returning(table.c.id, table.c.telegram_user_id, table.c.created_at)
+        .add_cte(_upsert_payloads.cte('payload'))
+        .add_cte(_upsert_usage.cte('usage'))
+    )
+    params = {
+        **payload_params,
+        'usage_telegram_user_id': telegram_user_id,
+        'usage_resource': resource,
+        'usage_requests': 1
+    }
+
+    if sheet_row is not None:
+        statement = statement.add_cte(_enqueue_outbox.cte('outbox'))
+        params.update(_outbox_params(resource, sheet_row))
+
+    result = await db.execute(statement, params)
+    return result.one()
+
+
 @injectable
 class _Users(_ServiceBase):
     """
@@ -105,43 +354,26 @@ class _Users(_ServiceBase):
     Реализует метод create_user, который отвечает за сохранение в БД юзера и ID тг-пользователя.
     """
 
-    async def create_user(self, user_pydantic: UserModel, telegram_user_id) -> str:
+    async def create_user(self, user_pydantic: UserModel, telegram_user_id, sheet_row: list | None = None) -> str:
         """
         Метод получает модель Pydantic, сохраняет запись в БД и возвращает новую Pydantic модель
 
         :param user_pydantic: Проверенные данные Pydantic.
         :param telegram_user_id: ID пользователя, который отправил сообщение боту.
+        :param sheet_row: Строка для Google Sheets - ставится в очередь `gh_outbox` в той же транзакции.
 
         :return: JSON-Pydantic модель на основе записи из базы данных, в качестве подтверждения.
         """
 
-        async with self.db_session_manager.session() as db:
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
             try:
 
-                # Получаем данные из связанных Pydantic-моделей
-                user_address_geo_api_data = user_pydantic.address.geo.model_dump()
-                user_address_api_data = user_pydantic.address.model_dump(exclude={'geo'})
-                user_company_api_data = user_pydantic.company.model_dump()
-                user_api_data = user_pydantic.model_dump(exclude={'address', 'company'})
-
-                # Создаем объекты моделей
-                user_address_geo_db = GeoDBModel(**user_address_geo_api_data)
-                user_address_db = AddressDBModel(**user_address_api_data, geo=user_address_geo_db)
-                user_company_db = CompanyDBModel(**user_company_api_data)
-                user_db = UserDBModel(**user_api_data, address=user_address_db, company=user_company_db)
-
-                # Отдельно добавляем Telegram ID
-                user_db.telegram_user_id = telegram_user_id
-
-                db.add(user_db)
-
-                # Обновляем объект и получаем поля из БД
-                await db.flush()
-                await db.refresh(user_db, attribute_names=['address', 'company'])
+                # Пользователь вместе с адресом и компанией - один объект в api_payloads,
+                # в таблицу истории пишется только ссылка на него
+                user_db_row = await _insert_returning(db, 'users', user_pydantic, telegram_user_id, sheet_row)
 
                 # Возвращаем сериализованный JSON объект
-                user_validated = UserModelFromDB.model_validate(user_db)
-                return user_validated.model_dump_json()
+                return _make_echo(UserModelFromDB, user_pydantic, user_db_row)
 
             except SQLAlchemyError as e:
                 logging.error(f'Ошибка при сохранении пользователя:\n{e}')
@@ -155,35 +387,25 @@ class _Posts(_ServiceBase):
     Реализует метод create_post, который отвечает за сохранение в БД поста и ID тг-пользователя.
     """
 
-    async def create_post(self, post_pydantic: PostModel, telegram_user_id) -> str:
+    async def create_post(self, post_pydantic: PostModel, telegram_user_id, sheet_row: list | None = None) -> str:
         """
         Метод получает модель Pydantic, сохраняет запись в БД и возвращает новую Pydantic модель
 
         :param post_pydantic: Проверенные данные Pydantic.
         :param telegram_user_id: ID пользователя, который отправил сообщение боту.
+        :param sheet_row: Строка для Google Sheets - ставится в очередь `gh_outbox` в той же транзакции.
 
         :return: JSON-Pydantic модель на основе записи из базы данных, в качестве подтверждения.
         """
 
-        async with self.db_session_manager.session() as db:
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
             try:
 
-                # Создаем объект модели
-                post_api_data = post_pydantic.model_dump()
-                post_db = PostDBModel(**post_api_data)
-
-                # Отдельно добавляем Telegram ID
-                post_db.telegram_user_id = telegram_user_id
-
-                db.add(post_db)
-
-                # Обновляем объект и получаем поля из БД
-                await db.flush()
-                await db.refresh(post_db)
+                # Данные объекта пишутся в api_payloads один раз, в таблицу истории - только ссылка на них
+                post_db_row = await _insert_returning(db, 'posts', post_pydantic, telegram_user_id, sheet_row)
 
                 # Возвращаем сериализованный JSON объект
-                post_validated = PostModelFromDB.model_validate(post_db)
-                return post_validated.model_dump_json()
+                return _make_echo(PostModelFromDB, post_pydantic, post_db_row)
 
             except SQLAlchemyError as e:
                 logging.error(f'Ошибка при сохранении поста:\n{e}')
@@ -197,35 +419,25 @@ class _Comments(_ServiceBase):
     Реализует метод create_comment, который отвечает за сохранение в БД комментария и ID тг-пользователя.
     """
 
-    async def create_comment(self, comment_pydantic: CommentModel, telegram_user_id) -> str:
+    async def create_comment(self, comment_pydantic: CommentModel, telegram_user_id, sheet_row: list | None = None) -> str:
         """
         Метод получает модель Pydantic, сохраняет запись в БД и возвращает новую Pydantic модель
 
         :param comment_pydantic: Проверенные данные Pydantic.
         :param telegram_user_id: ID пользователя, который отправил сообщение боту.
+        :param sheet_row: Строка для Google Sheets - ставится в очередь `gh_outbox` в той же транзакции.
 
         :return: JSON-Pydantic модель на основе записи из базы данных, в качестве подтверждения.
         """
 
-        async with self.db_session_manager.session() as db:
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
             try:
 
-                # Создаем объект модели
-                comment_api_data = comment_pydantic.model_dump()
-                comment_db = CommentDBModel(**comment_api_data)
-
-                # Отдельно добавляем Telegram ID
-                comment_db.telegram_user_id = telegram_user_id
-
-                db.add(comment_db)
-
-                # Обновляем объект и получаем поля из БД
-                await db.flush()
-                await db.refresh(comment_db)
+                # Данные объекта пишутся в api_payloads один раз, в таблицу истории - только ссылка на них
+                comment_db_row = await _insert_returning(db, 'comments', comment_pydantic, telegram_user_id, sheet_row)
 
                 # Возвращаем сериализованный JSON объект
-                comment_validated = CommentModelFromDB.model_validate(comment_db)
-                return comment_validated.model_dump_json()
+                return _make_echo(CommentModelFromDB, comment_pydantic, comment_db_row)
 
             except SQLAlchemyError as e:
                 logging.error(f'Ошибка при сохранении поста:\n{e}')
@@ -239,35 +451,25 @@ class _Albums(_ServiceBase):
     Реализует метод create_album, который отвечает за сохранение в БД альбома и ID тг-пользователя.
     """
 
-    async def create_album(self, album_pydantic: AlbumModel, telegram_user_id) -> str:
+    async def create_album(self, album_pydantic: AlbumModel, telegram_user_id, sheet_row: list | None = None) -> str:
         """
         Метод получает модель Pydantic, сохраняет запись в БД и возвращает новую Pydantic модель
 
         :param album_pydantic: Проверенные данные Pydantic.
         :param telegram_user_id: ID пользователя, который отправил сообщение боту.
+        :param sheet_row: Строка для Google Sheets - ставится в очередь `gh_outbox` в той же транзакции.
 
         :return: JSON-Pydantic модель на основе записи из базы данных, в качестве подтверждения.
         """
 
-        async with self.db_session_manager.session() as db:
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
             try:
 
-                # Создаем объект модели
-                album_api_data = album_pydantic.model_dump()
-                album_db = AlbumDBModel(**album_api_data)
-
-                # Отдельно добавляем Telegram ID
-                album_db.telegram_user_id = telegram_user_id
-
-                db.add(album_db)
-
-                # Обновляем объект и получаем поля из БД
-                await db.flush()
-                await db.refresh(album_db)
+                # Данные объекта пишутся в api_payloads один раз, в таблицу истории - только ссылка на них
+                album_db_row = await _insert_returning(db, 'albums', album_pydantic, telegram_user_id, sheet_row)
 
                 # Возвращаем сериализованный JSON объект
-                album_validated = AlbumModelFromDB.model_validate(album_db)
-                return album_validated.model_dump_json()
+                return _make_echo(AlbumModelFromDB, album_pydantic, album_db_row)
 
             except SQLAlchemyError as e:
                 logging.error(f'Ошибка при сохранении поста:\n{e}')
@@ -282,35 +484,25 @@ class _Photos(_ServiceBase):
     Реализует метод create_photo, который отвечает за сохранение в БД фото и ID тг-пользователя.
     """
 
-    async def create_photo(self, photo_pydantic: PhotoModel, telegram_user_id) -> str:
+    async def create_photo(self, photo_pydantic: PhotoModel, telegram_user_id, sheet_row: list | None = None) -> str:
         """
         Метод получает модель Pydantic, сохраняет запись в БД и возвращает новую Pydantic модель
 
         :param photo_pydantic: Проверенные данные Pydantic.
         :param telegram_user_id: ID пользователя, который отправил сообщение боту.
+        :param sheet_row: Строка для Google Sheets - ставится в очередь `gh_outbox` в той же транзакции.
 
         :return: JSON-Pydantic модель на основе записи из базы данных, в качестве подтверждения.
         """
 
-        async with self.db_session_manager.session() as db:
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
             try:
 
-                # Создаем объект модели
-                photo_api_data = photo_pydantic.model_dump()
-                photo_db = PhotoDBModel(**photo_api_data)
-
-                # Отдельно добавляем Telegram ID
-                photo_db.telegram_user_id = telegram_user_id
-
-                db.add(photo_db)
-
-                # Обновляем объект и получаем поля из БД
-                await db.flush()
-                await db.refresh(photo_db)
+                # Данные объекта пишутся в api_payloads один раз, в таблицу истории - только ссылка на них
+                photo_db_row = await _insert_returning(db, 'photos', photo_pydantic, telegram_user_id, sheet_row)
 
                 # Возвращаем сериализованный JSON объект
-                photo_validated = PhotoModelFromDB.model_validate(photo_db)
-                return photo_validated.model_dump_json()
+                return _make_echo(PhotoModelFromDB, photo_pydantic, photo_db_row)
 
             except SQLAlchemyError as e:
                 logging.error(f'Ошибка при сохранении поста:\n{e}')
@@ -324,43 +516,616 @@ class _Todos(_ServiceBase):
     Реализует метод create_todo, который отвечает за сохранение в БД заметки и ID тг-пользователя.
     """
 
-    async def create_todo(self, todo_pydantic: TodoModel, telegram_user_id) -> str:
+    async def create_todo(self, todo_pydantic: TodoModel, telegram_user_id, sheet_row: list | None = None) -> str:
         """
         Метод получает модель Pydantic, сохраняет запись в БД и возвращает новую Pydantic модель
 
         :param todo_pydantic: Проверенные данные Pydantic.
         :param telegram_user_id: ID пользователя, который отправил сообщение боту.
+        :param sheet_row: Строка для Google Sheets - ставится в очередь `gh_outbox` в той же транзакции.
 
         :return: JSON-Pydantic модель на основе записи из базы данных, в качестве подтверждения.
         """
 
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
+            try:
+
+                # Данные объекта пишутся в api_payloads один раз, в таблицу истории - только ссылка на них
+                todo_db_row = await _insert_returning(db, 'todos', todo_pydantic, telegram_user_id, sheet_row)
+
+                # Возвращаем сериализованный JSON объект
+                return _make_echo(TodoModelFromDB, todo_pydantic, todo_db_row)
+
+            except SQLAlchemyError as e:
+                logging.error(f'Ошибка при сохранении поста:\n{e}')
+                raise
+
+
+@dataclass(slots=True)
+class _PendingInsert:
+    """
+    Вставка, которая ждет записи в очереди.
+    """
+
+    api_model: BaseModel
+    telegram_user_id: int
+    future: asyncio.Future
+    sheet_row: list | None = None
+
+
+@injectable(singleton=True)
+class DBWriteBehindQueue:
+    """
+    Очередь отложенной записи в PostgreSQL.
+
+    Вставки копятся по таблицам и записываются пачкой, когда в таблице набралось `batch_size` строк
+    или с первой строки прошло `max_delay` сек. Каждая пачка - одна транзакция
+    с многострочным `INSERT ... RETURNING`. Вызывающий получает свой JSON-ответ, как и при записи по одной.
+
+    В очереди и в записи не больше `DB_WRITE_BEHIND_MAX_PENDING` строк: если БД не успевает,
+    новые вставки ждут свободного места, а не копятся в памяти.
+    """
+
+    @autowired
+    def __init__(self, db_session_manager: Annotated[_DBAsyncSessionManager, Autowired]):
+        self.db_session_manager = db_session_manager
+
+        self.batch_size = DB_WRITE_BEHIND_BATCH_SIZE
+        self.max_delay = DB_WRITE_BEHIND_MAX_DELAY
+
+        self._pending: dict[str, list[_PendingInsert]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._flush_tasks: set[asyncio.Task] = set()
+        self._free_slots = asyncio.Semaphore(DB_WRITE_BEHIND_MAX_PENDING)
+        self._in_queue = 0
+        self._closed = False
+
+        # Статистика
+        self.rows = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.backpressure_waits = 0
+
+    async def put(
+            self, api_model: BaseModel, resource: str, telegram_user_id: int, sheet_row: list | None = None
+    ) -> str:
+        """
+        Ставит строку в очередь и ждет, пока ее пачка будет записана.
+
+        :param api_model: Pydantic-модель с данными API.
+        :param resource: Название ресурса (таблицы).
+        :param telegram_user_id: ID пользователя.
+        :param sheet_row: Строка для Google Sheets - пишется в `gh_outbox` в транзакции пачки.
+
+        :return: JSON-Pydantic модель на основе записи из базы данных.
+        """
+
+        if self._closed:
+            raise RuntimeError('Очередь записи в БД остановлена')
+
+        if self._free_slots.locked():
+            self.backpressure_waits += 1
+        await self._free_slots.acquire()
+
+        # Пока ждали место, очередь могли остановить - последняя пачка уже записана
+        if self._closed:
+            self._free_slots.release()
+            raise RuntimeError('Очередь записи в БД остановлена')
+        self._in_queue += 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        pending = self._pending.setdefault(resource, [])
+        pending.append(_PendingInsert(api_model, telegram_user_id, future, sheet_row))
+
+        if len(pending) >= self.batch_size:
+            self._start_flush(resource)
+        elif resource not in self._timers:
+            self._timers[resource] = loop.call_later(self.max_delay, self._start_flush, resource)
+
+        # Отмена ожидания не отменяет запись - строка уже в пачке
+        return await asyncio.shield(future)
+
+    async def close(self) -> None:
+        """
+        Записывает все, что осталось в очереди, и дожидается завершения записи.
+        Новые вставки после этого не принимаются.
+        """
+
+        self._closed = True
+
+        for resource in list(self._pending):
+            self._start_flush(resource)
+
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+        logging.info(f'Очередь записи в БД остановлена. Статистика: {self.get_stats()}')
+
+    def get_stats(self) -> dict:
+        return {
+            'rows': self.rows,
+            'batches': self.batches,
+            'failed_batches': self.failed_batches,
+            'avg_batch_size': round(self.rows / self.batches, 1) if self.batches else 0.0,
+            'pending': self._in_queue,
+            'backpressure_waits': self.backpressure_waits
+        }
+
+    def _start_flush(self, resource: str) -> None:
+        timer = self._timers.pop(resource, None)
+        if timer is not None:
+            timer.cancel()
+
+        batch = self._pending.pop(resource, None)
+        if not batch:
+            return
+
+        task = asyncio.create_task(self._flush(resource, batch))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+        task.add_done_callback(lambda _: self._release(len(batch)))
+
+    def _release(self, rows: int) -> None:
+        self._in_queue -= rows
+        for _ in range(rows):
+            self._free_slots.release()
+
+    async def _flush(self, resource: str, batch: list[_PendingInsert]) -> None:
+        """
+        Записывает пачку одной транзакцией.
+        Если пачку отклонили данные одной из строк - пробует строки по одной, чтобы плохая строка
+        не роняла остальные. Ошибка соединения или недоступность БД отдается всей пачке сразу:
+        по одной строке она не запишется тоже.
+        """
+
+        try:
+            echoes = await self._write(resource, batch)
+        except (IntegrityError, DataError) as e:
+            self.failed_batches += 1
+
+            if len(batch) == 1:
+                self._fail(batch, e)
+                return
+
+            logging.error(f'Ошибка данных при пакетной записи {len(batch)} строк в {resource}, пишу по одной:\n{e}')
+            await asyncio.gather(*(self._flush(resource, [item]) for item in batch))
+            return
+        except Exception as e:
+            self.failed_batches += 1
+            logging.error(f'Ошибка при пакетной записи {len(batch)} строк в {resource}:\n{e}')
+            self._fail(batch, e)
+            return
+
+        self.rows += len(batch)
+        self.batches += 1
+
+        for item, echo in zip(batch, echoes):
+            if not item.future.done():
+                item.future.set_result(echo)
+
+    @staticmethod
+    def _fail(batch: list[_PendingInsert], error: Exception) -> None:
+        for item in batch:
+            if not item.future.done():
+                item.future.set_exception(error)
+
+    async def _write(self, resource: str, batch: list[_PendingInsert]) -> list[str]:
+        db_model, model_from_db = _resources[resource]
+        payloads = [_payload_params(resource, item.api_model) for item in batch]
+
         async with self.db_session_manager.session() as db:
+            # Одинаковые объекты пачки записываются один раз. Порядок по ключу одинаков во всех пачках,
+            # поэтому параллельные транзакции берут блокировки в одном порядке и не ждут друг друга по кругу.
+            unique_payloads = {payload['payload_content_hash']: payload for payload in payloads}
+            await db.execute(_upsert_payloads, [unique_payloads[key] for key in sorted(unique_payloads)])
+
+            # Одна вставка истории на всю пачку, строки RETURNING - в порядке параметров
+            result = await db.execute(
+                insert(db_model).returning(
+                    db_model.id, db_model.telegram_user_id, db_model.created_at, sort_by_parameter_order=True
+                ),
+                [
+                    {'telegram_user_id': item.telegram_user_id, 'payload_hash': payload['payload_content_hash']}
+                    for item, payload in zip(batch, payloads)
+                ]
+            )
+
+            echoes = [_make_echo(model_from_db, item.api_model, row) for item, row in zip(batch, result.all())]
+
+            # Сводка - одна строка на пользователя пачки, в порядке ключа по той же причине, что и выше
+            usage = Counter(item.telegram_user_id for item in batch)
+            await db.execute(_upsert_usage, [
+                {'usage_telegram_user_id': user_id, 'usage_resource': resource, 'usage_requests': usage[user_id]}
+                for user_id in sorted(usage)
+            ])
+
+            outbox = [_outbox_params(resource, item.sheet_row) for item in batch if item.sheet_row is not None]
+            if outbox:
+                await db.execute(_enqueue_outbox, outbox)
+
+        # В пачке записи разных пользователей - отмечаем каждого после коммита
+        for item in batch:
+            replica_set.record_write(item.telegram_user_id)
+
+        return echoes
+
+
+@dataclass(slots=True)
+class BulkInsertReport:
+    """
+    Итог массовой записи `create_many`.
+    """
+
+    resource: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+# Промежуточная таблица массовой записи: сюда COPY, отсюда - set-based вставки в api_payloads и историю
+_PAYLOAD_STAGE_DDL = 'CREATE TEMPORARY TABLE _payload_stage (content_hash bytea, data jsonb) ON COMMIT DROP'
+
+# Блокировка уже записанных данных, как в `_upsert_payloads`: до конца транзакции их не удалит чистка
+_LOCK_STAGED_PAYLOADS = '''
+    SELECT 1 FROM api_payloads WHERE content_hash IN (SELECT content_hash FROM _payload_stage)
+    ORDER BY content_hash FOR KEY SHARE
+'''
+
+_PAYLOADS_FROM_STAGE = '''
+    INSERT INTO api_payloads (content_hash, resource, data)
+    SELECT DISTINCT ON (content_hash) content_hash, $1, data FROM _payload_stage ORDER BY content_hash
+    ON CONFLICT DO NOTHING
+'''
+
+_HISTORY_FROM_STAGE = 'INSERT INTO {table} (telegram_user_id, payload_hash) SELECT $1, content_hash FROM _payload_stage'
+
+# То же, что `_upsert_usage`, для соединения asyncpg
+_USAGE_UPSERT = '''
+    INSERT INTO user_usage_stats AS usage (telegram_user_id, resource, requests, first_at, last_at)
+    VALUES ($1, $2, $3, now(), now())
+    ON CONFLICT (telegram_user_id, resource) DO UPDATE SET
+        requests = usage.requests + excluded.requests,
+        first_at = least(usage.first_at, excluded.first_at),
+        last_at = greatest(usage.last_at, excluded.last_at)
+'''
+
+
+async def _aiter(models: Iterable | AsyncIterable) -> AsyncIterator:
+    """
+    Позволяет одинаково обходить обычный и асинхронный итератор.
+    """
+
+    if hasattr(models, '__aiter__'):
+        async for model in models:
+            yield model
+    else:
+        for model in models:
+            yield model
+
+
+@injectable
+class _BulkInsert(_ServiceBase):
+    """
+    Сервисный класс для массовой записи.
+    Реализует метод create_many, который записывает целые коллекции через COPY.
+    """
+
+    async def create_many(
+            self,
+            resource: str,
+            models: Iterable[BaseModel] | AsyncIterable[BaseModel],
+            telegram_user_id: int
+    ) -> BulkInsertReport:
+        """
+        Записывает много объектов одного ресурса одной транзакцией через `COPY`.
+        Модели читаются по мере записи, поэтому сюда можно передать прямо `iter_models_response(...)`.
+
+        Объекты сначала копируются во временную таблицу, а из нее двумя вставками `INSERT ... SELECT`
+        расходятся по api_payloads (без повторов) и таблице истории.
+
+        :param resource: Название ресурса (таблицы).
+        :param models: Pydantic-модели с данными API: обычный или асинхронный итератор.
+        :param telegram_user_id: ID пользователя.
+
+        :return: Кол-во записанных строк и затраченное время.
+        """
+
+        resource = resource.lower()
+        if resource not in _resources:
+            raise ValueError(f'Неизвестный ресурс: {resource}')
+
+        started = time.perf_counter()
+
+        async with self.db_session_manager.session(telegram_user_id=telegram_user_id) as db:
             try:
+                connection = await db.connection()
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
 
-                # Создаем объект модели
-                todo_api_data = todo_pydantic.model_dump()
-                todo_db = TodoDBModel(**todo_api_data)
+                # COPY идет напрямую через asyncpg.Connection, мимо SQLAlchemy,
+                # поэтому транзакцию открываем на нем же: без нее каждая команда коммитилась бы отдельно
+                async with driver_connection.transaction():
+                    rows = await self._copy(driver_connection, resource, models, telegram_user_id)
 
-                # Отдельно добавляем Telegram ID
-                todo_db.telegram_user_id = telegram_user_id
+            except Exception as e:
+                logging.error(f'Ошибка при массовой записи в {resource}:\n{e}')
+                raise
 
-                db.add(todo_db)
+        report = BulkInsertReport(resource, rows, time.perf_counter() - started)
+        logging.info(
+            f'Массовая запись в {resource}: {report.rows} строк за {report.seconds:.3f} сек. '
+            f'({report.rows_per_second:.0f} строк/сек.)'
+        )
 
-                # Обновляем объект и получаем поля из БД
-                await db.flush()
-                await db.refresh(todo_db)
+        return report
 
-                # Возвращаем сериализованный JSON объект
-                todo_validated = TodoModelFromDB.model_validate(todo_db)
-                return todo_validated.model_dump_json()
+    @staticmethod
+    async def _copy(driver_connection, resource: str, models, telegram_user_id: int) -> int:
+        db_model, _ = _resources[resource]
+        rows = 0
+
+        async def records():
+            nonlocal rows
+
+            async for model in _aiter(models):
+                rows += 1
+                payload = _payload_params(resource, model)
+                yield payload['payload_content_hash'], payload['payload_data']
+
+        await driver_connection.execute(_PAYLOAD_STAGE_DDL)
+        await driver_connection.copy_records_to_table('_payload_stage', records=records())
+
+        if rows:
+            await driver_connection.execute(_LOCK_STAGED_PAYLOADS)
+            await driver_connection.execute(_PAYLOADS_FROM_STAGE, resource)
+            await driver_connection.execute(
+                _HISTORY_FROM_STAGE.format(table=db_model.__tablename__), telegram_user_id
+            )
+            await driver_connection.execute(_USAGE_UPSERT, telegram_user_id, resource, rows)
+
+        return rows
+
+
+@dataclass(slots=True, frozen=True)
+class HistoryCursor:
+    """
+    Позиция в истории пользователя: ключ записи, от которой читается следующая страница.
+    `id` уникален только внутри таблицы, поэтому ничьи между таблицами разрешает `resource`.
+    """
+
+    created_at: datetime
+    id: int
+    resource: str
+
+
+@dataclass(slots=True)
+class HistoryEntry:
+    """
+    Одна запись истории.
+    """
+
+    resource: str
+    api_id: int  # ID объекта в API
+    record: BaseModel  # Pydantic-модель записи из БД, например PostModelFromDB
+
+    @property
+    def cursor(self) -> HistoryCursor:
+        return HistoryCursor(self.record.created_at, self.record.id, self.resource)
+
+
+@dataclass(slots=True)
+class HistoryPage:
+    """
+    Страница истории, записи от новых к старым.
+    `newer` и `older` - курсоры соседних страниц, None - если страницы нет.
+    """
+
+    entries: list[HistoryEntry]
+    newer: HistoryCursor | None
+    older: HistoryCursor | None
+
+
+# Ресурс -> поле Pydantic-модели, в которое попадает `id` из API (например, `post_id`)
+_api_id_fields = {
+    resource: next(name for name, field in pydantic_model.model_fields.items() if field.alias == 'id')
+    for resource, pydantic_model in resource_models.items()
+}
+
+
+def _history_branch(resource: str, telegram_user_id: int, cursor: HistoryCursor | None, older: bool, limit: int):
+    """
+    Запрос к одной таблице истории: не больше `limit` записей пользователя после курсора.
+    Условие и сортировка совпадают с индексом (telegram_user_id, created_at, id),
+    поэтому читается ровно `limit` строк индекса, сколько бы записей ни было у пользователя.
+    """
 
+    table = _resources[resource][0].__table__
+    query = (
+        select(literal(resource).label('resource'), table.c.id, table.c.created_at, table.c.payload_hash)
+        .where(table.c.telegram_user_id == telegram_user_id)
+    )
+
+    if cursor is not None:
+        key, position = tuple_(table.c.created_at, table.c.id), tuple_(cursor.created_at, cursor.id)
+
+        # Полный ключ страницы - (created_at, id, resource): запись с тем же (created_at, id)
+        # из другой таблицы идет раньше или позже курсора в зависимости от названия таблицы
+        if older:
+            query = query.where(key <= position if resource < cursor.resource else key < position)
+        else:
+            query = query.where(key >= position if resource > cursor.resource else key > position)
+
+    if older:
+        query = query.order_by(table.c.created_at.desc(), table.c.id.desc())
+    else:
+        query = query.order_by(table.c.created_at, table.c.id)
+
+    return query.limit(limit)
+
+
+@injectable
+class _History(_ServiceBase):
+    """
+    Сервисный класс для чтения истории.
+    Реализует метод get_history, который отдает запросы пользователя по всем ресурсам постранично.
+    """
+
+    async def get_history(
+            self,
+            telegram_user_id: int,
+            cursor: HistoryCursor | None = None,
+            older: bool = True,
+            limit: int = HISTORY_PAGE_SIZE
+    ) -> HistoryPage:
+        """
+        Возвращает страницу истории пользователя: записи всех таблиц истории от новых к старым.
+
+        Пагинация по ключу (created_at, id, resource), а не OFFSET: каждая таблица отдает не больше
+        `limit + 1` строк своего индекса после курсора, и время ответа не растет с глубиной страницы.
+
+        :param telegram_user_id: ID пользователя.
+        :param cursor: Курсор из `HistoryPage.newer` / `HistoryPage.older`. None - самая новая страница.
+        :param older: Направление: True - записи старше курсора, False - новее.
+        :param limit: Размер страницы.
+
+        :return: Страница истории.
+        """
+
+        if cursor is None:
+            older = True
+
+        # Одна лишняя запись показывает, есть ли следующая страница
+        history = union_all(*(
+            _history_branch(resource, telegram_user_id, cursor, older, limit + 1) for resource in _resources
+        )).subquery('history')
+
+        order = (history.c.created_at, history.c.id, history.c.resource)
+        query = (
+            select(history.c.resource, history.c.id, history.c.created_at, PayloadDBModel.data)
+            .join(PayloadDBModel, PayloadDBModel.content_hash == history.c.payload_hash)
+            .order_by(*(column.desc() if older else column for column in order))
+            .limit(limit + 1)
+        )
+
+        async with self.db_session_manager.session(read_only=True, telegram_user_id=telegram_user_id) as db:
+            try:
+                rows = (await db.execute(query)).all()
             except SQLAlchemyError as e:
-                logging.error(f'Ошибка при сохранении поста:\n{e}')
+                logging.error(f'Ошибка при чтении истории пользователя {telegram_user_id}:\n{e}')
                 raise
 
+        more = len(rows) > limit
+        rows = rows[:limit]
+
+        if not older:
+            # Новее курсора меньше страницы - это начало истории, отдаем ее первую страницу целиком
+            if not more:
+                return await self.get_history(telegram_user_id, limit=limit)
+            rows.reverse()
+
+        entries = []
+        for row in rows:
+            model_from_db = _resources[row.resource][1]
+            record = model_from_db.model_validate({
+                **row.data,
+                'id': row.id,
+                'telegram_user_id': telegram_user_id,
+                'created_at': row.created_at
+            })
+            entries.append(HistoryEntry(row.resource, getattr(record, _api_id_fields[row.resource]), record))
+
+        if not entries:
+            return HistoryPage(entries, None, None)
+
+        has_newer = more if not older else cursor is not None
+        has_older = more if older else True
+
+        return HistoryPage(
+            entries,
+            newer=entries[0].cursor if has_newer else None,
+            older=entries[-1].cursor if has_older else None
+        )
+
+
+@dataclass(slots=True)
+class ResourceUsage:
+    """
+    Запросы пользователя к одному ресурсу.
+    """
+
+    requests: int
+    first_at: datetime
+    last_at: datetime
+
+
+@dataclass(slots=True)
+class UsageStats:
+    """
+    Сводка запросов пользователя, ресурсы - от самых частых.
+    """
+
+    resources: dict[str, ResourceUsage]
+
+    @property
+    def requests(self) -> int:
+        return sum(usage.requests for usage in self.resources.values())
+
+    @property
+    def first_at(self) -> datetime | None:
+        return min((usage.first_at for usage in self.resources.values()), default=None)
+
+    @property
+    def last_at(self) -> datetime | None:
+        return max((usage.last_at for usage in self.resources.values()), default=None)
+
+    @property
+    def favourites(self) -> list[str]:
+        """
+        Ресурсы с наибольшим кол-вом запросов (несколько - если кол-во совпадает).
+        """
+
+        top = max((usage.requests for usage in self.resources.values()), default=0)
+        return [resource for resource, usage in self.resources.items() if usage.requests == top]
+
+
+@injectable
+class _Usage(_ServiceBase):
+    """
+    Сервисный класс для сводки запросов.
+    Реализует метод get_usage_stats, который читает `user_usage_stats` - не больше строки на ресурс.
+    """
+
+    async def get_usage_stats(self, telegram_user_id: int) -> UsageStats:
+        """
+        :param telegram_user_id: ID пользователя.
+
+        :return: Сводка запросов пользователя по всем ресурсам.
+        """
+
+        table = UserUsageStatsDBModel.__table__
+        query = (
+            select(table.c.resource, table.c.requests, table.c.first_at, table.c.last_at)
+            .where(table.c.telegram_user_id == telegram_user_id)
+            .order_by(table.c.requests.desc(), table.c.resource)
+        )
+
+        async with self.db_session_manager.session(read_only=True, telegram_user_id=telegram_user_id) as db:
+            try:
+                rows = (await db.execute(query)).all()
+            except SQLAlchemyError as e:
+                logging.error(f'Ошибка при чтении сводки пользователя {telegram_user_id}:\n{e}')
+                raise
+
+        return UsageStats({row.resource: ResourceUsage(row.requests, row.first_at, row.last_at) for row in rows})
+
 
 @injectable
-class ServiceDB(_Users, _Posts, _Comments, _Albums, _Photos, _Todos):
+class ServiceDB(_Users, _Posts, _Comments, _Albums, _Photos, _Todos, _BulkInsert, _History, _Usage):
     """
     Класс-сервис.
     Объединяет в себе методы для работы со всеми моделями БД, предоставляя единый интерфейс управления.
@@ -368,21 +1133,50 @@ class ServiceDB(_Users, _Posts, _Comments, _Albums, _Photos, _Todos):
     ID пользователя.
     """
 
-    async def create_obj(self, validated_data, resource: str, telegram_user_id: int) -> str:
-        if resource.lower() == 'users':
-            return await self.create_user(validated_data, telegram_user_id=telegram_user_id)
+    @autowired
+    def __init__(
+            self,
+            db_session_manager: Annotated[_DBAsyncSessionManager, Autowired],
+            write_behind_queue: Annotated[DBWriteBehindQueue, Autowired]
+    ):
+        super().__init__(db_session_manager)
+        self.write_behind_queue = write_behind_queue
+
+    async def create_obj(
+            self, validated_data, resource: str, telegram_user_id: int, sheet_row: list | None = None
+    ) -> str:
+        """
+        :param sheet_row: Строка для Google Sheets (см. `ServiceGH.make_row`). Записывается в очередь `gh_outbox`
+        в той же транзакции, что и история, а в таблицу ее переносит `gh_outbox_dispatcher` в фоне.
+        """
+
+        echo = await self._create_obj(validated_data, resource.lower(), telegram_user_id, sheet_row)
+
+        # Строка уже в очереди - будим отправку, не дожидаясь опроса
+        if sheet_row is not None:
+            gh_outbox_dispatcher.notify()
+
+        return echo
+
+    async def _create_obj(self, validated_data, resource: str, telegram_user_id: int, sheet_row: list | None) -> str:
+        # Пакетная запись через очередь
+        if DB_WRITE_BEHIND_ENABLED:
+            return await self.write_behind_queue.put(validated_data, resource, telegram_user_id, sheet_row)
+
+        if resource == 'users':
+            return await self.create_user(validated_data, telegram_user_id=telegram_user_id, sheet_row=sheet_row)
 
-        elif resource.lower() == 'posts':
-            return await self.create_post(validated_data, telegram_user_id=telegram_user_id)
+        elif resource == 'posts':
+            return await self.create_post(validated_data, telegram_user_id=telegram_user_id, sheet_row=sheet_row)
 
-        elif resource.lower() == 'comments':
-            return await self.create_comment(validated_data, telegram_user_id=telegram_user_id)
+        elif resource == 'comments':
+            return await self.create_comment(validated_data, telegram_user_id=telegram_user_id, sheet_row=sheet_row)
 
-        elif resource.lower() == 'albums':
-            return await self.create_album(validated_data, telegram_user_id=telegram_user_id)
+        elif resource == 'albums':
+            return await self.create_album(validated_data, telegram_user_id=telegram_user_id, sheet_row=sheet_row)
 
-        elif resource.lower() == 'photos':
-            return await self.create_photo(validated_data, telegram_user_id=telegram_user_id)
+        elif resource == 'photos':
+            return await self.create_photo(validated_data, telegram_user_id=telegram_user_id, sheet_row=sheet_row)
 
-        elif resource.lower() == 'todos':
-            return await self.create_todo(validated_data, telegram_user_id=telegram_user_id)
+        elif resource == 'todos':
+            return await self.create_todo(validated_data, telegram_user_id=telegram_user_id, sheet_row=sheet_row)
@@ -0,0 +1,307 @@
+"""
+Перенос строк из очереди `gh_outbox` в Google Sheets.
+
+Строка для листа пишется в `gh_outbox` в той же транзакции, что и запись истории (см. `ServiceDB.create_obj`),
+поэтому пользователь не ждет Google Sheets, а строка не теряется ни при сбое API, ни при перезапуске бота.
+
+Фоновая задача раз в `GH_OUTBOX_POLL_INTERVAL` сек. или по `notify()`, когда новых строк набралось
+`GH_APPEND_BATCH_SIZE` или с первой из них прошло `GH_APPEND_MAX_DELAY` сек.
+(так строки параллельных апдейтов уходят одним запросом, а не по одному на пользователя):
++ Забирает до `GH_OUTBOX_BATCH_SIZE` готовых строк - больше строк одновременно в работе не бывает.
+  Забранные строки откладываются на `_LEASE_SECONDS` сек., поэтому несколько экземпляров бота
+  не отправляют одни и те же строки, а соединение с БД не занято, пока идет запрос к API
++ Добавляет строки каждого листа запросами до `GH_APPEND_BATCH_SIZE` строк и удаляет отправленные из очереди
++ Если лист не записался - строки ждут повтора: `GH_OUTBOX_BACKOFF_BASE` * 2^попытка сек.
+  (не больше `GH_OUTBOX_BACKOFF_MAX`, со случайным разбросом), ошибка сохраняется в `last_error`
++ Если API отклонил пачку ответом 4xx (кроме 401 и 429, их повторяет сам клиент), строки повторяются по одной:
+  одна испорченная строка не держит остальные. Строка, которую API отклонил `GH_OUTBOX_MAX_ATTEMPTS` раз,
+  откладывается навсегда (`next_attempt_at = 'infinity'`) и ждет разбора вручную
+
+Доставка "хотя бы один раз": если процесс упадет между записью в лист и удалением из очереди,
+строка будет отправлена повторно после истечения отсрочки.
+
+Ожидающие строки лежат в PostgreSQL, а не в памяти, поэтому апдейтам не нужно ждать свободного места:
+в памяти не больше одной забранной пачки.
+"""
+
+
+import asyncio
+import logging
+import random
+import time
+from itertools import groupby
+
+from sqlalchemy import text
+
+from config.config import (
+    GH_OUTBOX_BATCH_SIZE,
+    GH_OUTBOX_POLL_INTERVAL,
+    GH_OUTBOX_BACKOFF_BASE,
+    GH_OUTBOX_BACKOFF_MAX,
+    GH_OUTBOX_MAX_ATTEMPTS,
+    GH_APPEND_BUFFER_ENABLED,
+    GH_APPEND_BATCH_SIZE,
+    GH_APPEND_MAX_DELAY
+)
+from api.resilience import LatencyTracker
+from models.db import engine
+from models.google_sheets import gh_sheet_router, get_api_error_status
+
+
+# Сек., на которые откладываются забранные строки. Должно хватать на запрос к API с повтором
+_LEASE_SECONDS = 120
+
+_CLAIM = text(
+    'UPDATE gh_outbox SET next_attempt_at = localtimestamp + make_interval(secs => :lease) '
+    'WHERE id IN ('
+    'SELECT id FROM gh_outbox WHERE next_attempt_at <= localtimestamp ORDER BY id LIMIT :batch_size '
+    'FOR UPDATE SKIP LOCKED) '
+    'RETURNING id, sheet, row, CAST(extract(epoch FROM localtimestamp - created_at) AS float) AS waited'
+)
+
+_DELETE = text('DELETE FROM gh_outbox WHERE id = ANY(:ids)')
+
+# Пауза растет с числом попыток каждой строки. Разброс 50-100% общий на пачку:
+# повторы разных экземпляров расходятся во времени, а строки пачки и дальше уходят вместе.
+# Показатель степени ограничен - иначе после ~1000 попыток power() переполнит double precision.
+# Отклоненная API строка (:park) после :max_attempts попыток больше не забирается
+_RETRY = text(
+    'UPDATE gh_outbox SET attempts = attempts + 1, last_error = :error, '
+    "next_attempt_at = CASE WHEN :park AND attempts + 1 >= :max_attempts THEN timestamp 'infinity' "
+    'ELSE localtimestamp + make_interval('
+    'secs => least(:backoff_max, :backoff_base * power(2, least(attempts, 30))) * :jitter) END '
+    'WHERE id = ANY(:ids) '
+    "RETURNING next_attempt_at = 'infinity'"
+)
+
+
+def _is_rejected(error: BaseException) -> bool:
+    """
+    API отклонил сам запрос (4xx): повтор той же пачки не поможет.
+    401 и 429 клиент уже повторял сам - это не признак плохих строк.
+    """
+
+    status = get_api_error_status(error)
+    return status is not None and 400 <= status < 500 and status not in (401, 429)
+
+
+class GHOutboxDispatcher:
+    """
+    Фоновая отправка строк из `gh_outbox` в листы.
+    """
+
+    def __init__(
+            self,
+            batch_size: int,
+            poll_interval: float,
+            backoff_base: float,
+            backoff_max: float,
+            max_attempts: int,
+            flush_rows: int,
+            flush_delay: float
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max_attempts
+        self.flush_rows = flush_rows
+        self.flush_delay = flush_delay
+
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        # Строки, поставленные в очередь после начала прохода, и таймер `flush_delay`
+        self._noted = 0
+        self._flush_timer: asyncio.TimerHandle | None = None
+
+        # Статистика
+        self.rows = 0
+        self.appends = 0
+        self.failed_appends = 0
+        self.retried_rows = 0
+        self.split_appends = 0
+        self.parked_rows = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.append_latency = LatencyTracker(min_samples=1)
+        self.row_latency = LatencyTracker(min_samples=1)
+
+    def notify(self) -> None:
+        """
+        В очереди появилась строка. Проход начнется, не дожидаясь следующей проверки, когда таких строк
+        наберется `flush_rows` или через `flush_delay` сек. после первой.
+        """
+
+        self._noted += 1
+        if self._noted >= self.flush_rows or self.flush_delay <= 0:
+            self._wakeup.set()
+        elif self._flush_timer is None:
+            self._flush_timer = asyncio.get_running_loop().call_later(self.flush_delay, self._wakeup.set)
+
+    def _reset_trigger(self) -> None:
+        # Проход заберет все готовые строки, отсчет N/T начинается заново
+        self._wakeup.clear()
+        self._noted = 0
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+
+    async def run_once(self) -> int:
+        """
+        Один проход: отправляет готовые строки.
+
+        :return: Кол-во забранных из очереди строк.
+        """
+
+        async with engine.begin() as connection:
+            claimed = (await connection.execute(
+                _CLAIM, {'lease': _LEASE_SECONDS, 'batch_size': self.batch_size}
+            )).all()
+
+        self.in_flight = len(claimed)
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        # Внутри листа строки идут в порядке постановки в очередь
+        claimed.sort(key=lambda row: (row.sheet, row.id))
+        try:
+            await asyncio.gather(*(
+                self._append_sheet(sheet, list(rows)) for sheet, rows in groupby(claimed, key=lambda row: row.sheet)
+            ))
+        finally:
+            self.in_flight = 0
+
+        return len(claimed)
+
+    async def _append_sheet(self, sheet: str, rows: list) -> None:
+        # Запросы одного листа - по очереди, не больше `flush_rows` строк в каждом
+        for start in range(0, len(rows), self.flush_rows):
+            await self._append(sheet, rows[start:start + self.flush_rows])
+
+    async def _append(self, sheet: str, rows: list) -> None:
+        ids = [row.id for row in rows]
+
+        started = time.monotonic()
+        try:
+            await gh_sheet_router.append_rows(sheet, [row.row for row in rows])
+        except Exception as e:
+            self.failed_appends += 1
+            rejected = _is_rejected(e)
+
+            # Пачку отклонила одна из строк - остальные не должны ждать вместе с ней.
+            # По порядку, чтобы строки листа шли в порядке очереди
+            if rejected and len(rows) > 1:
+                self.split_appends += 1
+                logging.warning(f'Лист {sheet} отклонил {len(rows)} строк, запись по одной:\n{e}')
+
+                for row in rows:
+                    await self._append(sheet, [row])
+                return
+
+            self.retried_rows += len(rows)
+            logging.error(f'Ошибка при записи {len(rows)} строк в лист {sheet}, будет повтор:\n{e}')
+
+            async with engine.begin() as connection:
+                parked = sum((await connection.execute(_RETRY, {
+                    'ids': ids,
+                    'error': repr(e),
+                    'park': rejected,
+                    'max_attempts': self.max_attempts,
+                    'backoff_base': self.backoff_base,
+                    'backoff_max': self.backoff_max,
+                    'jitter': random.uniform(0.5, 1)
+                })).scalars())
+
+            if parked:
+                self.parked_rows += parked
+                logging.error(
+                    f'Строка очереди gh_outbox {ids} отклонена листом {sheet} {self.max_attempts} раз '
+                    f'и больше не отправляется, ошибка в last_error'
+                )
+            return
+
+        elapsed = time.monotonic() - started
+        self.append_latency.observe(elapsed)
+        for row in rows:
+            self.row_latency.observe(row.waited + elapsed)
+
+        async with engine.begin() as connection:
+            await connection.execute(_DELETE, {'ids': ids})
+
+        self.rows += len(rows)
+        self.appends += 1
+
+    def start(self) -> None:
+        """
+        Запускает фоновую отправку.
+        """
+
+        if self._task is None or self._task.done():
+            self._stopping = False
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, timeout: float = 10) -> None:
+        """
+        Останавливает отправку, дав закончить текущий проход.
+        Неотправленные строки остаются в очереди до следующего запуска.
+        """
+
+        if self._task is None:
+            return
+
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logging.warning('Отправка строк из gh_outbox прервана при остановке, они будут отправлены повторно')
+        self._task = None
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            self._reset_trigger()
+
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logging.error(f'Ошибка при отправке строк из gh_outbox:\n{e}')
+                claimed = 0
+
+            # Забрали полную пачку - в очереди, скорее всего, есть еще
+            if claimed >= self.batch_size:
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def get_stats(self) -> dict:
+        return {
+            'rows': self.rows,
+            'appends': self.appends,
+            'failed_appends': self.failed_appends,
+            'retried_rows': self.retried_rows,
+            'split_appends': self.split_appends,
+            'parked_rows': self.parked_rows,
+            'avg_append_size': round(self.rows / self.appends, 1) if self.appends else 0.0,
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'append_seconds': _latency_stats(self.append_latency),
+            'row_seconds': _latency_stats(self.row_latency)
+        }
+
+
+def _latency_stats(tracker: LatencyTracker) -> dict:
+    """
+    p50/p95/p99 по скользящему окну последних замеров.
+    """
+
+    return {f'p{round(q * 100)}': round(tracker.percentile(q) or 0.0, 3) for q in (0.5, 0.95, 0.99)}
+
+
+gh_outbox_dispatcher = GHOutboxDispatcher(
+    GH_OUTBOX_BATCH_SIZE, GH_OUTBOX_POLL_INTERVAL, GH_OUTBOX_BACKOFF_BASE, GH_OUTBOX_BACKOFF_MAX, GH_OUTBOX_MAX_ATTEMPTS,
+    # Без буфера каждая новая строка сразу запускает проход
+    flush_rows=GH_APPEND_BATCH_SIZE, flush_delay=GH_APPEND_MAX_DELAY if GH_APPEND_BUFFER_ENABLED else 0
+)